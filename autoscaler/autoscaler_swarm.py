@@ -1,15 +1,33 @@
 import os
 import time
+import signal
+import asyncio
 import redis
+import redis.asyncio
 import docker
 import logging
-import requests
-import json
-import socket
-import platform
-import psutil
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from scaling_policy import plan_scaling, observe_cold_start
+from task_state import format_task_states
+from queue_state import QueueStateCollector, collect_snapshots_async, snapshot_waiting
+from queue_events import QueueEventWatcher, KeyspaceWakeListener
+from job_latency import JobLatencySampler
+from workflow_backlog import WorkflowBacklogAnalyzer, N8nExecutionResolver, breakdown_to_dict, format_breakdown
+from prewarm import prewarm_min_replicas
+from scaling_targets import TargetConfig, ScalingTarget, load_scaling_targets
+from orchestrator import FakeOrchestrator
+from swarm_orchestrator import SwarmOrchestrator
+from worker_stats import WorkerStatsSampler, parse_node_api_urls
+from docker_api import DockerApiMeter, format_usage
+from notifier import WebhookDispatcher
+from leader_election import LeaderElector
+from state_store import ScalerStateStore
+from host_info import HostMetricsSampler, get_static_host_info
+import metrics
+
 load_dotenv()
 
 # --- Configuração de Logging ---
@@ -31,77 +49,165 @@ MAX_REPLICAS = int(os.getenv('MAX_REPLICAS'))
 SCALE_UP_QUEUE_THRESHOLD = int(os.getenv('SCALE_UP_QUEUE_THRESHOLD'))
 SCALE_DOWN_QUEUE_THRESHOLD = int(os.getenv('SCALE_DOWN_QUEUE_THRESHOLD'))
 
+# Escalonamento proporcional: jobs aguardando por réplica e tamanho máximo de cada passo
+TARGET_JOBS_PER_REPLICA = int(os.getenv('TARGET_JOBS_PER_REPLICA', SCALE_UP_QUEUE_THRESHOLD))
+MAX_SCALE_UP_STEP = int(os.getenv('MAX_SCALE_UP_STEP', MAX_REPLICAS))
+MAX_SCALE_DOWN_STEP = int(os.getenv('MAX_SCALE_DOWN_STEP', 1))
+
 POLLING_INTERVAL_SECONDS = int(os.getenv('POLLING_INTERVAL_SECONDS'))
 COOLDOWN_PERIOD_SECONDS = int(os.getenv('COOLDOWN_PERIOD_SECONDS'))
 
+# Cooldowns independentes por direção e janela de estabilização para reduzir réplicas
+SCALE_UP_COOLDOWN_SECONDS = int(os.getenv('SCALE_UP_COOLDOWN_SECONDS', COOLDOWN_PERIOD_SECONDS))
+SCALE_DOWN_COOLDOWN_SECONDS = int(os.getenv('SCALE_DOWN_COOLDOWN_SECONDS', COOLDOWN_PERIOD_SECONDS))
+SCALE_DOWN_STABILIZATION_SECONDS = int(os.getenv('SCALE_DOWN_STABILIZATION_SECONDS', COOLDOWN_PERIOD_SECONDS))
+
+# Escalonamento preditivo baseado na taxa de chegada da fila
+PREDICTIVE_SCALING = os.getenv('PREDICTIVE_SCALING', 'false').lower() == 'true'
+METRICS_WINDOW_SIZE = int(os.getenv('METRICS_WINDOW_SIZE', 20))
+PREDICTIVE_HORIZON_SECONDS = int(os.getenv('PREDICTIVE_HORIZON_SECONDS', 300))
+
+# Redução consciente dos workers: só remove réplicas quando há workers sem jobs ativos
+DRAIN_AWARE_SCALE_DOWN = os.getenv('DRAIN_AWARE_SCALE_DOWN', 'true').lower() == 'true'
+# Tempo máximo adiando a redução com todos os workers ocupados (0 = aguardar indefinidamente)
+SCALE_DOWN_DRAIN_TIMEOUT_SECONDS = int(os.getenv('SCALE_DOWN_DRAIN_TIMEOUT_SECONDS', 600))
+# Tempo que o worker n8n aguarda os jobs em andamento ao receber SIGTERM (mesmo nome da variável do n8n)
+N8N_GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv('N8N_GRACEFUL_SHUTDOWN_TIMEOUT', 30))
+
+# Escalonamento por SLO de espera: mantém a idade do job mais antigo aguardando abaixo deste limite
+# (0 desabilita e usa os limites de comprimento da fila)
+WAIT_SLO_SECONDS = int(os.getenv('WAIT_SLO_SECONDS', 0))
+# Jobs processados em paralelo por worker n8n (--concurrency), usado para estimar a capacidade
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 10))
+# Amostragem dos timestamps dos jobs (sempre ativa no modo SLO)
+JOB_LATENCY_METRICS = os.getenv('JOB_LATENCY_METRICS', 'false').lower() == 'true'
+JOB_LATENCY_SAMPLE_SIZE = int(os.getenv('JOB_LATENCY_SAMPLE_SIZE', 20))
+
+# Atribuição da fila por workflow n8n, a partir de uma amostra dos jobs aguardando e ativos
+WORKFLOW_BREAKDOWN_ENABLED = os.getenv('WORKFLOW_BREAKDOWN_ENABLED', 'false').lower() == 'true'
+WORKFLOW_SAMPLE_SIZE = int(os.getenv('WORKFLOW_SAMPLE_SIZE', 200))
+WORKFLOW_TOP_N = int(os.getenv('WORKFLOW_TOP_N', 5))
+WORKFLOW_CACHE_SIZE = int(os.getenv('WORKFLOW_CACHE_SIZE', 10000))
+# O job do n8n só traz o executionId; o workflow é consultado na API pública quando configurada
+N8N_API_URL = os.getenv('N8N_API_URL', '')
+N8N_API_KEY = os.getenv('N8N_API_KEY', '')
+N8N_API_LOOKUPS_PER_TICK = int(os.getenv('N8N_API_LOOKUPS_PER_TICK', 20))
+# Execuções não encontradas (ou com erro) só são consultadas de novo após este tempo
+N8N_API_RETRY_SECONDS = int(os.getenv('N8N_API_RETRY_SECONDS', 300))
+
+# Pré-aquecimento para picos previsíveis (ex.: workflows agendados na virada da hora)
+# Janelas '<cron> <duração em minutos> <réplicas mínimas>' separadas por ';' (horário local do contêiner)
+SCHEDULE_WINDOWS = os.getenv('SCHEDULE_WINDOWS', '')
+# Sazonalidade aprendida: média da demanda por minuto do dia, antecipada em SEASONALITY_LEAD_SECONDS
+LEARNED_SEASONALITY = os.getenv('LEARNED_SEASONALITY', 'false').lower() == 'true'
+SEASONALITY_LEAD_SECONDS = int(os.getenv('SEASONALITY_LEAD_SECONDS', 600))
+SEASONALITY_MIN_DAYS = int(os.getenv('SEASONALITY_MIN_DAYS', 3))
+
+# Modo orientado a eventos: bloqueia no stream '<prefix>:<fila>:events' em vez de dormir o intervalo todo
+EVENT_DRIVEN_SCALING = os.getenv('EVENT_DRIVEN_SCALING', 'false').lower() == 'true'
+EVENT_MIN_INTERVAL_SECONDS = int(os.getenv('EVENT_MIN_INTERVAL_SECONDS', 2))
+QUEUE_RECONCILE_INTERVAL_SECONDS = int(os.getenv('QUEUE_RECONCILE_INTERVAL_SECONDS', POLLING_INTERVAL_SECONDS))
+
+# Scale-to-zero: serviço vai a 0 réplicas após SCALE_TO_ZERO_IDLE_SECONDS sem jobs (0 desabilita)
+# e volta a SCALE_TO_ZERO_WAKE_REPLICAS no primeiro job, sem esperar cooldown
+SCALE_TO_ZERO_IDLE_SECONDS = int(os.getenv('SCALE_TO_ZERO_IDLE_SECONDS', 0))
+SCALE_TO_ZERO_WAKE_REPLICAS = int(os.getenv('SCALE_TO_ZERO_WAKE_REPLICAS', 1))
+# Como detectar o primeiro job: 'keyspace' (notificações de keyspace do Redis) ou 'events' (stream BullMQ)
+SCALE_TO_ZERO_WAKE_MODE = os.getenv('SCALE_TO_ZERO_WAKE_MODE', 'keyspace').lower()
+
+# Arquivo YAML com vários pares fila -> serviço (opcional); sem ele usa QUEUE_NAME/N8N_WORKER_SERVICE_NAME
+SCALING_CONFIG_FILE = os.getenv('SCALING_CONFIG_FILE')
+# Número máximo de alvos avaliados em paralelo a cada ciclo
+SCALING_CONCURRENCY = int(os.getenv('SCALING_CONCURRENCY', 8))
+
+# Cache da visão do cluster (nós, tarefas e specs de serviços) compartilhado entre as decisões
+CLUSTER_CACHE_TTL_SECONDS = int(os.getenv('CLUSTER_CACHE_TTL_SECONDS', 15))
+# Invalida o cache a partir da API de eventos do Docker (node/service/container)
+CLUSTER_EVENTS_ENABLED = os.getenv('CLUSTER_EVENTS_ENABLED', 'false').lower() == 'true'
+
+# Tempos limite por chamada no loop assíncrono: um Redis ou manager lento não atrasa o ciclo inteiro
+REDIS_TIMEOUT_SECONDS = float(os.getenv('REDIS_TIMEOUT_SECONDS', 5))
+DOCKER_API_TIMEOUT_SECONDS = float(os.getenv('DOCKER_API_TIMEOUT_SECONDS', 10))
+TARGET_EVALUATION_TIMEOUT_SECONDS = float(os.getenv('TARGET_EVALUATION_TIMEOUT_SECONDS', 30))
+# Threads dedicadas às chamadas bloqueantes da API do Docker
+DOCKER_THREAD_POOL_SIZE = int(os.getenv('DOCKER_THREAD_POOL_SIZE', 4))
+
+# Eleição de líder via Redis: várias réplicas do autoscaler, apenas a líder escala os serviços
+LEADER_ELECTION_ENABLED = os.getenv('LEADER_ELECTION_ENABLED', 'false').lower() == 'true'
+LEADER_ELECTION_KEY = os.getenv('LEADER_ELECTION_KEY', 'n8n-autoscaler:leader')
+LEADER_LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS', 15))
+
+# Estado persistido no Redis (cooldowns, janela de estabilização, métricas e log de decisões)
+STATE_PERSISTENCE_ENABLED = os.getenv('STATE_PERSISTENCE_ENABLED', 'true').lower() == 'true'
+STATE_KEY_PREFIX = os.getenv('STATE_KEY_PREFIX', 'n8n-autoscaler:state')
+STATE_TTL_SECONDS = int(os.getenv('STATE_TTL_SECONDS', 86400))
+DECISION_LOG_SIZE = int(os.getenv('DECISION_LOG_SIZE', 1000))
+
+# Convergência do serviço: escalonamentos para cima aguardam tarefas pendentes/iniciando e
+# atualizações em andamento por até este tempo (0 desabilita)
+CONVERGENCE_TIMEOUT_SECONDS = int(os.getenv('CONVERGENCE_TIMEOUT_SECONDS', 300))
+# Falhas de tarefas mais antigas que isto não entram no resumo por ciclo
+FAILED_TASK_WINDOW_SECONDS = int(os.getenv('FAILED_TASK_WINDOW_SECONDS', 300))
+
+# Escalonamento por múltiplos sinais: utilização média alvo de CPU/memória dos workers (0 desabilita).
+# A recomendação final é a maior entre fila, CPU e memória.
+TARGET_CPU_PERCENT = int(os.getenv('TARGET_CPU_PERCENT', 0))
+TARGET_MEMORY_PERCENT = int(os.getenv('TARGET_MEMORY_PERCENT', 0))
+WORKER_STATS_CONCURRENCY = int(os.getenv('WORKER_STATS_CONCURRENCY', 8))
+WORKER_STATS_TIMEOUT_SECONDS = float(os.getenv('WORKER_STATS_TIMEOUT_SECONDS', 5))
+WORKER_STATS_SMOOTHING = float(os.getenv('WORKER_STATS_SMOOTHING', 0.3))
+# Sem nenhuma leitura por este tempo, a utilização suavizada é descartada
+WORKER_STATS_MAX_AGE_SECONDS = int(os.getenv('WORKER_STATS_MAX_AGE_SECONDS', 3 * POLLING_INTERVAL_SECONDS))
+# API Docker dos outros nós ('hostname=tcp://host:porta,...'); sem ela só os containers do nó local são lidos
+NODE_DOCKER_API_URLS = os.getenv('NODE_DOCKER_API_URLS', '')
+
+# Porta do endpoint Prometheus /metrics (0 desabilita)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Backend de orquestração: 'swarm' (padrão) ou 'fake' (em memória, executa o loop sem Docker)
+ORCHESTRATOR_BACKEND = os.getenv('ORCHESTRATOR_BACKEND', 'swarm').lower()
+
 # Configuração de Webhook
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 WEBHOOK_TOKEN = os.getenv('WEBHOOK_TOKEN')
+WEBHOOK_TIMEOUT_SECONDS = int(os.getenv('WEBHOOK_TIMEOUT_SECONDS', 10))
+WEBHOOK_MAX_RETRIES = int(os.getenv('WEBHOOK_MAX_RETRIES', 5))
+# Eventos recebidos dentro desta janela são enviados em um único POST
+WEBHOOK_BATCH_WINDOW_SECONDS = float(os.getenv('WEBHOOK_BATCH_WINDOW_SECONDS', 2))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+# Arquivo para guardar notificações pendentes entre reinícios (use um volume persistente)
+WEBHOOK_SPOOL_PATH = os.getenv('WEBHOOK_SPOOL_PATH')
 
-last_scale_time = 0
+# Amostragem das métricas do host em segundo plano (usada no server_info dos webhooks)
+HOST_METRICS_INTERVAL_SECONDS = int(os.getenv('HOST_METRICS_INTERVAL_SECONDS', 5))
+HOST_METRICS_WINDOW_SIZE = int(os.getenv('HOST_METRICS_WINDOW_SIZE', 12))
 
-def get_server_info():
-    """Collect comprehensive server information including system specs and resource usage."""
+webhook_dispatcher = None
+leader_elector = None
+state_store = None
+# Acorda o loop quando chegam jobs para um serviço em zero réplicas (KeyspaceWakeListener ou QueueEventWatcher)
+wake_listener = None
+host_metrics = HostMetricsSampler(HOST_METRICS_INTERVAL_SECONDS, HOST_METRICS_WINDOW_SIZE)
+# Consultas à API do n8n compartilhadas por todos os alvos (thread própria, iniciada na primeira consulta)
+n8n_resolver = (
+    N8nExecutionResolver(N8N_API_URL, N8N_API_KEY, retry_seconds=N8N_API_RETRY_SECONDS, cache_size=WORKFLOW_CACHE_SIZE)
+    if WORKFLOW_BREAKDOWN_ENABLED and N8N_API_URL and N8N_API_KEY else None
+)
+
+def get_server_info(orchestrator=None):
+    """Collect server information: static host data, sampled resource usage and swarm totals."""
     try:
-        # Get basic system information
-        hostname = socket.gethostname()
-        
-        # Get local IP address
-        try:
-            # Connect to a remote address to determine local IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-        except Exception:
-            local_ip = "127.0.0.1"
-        
-        # Get platform information
-        system_info = {
-            "system": platform.system(),
-            "release": platform.release(),
-            "version": platform.version(),
-            "machine": platform.machine(),
-            "processor": platform.processor(),
-            "architecture": platform.architecture()[0],
-            "python_version": platform.python_version()
-        }
-        
-        # Get CPU information
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_count = psutil.cpu_count()
-        
-        # Get memory information
-        memory = psutil.virtual_memory()
-        memory_total_gb = round(memory.total / (1024**3), 2)
-        memory_used_gb = round(memory.used / (1024**3), 2)
-        memory_percent = round(memory.percent, 2)
-        
-        # Get disk information
-        disk = psutil.disk_usage('/')
-        disk_total_gb = round(disk.total / (1024**3), 2)
-        disk_used_gb = round(disk.used / (1024**3), 2)
-        disk_percent = round((disk.used / disk.total) * 100, 2)
-        
-        server_info = {
-            "hostname": hostname,
-            "local_ip": local_ip,
-            "platform": f"{system_info['system']} {system_info['release']} ({system_info['architecture']})",
-            "processor": system_info['processor'] or f"{system_info['machine']} processor",
-            "python_version": system_info['python_version'],
-            "cpu_count": cpu_count,
-            "cpu_percent": cpu_percent,
-            "memory_total_gb": memory_total_gb,
-            "memory_used_gb": memory_used_gb,
-            "memory_percent": memory_percent,
-            "disk_total_gb": disk_total_gb,
-            "disk_used_gb": disk_used_gb,
-            "disk_percent": disk_percent
-        }
-        
-        logging.debug(f"Informações do servidor coletadas: {hostname} ({local_ip})")
+        server_info = dict(get_static_host_info())
+        server_info.update(host_metrics.snapshot())
+
+        # O autoscaler roda no manager; incluir também a visão agregada do cluster
+        if orchestrator is not None:
+            swarm_resources = orchestrator.cluster_resources()
+            if swarm_resources:
+                server_info["swarm"] = {key: round(value, 2) for key, value in swarm_resources.items()}
+
         return server_info
-        
+
     except Exception as e:
         logging.error(f"Erro ao coletar informações do servidor: {e}")
         return {
@@ -120,179 +226,151 @@ def get_server_info():
             "disk_percent": 0
         }
 
-def send_webhook_notification(action, service_name, old_replicas, new_replicas, queue_length):
-    """Sends a webhook notification when scaling occurs."""
+def start_webhook_dispatcher(orchestrator):
+    """Starts the background webhook dispatcher if a webhook URL is configured."""
+    global webhook_dispatcher
     if not WEBHOOK_URL:
-        logging.debug("Webhook não configurado. Pulando notificação.")
+        return None
+
+    def add_server_info(payload):
+        # Executado na thread do dispatcher
+        payload["server_info"] = get_server_info(orchestrator)
+
+    host_metrics.start()
+    webhook_dispatcher = WebhookDispatcher(
+        WEBHOOK_URL, WEBHOOK_TOKEN,
+        timeout=WEBHOOK_TIMEOUT_SECONDS,
+        max_queue=WEBHOOK_QUEUE_SIZE,
+        batch_window_seconds=WEBHOOK_BATCH_WINDOW_SECONDS,
+        max_retries=WEBHOOK_MAX_RETRIES,
+        spool_path=WEBHOOK_SPOOL_PATH,
+        enrich_payload=add_server_info,
+        on_delivery=lambda seconds, delivered: metrics.PHASE_DURATION.labels('webhook_send').observe(seconds)
+    )
+    webhook_dispatcher.start()
+    logging.info(f"Notificações webhook habilitadas para {WEBHOOK_URL}.")
+    return webhook_dispatcher
+
+def is_leader():
+    """True when this replica may scale services (always, without leader election)."""
+    return leader_elector is None or leader_elector.is_leader
+
+def start_leader_election():
+    """Starts competing for the leader lease with a dedicated Redis connection."""
+    global leader_elector
+    metrics.IS_LEADER.set(0)
+    leader_elector = LeaderElector(
+        get_redis_connection(), LEADER_ELECTION_KEY, LEADER_LEASE_SECONDS,
+        on_change=lambda leader: metrics.IS_LEADER.set(1 if leader else 0)
+    )
+    leader_elector.start()
+    logging.info(f"Eleição de líder habilitada (chave '{LEADER_ELECTION_KEY}', lease {LEADER_LEASE_SECONDS}s, identidade '{leader_elector.identity}').")
+    return leader_elector
+
+def start_keyspace_wake_listener(targets):
+    """Starts the keyspace-notification listener that wakes services parked at zero replicas."""
+    global wake_listener
+    wake_listener = KeyspaceWakeListener(get_redis_connection(), REDIS_DB)
+    for target in targets:
+        if target.config.scale_to_zero_idle_seconds > 0:
+            wake_listener.add_queue(target.base_key)
+    wake_listener.enable_notifications()
+    wake_listener.start()
+    logging.info("Scale-to-zero: novos jobs de serviços em zero réplicas detectados por notificações de keyspace.")
+
+def load_scaler_state(targets):
+    """Restores cooldowns, stabilization window and metric windows persisted by a previous run."""
+    global state_store
+    state_store = ScalerStateStore(get_redis_connection(decode_responses=False), STATE_KEY_PREFIX, STATE_TTL_SECONDS, DECISION_LOG_SIZE)
+    try:
+        restored = state_store.load(targets)
+    except redis.exceptions.RedisError as e:
+        logging.error(f"Erro ao carregar estado persistido do autoscaler: {e}")
+        return
+    if restored:
+        logging.info(f"Estado persistido restaurado para: {', '.join(restored)}.")
+
+def save_scaler_state(targets):
+    """Persists the state of every target (leader only, so replicas never overwrite each other)."""
+    if not state_store or not is_leader():
         return
-    
     try:
-        # Collect server information
-        server_info = get_server_info()
-        
-        payload = {
-            "action": action,  # "scale_up" ou "scale_down"
-            "service_name": service_name,
-            "old_replicas": old_replicas,
-            "new_replicas": new_replicas,
-            "queue_length": queue_length,
-            "timestamp": time.time(),
-            "server_info": server_info
-        }
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        # Add authorization header if token is provided
-        if WEBHOOK_TOKEN:
-            headers["Authorization"] = f"Bearer {WEBHOOK_TOKEN}"
-        
-        response = requests.post(
-            WEBHOOK_URL,
-            data=json.dumps(payload),
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            logging.info(f"Notificação webhook enviada com sucesso para {action}: {old_replicas} -> {new_replicas} réplicas")
-        else:
-            logging.warning(f"Webhook retornou status {response.status_code}: {response.text}")
-            
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Erro ao enviar notificação webhook: {e}")
-    except Exception as e:
-        logging.error(f"Erro inesperado ao enviar webhook: {e}")
+        state_store.save(targets)
+    except redis.exceptions.RedisError as e:
+        logging.error(f"Erro ao persistir estado do autoscaler: {e}")
+
+def record_scaling_decision(target_name, action, old_replicas, new_replicas, queue_length, reason=None):
+    """Appends a scaling action to the persisted decision log, if enabled."""
+    if state_store:
+        state_store.record_decision(target_name, action, old_replicas, new_replicas, queue_length, reason)
+
+def send_webhook_notification(action, service_name, old_replicas, new_replicas, queue_length, workflow_breakdown=None):
+    """Queues a webhook notification when scaling occurs (delivered in the background)."""
+    if not webhook_dispatcher:
+        logging.debug("Webhook não configurado. Pulando notificação.")
+        return
+
+    payload = {
+        "action": action,  # "scale_up" ou "scale_down"
+        "service_name": service_name,
+        "old_replicas": old_replicas,
+        "new_replicas": new_replicas,
+        "queue_length": queue_length,
+        "timestamp": time.time()
+    }
+    if workflow_breakdown is not None:
+        payload["workflows"] = breakdown_to_dict(workflow_breakdown)
+    webhook_dispatcher.notify(payload)
 
-def get_redis_connection():
+def get_redis_connection(decode_responses=True):
     """Establishes a connection to Redis."""
     logging.info(f"Conectando ao Redis em {REDIS_HOST}:{REDIS_PORT} (database {REDIS_DB})")
-    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=REDIS_DB, decode_responses=True)
+    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=REDIS_DB, decode_responses=decode_responses)
 
-def get_queue_length(r_conn):
-    """Gets the length of the specified BullMQ waiting queue."""
-    key_to_check = f"{QUEUE_NAME_PREFIX}:{QUEUE_NAME}:wait"
-    length = None
-    try:
-        length = r_conn.llen(key_to_check)
-        if length is not None:
-            return length
-        
-        # Tentar padrão BullMQ v4+
-        key_to_check_v4 = f"{QUEUE_NAME_PREFIX}:{QUEUE_NAME}:waiting"
-        length = r_conn.llen(key_to_check_v4)
-        if length is not None:
-            logging.info(f"Usando padrão de chave BullMQ v4+ '{key_to_check_v4}' para comprimento da fila.")
-            return length
-
-        # Tentar padrão legado
-        key_to_check_legacy = f"{QUEUE_NAME_PREFIX}:{QUEUE_NAME}"
-        length = r_conn.llen(key_to_check_legacy)
-        if length is not None:
-            logging.info(f"Usando padrão de chave legado '{key_to_check_legacy}' para comprimento da fila.")
-            return length
-        
-        logging.warning(f"Padrões de chave da fila ('{key_to_check}', '{key_to_check_v4}', '{key_to_check_legacy}') não encontrados ou não são listas. Assumindo comprimento 0.")
-        return 0
-    except redis.exceptions.ResponseError as e:
-        logging.error(f"Erro do Redis ao verificar comprimento das chaves da fila: {e}. Assumindo comprimento 0.")
-        return 0
-    except Exception as e:
-        logging.error(f"Erro inesperado ao verificar comprimento da fila: {e}. Assumindo comprimento 0.")
-        return 0
+def get_async_redis_connection():
+    """Async Redis client used by the control loop for the per-tick queue reads."""
+    return redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=REDIS_DB,
+                               decode_responses=True, socket_timeout=REDIS_TIMEOUT_SECONDS)
+
+_orchestrators = {}
+
+def get_orchestrator(docker_client):
+    """Returns the Swarm orchestrator bound to a Docker client, creating it on first use."""
+    orchestrator = _orchestrators.get(id(docker_client))
+    if orchestrator is None:
+        orchestrator = SwarmOrchestrator(docker_client, CLUSTER_CACHE_TTL_SECONDS, FAILED_TASK_WINDOW_SECONDS, DockerApiMeter(),
+                                         DOCKER_API_TIMEOUT_SECONDS)
+        _orchestrators[id(docker_client)] = orchestrator
+    return orchestrator
+
+def get_cluster_cache(docker_client):
+    """Returns the cluster state cache shared by every lookup made through a Docker client."""
+    return get_orchestrator(docker_client).cluster_cache
 
 def get_current_replicas_swarm(docker_client, service_name):
     """Gets the current number of replicas for a Docker Swarm service."""
-    try:
-        service = docker_client.services.get(service_name)
-        current_replicas = service.attrs['Spec']['Mode']['Replicated']['Replicas']
-        logging.info(f"Serviço '{service_name}' possui {current_replicas} réplicas configuradas.")
-        return current_replicas
-    except docker.errors.NotFound:
-        logging.error(f"Serviço '{service_name}' não encontrado no Docker Swarm.")
-        return 0
-    except KeyError as e:
-        logging.error(f"Erro ao acessar configuração de réplicas do serviço '{service_name}': {e}")
-        return 0
-    except Exception as e:
-        logging.error(f"Erro inesperado ao obter réplicas do serviço '{service_name}': {e}")
+    service_state = get_orchestrator(docker_client).service_state(service_name)
+    if service_state is None:
         return 0
+    logging.info(f"Serviço '{service_name}' possui {service_state.replicas} réplicas configuradas.")
+    return service_state.replicas
 
 def get_running_tasks_count(docker_client, service_name):
     """Gets the actual number of running tasks for a Docker Swarm service."""
-    try:
-        service = docker_client.services.get(service_name)
-        tasks = service.tasks()
-        
-        running_count = 0
-        for task in tasks:
-            if task['Status']['State'] == 'running':
-                running_count += 1
-        
-        logging.info(f"Serviço '{service_name}' possui {running_count} tarefas em execução.")
-        return running_count
-    except docker.errors.NotFound:
-        logging.error(f"Serviço '{service_name}' não encontrado no Docker Swarm.")
-        return 0
-    except Exception as e:
-        logging.error(f"Erro ao obter tarefas em execução do serviço '{service_name}': {e}")
+    service_state = get_orchestrator(docker_client).service_state(service_name)
+    if service_state is None:
         return 0
+    logging.info(f"Serviço '{service_name}' possui {service_state.running_tasks} tarefas em execução.")
+    return service_state.running_tasks
 
 def get_swarm_resources(docker_client):
     """Get available CPU and memory resources from Docker Swarm nodes."""
-    try:
-        nodes = docker_client.nodes.list()
-        total_cpu_nano = 0
-        total_memory_bytes = 0
-        available_cpu_nano = 0
-        available_memory_bytes = 0
-        
-        for node in nodes:
-            # Verificar se o nó está ativo e disponível
-            if node.attrs['Status']['State'] == 'ready' and node.attrs['Spec']['Availability'] == 'active':
-                # Recursos totais do nó
-                resources = node.attrs['Status']['Resources']
-                node_cpu_nano = resources['NanoCPUs']
-                node_memory_bytes = resources['MemoryBytes']
-                
-                total_cpu_nano += node_cpu_nano
-                total_memory_bytes += node_memory_bytes
-                
-                # Recursos reservados (usados por tarefas)
-                reserved_cpu_nano = 0
-                reserved_memory_bytes = 0
-                
-                # Obter tarefas em execução no nó
-                tasks = docker_client.api.tasks(filters={'node': node.id, 'desired-state': 'running'})
-                for task in tasks:
-                    if 'Resources' in task['Spec'] and 'Reservations' in task['Spec']['Resources']:
-                        reservations = task['Spec']['Resources']['Reservations']
-                        if 'NanoCPUs' in reservations:
-                            reserved_cpu_nano += reservations['NanoCPUs']
-                        if 'MemoryBytes' in reservations:
-                            reserved_memory_bytes += reservations['MemoryBytes']
-                
-                # Calcular recursos disponíveis no nó
-                available_cpu_nano += max(0, node_cpu_nano - reserved_cpu_nano)
-                available_memory_bytes += max(0, node_memory_bytes - reserved_memory_bytes)
-        
-        return {
-            'total_cpu_cores': total_cpu_nano / 1_000_000_000,  # Converter para cores
-            'total_memory_gb': total_memory_bytes / (1024**3),  # Converter para GB
-            'available_cpu_cores': available_cpu_nano / 1_000_000_000,
-            'available_memory_gb': available_memory_bytes / (1024**3)
-        }
-        
-    except Exception as e:
-        logging.error(f"Erro ao obter recursos do Docker Swarm: {e}")
-        return None
+    return get_orchestrator(docker_client).cluster_resources()
 
 def get_service_resource_limits(docker_client, service_name):
     """Get CPU and memory limits configured for a Docker Swarm service."""
     try:
-        service = docker_client.services.get(service_name)
-        service_spec = service.attrs['Spec']
+        service_spec = get_cluster_cache(docker_client).service(service_name)['Spec']
         
         # Verificar se há limites de recursos definidos
         if 'TaskTemplate' in service_spec and 'Resources' in service_spec['TaskTemplate']:
@@ -328,158 +406,510 @@ def get_service_resource_limits(docker_client, service_name):
         logging.error(f"Erro ao obter limites de recursos do serviço '{service_name}': {e}")
         return None
 
+def get_schedulable_replicas(docker_client, service_name, additional_replicas):
+    """Returns how many of the additional replicas Swarm can actually place, simulating placement per node."""
+    schedulable = get_orchestrator(docker_client).schedulable_replicas(service_name, additional_replicas)
+    logging.info(f"Verificação de posicionamento: {schedulable} de {additional_replicas} réplica(s) adicional(is) cabem nos nós elegíveis.")
+    return schedulable
+
 def check_resources_for_scaling(docker_client, service_name, additional_replicas):
     """Check if there are enough resources available for scaling up."""
-    try:
-        # Obter recursos disponíveis no cluster
-        swarm_resources = get_swarm_resources(docker_client)
-        if not swarm_resources:
-            logging.warning("Não foi possível obter informações de recursos do Swarm. Permitindo escalonamento.")
-            return True
-        
-        # Obter limites de recursos do serviço
-        service_limits = get_service_resource_limits(docker_client, service_name)
-        if not service_limits:
-            logging.warning("Não foi possível obter limites de recursos do serviço. Permitindo escalonamento.")
-            return True
-        
-        cpu_limit = service_limits['cpu_limit_cores']
-        memory_limit = service_limits['memory_limit_gb']
-        
-        # Se não há limites definidos, permitir escalonamento
-        if cpu_limit is None and memory_limit is None:
-            logging.info("Nenhum limite de recursos definido para o serviço. Permitindo escalonamento.")
-            return True
-        
-        # Calcular recursos necessários para as réplicas adicionais
-        required_cpu = (cpu_limit or 0) * additional_replicas
-        required_memory = (memory_limit or 0) * additional_replicas
-        
-        available_cpu = swarm_resources['available_cpu_cores']
-        available_memory = swarm_resources['available_memory_gb']
-        
-        # Verificar se há recursos suficientes
-        cpu_sufficient = cpu_limit is None or required_cpu <= available_cpu
-        memory_sufficient = memory_limit is None or required_memory <= available_memory
-        
-        logging.info(f"Verificação de recursos para {additional_replicas} réplica(s) adicional(is):")
-        if cpu_limit:
-            logging.info(f"  CPU: {required_cpu:.2f} cores necessárias, {available_cpu:.2f} cores disponíveis")
-        if memory_limit:
-            logging.info(f"  Memória: {required_memory:.2f} GB necessária, {available_memory:.2f} GB disponível")
-        
-        if not cpu_sufficient:
-            logging.warning(f"Recursos de CPU insuficientes para escalonamento. Necessário: {required_cpu:.2f} cores, Disponível: {available_cpu:.2f} cores")
-        
-        if not memory_sufficient:
-            logging.warning(f"Recursos de memória insuficientes para escalonamento. Necessário: {required_memory:.2f} GB, Disponível: {available_memory:.2f} GB")
-        
-        return cpu_sufficient and memory_sufficient
-        
-    except Exception as e:
-        logging.error(f"Erro ao verificar recursos para escalonamento: {e}")
-        # Em caso de erro, permitir escalonamento para não bloquear o sistema
-        return True
+    schedulable = get_schedulable_replicas(docker_client, service_name, additional_replicas)
+    if schedulable < additional_replicas:
+        logging.warning(f"Recursos insuficientes para escalonamento. Necessário: {additional_replicas} réplica(s), posicionáveis: {schedulable}")
+        return False
+    return True
 
 def scale_service_swarm(docker_client, service_name, replicas):
     """Scales a Docker Swarm service to the specified number of replicas."""
-    try:
-        service = docker_client.services.get(service_name)
-        
-        # Atualizar o serviço com o novo número de réplicas
-        service.update(
-            mode={'Replicated': {'Replicas': replicas}}
+    return get_orchestrator(docker_client).scale(service_name, replicas)
+
+def get_default_target_settings():
+    """Scaling settings taken from the environment, used as defaults for every target."""
+    return {
+        'queue_prefix': QUEUE_NAME_PREFIX,
+        'min_replicas': MIN_REPLICAS,
+        'max_replicas': MAX_REPLICAS,
+        'scale_up_queue_threshold': SCALE_UP_QUEUE_THRESHOLD,
+        'scale_down_queue_threshold': SCALE_DOWN_QUEUE_THRESHOLD,
+        'target_jobs_per_replica': TARGET_JOBS_PER_REPLICA,
+        'max_scale_up_step': MAX_SCALE_UP_STEP,
+        'max_scale_down_step': MAX_SCALE_DOWN_STEP,
+        'scale_up_cooldown_seconds': SCALE_UP_COOLDOWN_SECONDS,
+        'scale_down_cooldown_seconds': SCALE_DOWN_COOLDOWN_SECONDS,
+        'scale_down_stabilization_seconds': SCALE_DOWN_STABILIZATION_SECONDS,
+        'predictive_scaling': PREDICTIVE_SCALING,
+        'predictive_horizon_seconds': PREDICTIVE_HORIZON_SECONDS,
+        'metrics_window_size': METRICS_WINDOW_SIZE,
+        'drain_aware_scale_down': DRAIN_AWARE_SCALE_DOWN,
+        'scale_down_drain_timeout_seconds': SCALE_DOWN_DRAIN_TIMEOUT_SECONDS,
+        'wait_slo_seconds': WAIT_SLO_SECONDS,
+        'worker_concurrency': WORKER_CONCURRENCY,
+        'schedule': SCHEDULE_WINDOWS,
+        'learned_seasonality': LEARNED_SEASONALITY,
+        'seasonality_lead_seconds': SEASONALITY_LEAD_SECONDS,
+        'seasonality_min_days': SEASONALITY_MIN_DAYS,
+        'convergence_timeout_seconds': CONVERGENCE_TIMEOUT_SECONDS,
+        'target_cpu_percent': TARGET_CPU_PERCENT,
+        'target_memory_percent': TARGET_MEMORY_PERCENT,
+        'scale_to_zero_idle_seconds': SCALE_TO_ZERO_IDLE_SECONDS,
+        'wake_replicas': SCALE_TO_ZERO_WAKE_REPLICAS,
+    }
+
+def load_target_configs():
+    """Returns the scaling targets from SCALING_CONFIG_FILE or from the single-queue environment variables."""
+    defaults = get_default_target_settings()
+    if SCALING_CONFIG_FILE:
+        return load_scaling_targets(SCALING_CONFIG_FILE, defaults)
+
+    if not N8N_WORKER_SERVICE_NAME:
+        logging.error("CRÍTICO: Variável de ambiente N8N_WORKER_SERVICE_NAME não está definida. O autoscaler não pode funcionar corretamente.")
+        logging.error("Por favor, defina N8N_WORKER_SERVICE_NAME com o nome do serviço Docker Swarm ou SCALING_CONFIG_FILE.")
+        return []
+    return [TargetConfig(name=N8N_WORKER_SERVICE_NAME, queue_name=QUEUE_NAME, service_name=N8N_WORKER_SERVICE_NAME, **defaults)]
+
+def evaluate_target(orchestrator, target, snapshot, current_time):
+    """Runs one scaling decision for a queue -> service pair. Returns True if the service was scaled."""
+    cfg = target.config
+    service_name = cfg.service_name
+
+    queue_len = snapshot_waiting(snapshot)
+    active_jobs = snapshot.active
+    with target.state.lock:
+        target.metrics_window.add_sample(
+            current_time, queue_len, active_jobs, snapshot.completed, snapshot.delayed, snapshot.enqueued, snapshot.paused
         )
-        
-        logging.info(f"Serviço '{service_name}' escalado para {replicas} réplicas com sucesso.")
-        return True
-        
-    except docker.errors.NotFound:
-        logging.error(f"Serviço '{service_name}' não encontrado no Docker Swarm.")
-        return False
-    except docker.errors.APIError as e:
-        logging.error(f"Erro da API Docker ao escalar serviço '{service_name}' para {replicas} réplicas: {e}")
+    metrics.record_queue_snapshot(cfg.name, snapshot)
+    with metrics.PHASE_DURATION.labels('docker_api').time():
+        # Uma única leitura do serviço por ciclo, compartilhada por réplicas e tarefas
+        service_state = orchestrator.service_state(service_name)
+    if service_state is None:
         return False
-    except Exception as e:
-        logging.error(f"Erro inesperado ao escalar serviço '{service_name}' para {replicas} réplicas: {e}")
+    current_reps = service_state.replicas
+    running_tasks = service_state.running_tasks
+    leader = is_leader()
+    previous_reps = target.observed_replicas
+    target.observed_replicas = current_reps
+    if not leader and previous_reps is not None and current_reps != previous_reps:
+        # Seguidora: registrar o escalonamento feito pela líder para herdar os cooldowns numa troca de líder
+        target.state.mark_scaled(current_time, "scale_up" if current_reps > previous_reps else "scale_down")
+    metrics.REPLICAS_CONFIGURED.labels(cfg.name).set(current_reps)
+    metrics.REPLICAS_RUNNING.labels(cfg.name).set(running_tasks)
+    if wake_listener and cfg.scale_to_zero_idle_seconds > 0:
+        if current_reps == 0:
+            wake_listener.arm(target.base_key)
+        else:
+            wake_listener.disarm(target.base_key)
+    cold_start = observe_cold_start(target, service_state.task_states, running_tasks, current_time)
+    if cold_start is not None:
+        metrics.COLD_START_SECONDS.labels(cfg.name).observe(cold_start)
+        logging.info(f"[{cfg.name}] Partida a frio: primeiro worker em execução {cold_start:.1f}s após acordar o serviço.")
+
+    logging.info(f"[{cfg.name}] Comprimento da Fila: {queue_len}, Jobs Ativos: {active_jobs}, Atrasados: {snapshot.delayed}, Falhos: {snapshot.failed}{' (PAUSADA)' if snapshot.is_paused else ''}, Réplicas Configuradas: {current_reps}, Tarefas Executando: {running_tasks}")
+    if service_state.task_states is not None:
+        metrics.record_task_states(cfg.name, service_state.task_states)
+        update_text = f", atualização: {service_state.update_state}" if service_state.update_state else ""
+        logging.info(f"[{cfg.name}] Tarefas: {format_task_states(service_state.task_states)}{update_text}")
+
+    latency = None
+    if target.latency_sampler:
+        with metrics.PHASE_DURATION.labels('job_latency').time():
+            latency = target.latency_sampler.sample(current_time)
+        if latency:
+            metrics.record_job_latency(cfg.name, latency)
+            processing_text = (f"p50 {latency.processing_p50:.1f}s, p95 {latency.processing_p95:.1f}s ({latency.processing_samples} jobs)"
+                               if latency.processing_samples else "sem jobs concluídos")
+            logging.info(f"[{cfg.name}] Job mais antigo aguardando há {latency.oldest_wait_seconds:.0f}s. Processamento: {processing_text}")
+
+    if target.workflow_analyzer:
+        with metrics.PHASE_DURATION.labels('workflow_backlog').time():
+            breakdown = target.workflow_analyzer.analyze(current_time)
+        if breakdown:
+            target.workflow_breakdown = breakdown
+            metrics.record_workflow_breakdown(cfg.name, breakdown)
+            if queue_len > 0 or active_jobs > 0:
+                logging.info(f"[{cfg.name}] {format_breakdown(breakdown)}")
+
+    if target.seasonality is not None:
+        with target.state.lock:
+            target.seasonality.observe(current_time, queue_len + active_jobs)
+    prewarm_min = prewarm_min_replicas(target, current_time)
+    if prewarm_min > cfg.min_replicas and prewarm_min != target.prewarm_min_replicas:
+        logging.info(f"[{cfg.name}] Pré-aquecimento: mínimo de réplicas elevado para {prewarm_min} (configurado: {cfg.min_replicas}).")
+    elif prewarm_min <= cfg.min_replicas < target.prewarm_min_replicas:
+        logging.info(f"[{cfg.name}] Fim do pré-aquecimento: mínimo de réplicas volta a {cfg.min_replicas}.")
+    target.prewarm_min_replicas = prewarm_min
+
+    utilization = None
+    if cfg.target_cpu_percent > 0 or cfg.target_memory_percent > 0:
+        with metrics.PHASE_DURATION.labels('worker_stats').time():
+            utilization = orchestrator.worker_utilization(service_name)
+        if utilization:
+            metrics.record_worker_utilization(cfg.name, utilization)
+            cpu_text = f"{utilization.cpu_percent:.0f}%" if utilization.cpu_percent is not None else "n/d"
+            memory_text = f"{utilization.memory_percent:.0f}%" if utilization.memory_percent is not None else "n/d"
+            logging.info(f"[{cfg.name}] Utilização dos workers (suavizada): CPU {cpu_text}, memória {memory_text} ({utilization.sampled} de {utilization.running} containers lidos)")
+
+    def read_busy_workers():
+        # O Swarm remove tarefas arbitrárias; reduzir só enquanto houver workers sem jobs ativos
+        with metrics.PHASE_DURATION.labels('worker_locks').time():
+            return target.collector.busy_workers(cfg.worker_concurrency) if active_jobs else 0
+
+    decision, busy_workers = plan_scaling(
+        target, queue_len, active_jobs, service_state, current_time, latency, utilization, read_busy_workers
+    )
+    if decision.reason == 'converging' and decision.desired_replicas > current_reps:
+        metrics.SCALE_UP_BLOCKED.labels(cfg.name, 'converging').inc()
+    if busy_workers is not None:
+        metrics.BUSY_WORKERS.labels(cfg.name).set(busy_workers)
+    if decision.reason == 'busy_workers':
+        metrics.SCALE_DOWN_DEFERRED.labels(cfg.name).inc()
+    metrics.REPLICAS_DESIRED.labels(cfg.name).set(decision.desired_replicas)
+    state = target.state
+
+    if decision.direction and not leader:
+        logging.info(f"[{cfg.name}] Réplica seguidora: escalonamento {current_reps} -> {decision.new_replicas} fica a cargo da líder.")
         return False
 
+    if decision.reason == 'cooldown' and decision.desired_replicas > current_reps:
+        metrics.SCALE_UP_BLOCKED.labels(cfg.name, 'cooldown').inc()
+
+    if decision.direction == 'up':
+        new_replicas = decision.new_replicas
+        additional_replicas = new_replicas - current_reps
+
+        logging.info(f"[{cfg.name}] Condição atendida para ESCALAR PARA CIMA. Fila: {queue_len} (limite {cfg.scale_up_queue_threshold}). Réplicas: {current_reps} -> {new_replicas} (máx. {cfg.max_replicas}).")
+
+        # Limitar o passo ao número de réplicas que o Swarm consegue posicionar
+        with metrics.PHASE_DURATION.labels('resource_check').time():
+            schedulable = orchestrator.schedulable_replicas(service_name, additional_replicas)
+        if schedulable <= 0:
+            logging.warning(f"[{cfg.name}] Escalonamento para cima cancelado devido a recursos insuficientes. Réplicas mantidas em {current_reps}.")
+            metrics.SCALE_UP_BLOCKED.labels(cfg.name, 'resources').inc()
+            record_scaling_decision(cfg.name, "scale_up_blocked", current_reps, new_replicas, queue_len, 'resources')
+            return False
+        if schedulable < additional_replicas:
+            new_replicas = current_reps + schedulable
+            logging.warning(f"[{cfg.name}] Recursos suficientes apenas para {schedulable} de {additional_replicas} réplica(s). Escalando para {new_replicas}.")
+        with metrics.PHASE_DURATION.labels('docker_scale').time():
+            scaled = orchestrator.scale(service_name, new_replicas)
+        if scaled:
+            metrics.SCALE_DECISIONS.labels(cfg.name, 'up').inc()
+            send_webhook_notification("scale_up", service_name, current_reps, new_replicas, queue_len, target.workflow_breakdown)
+            record_scaling_decision(cfg.name, "scale_up", current_reps, new_replicas, queue_len, decision.reason)
+            state.mark_scaled(current_time, "scale_up")
+            target.observed_replicas = new_replicas
+            return True
+    elif decision.direction == 'down':
+        new_replicas = decision.new_replicas
+        logging.info(f"[{cfg.name}] Condição atendida para ESCALAR PARA BAIXO. Fila: {queue_len} < {cfg.scale_down_queue_threshold}. Réplicas: {current_reps} -> {new_replicas} (mín. {cfg.min_replicas}).")
+        if new_replicas == 0 and wake_listener:
+            # Armar antes de reduzir para não perder um job que chegue durante o escalonamento
+            wake_listener.arm(target.base_key)
+        with metrics.PHASE_DURATION.labels('docker_scale').time():
+            scaled = orchestrator.scale(service_name, new_replicas)
+        if scaled:
+            metrics.SCALE_DECISIONS.labels(cfg.name, 'down').inc()
+            send_webhook_notification("scale_down", service_name, current_reps, new_replicas, queue_len)
+            record_scaling_decision(cfg.name, "scale_down", current_reps, new_replicas, queue_len, decision.reason)
+            state.mark_scaled(current_time, "scale_down")
+            target.observed_replicas = new_replicas
+            return True
+
+    return False
+
+async def read_queue_snapshots(r_async, targets, event_watcher, triggered_queues, current_time):
+    """Reads the state of every target queue, using one pipeline for all queues due for a full read."""
+    snapshots = {}
+    due = []
+    for target in targets:
+        # No modo de eventos, a leitura completa da fila é apenas uma reconciliação periódica
+        if (event_watcher and target.base_key in triggered_queues
+                and (current_time - target.last_reconcile_time) < QUEUE_RECONCILE_INTERVAL_SECONDS
+                and event_watcher.current_snapshot(target.base_key) is not None):
+            snapshots[target.config.name] = event_watcher.current_snapshot(target.base_key)
+        else:
+            due.append(target)
+
+    if due:
+        for target, snapshot in zip(due, await collect_snapshots_async(r_async, [target.collector for target in due])):
+            snapshots[target.config.name] = snapshot
+            target.last_reconcile_time = current_time
+            if event_watcher:
+                event_watcher.reconcile(target.base_key, snapshot)
+        stale = [target for target in due if target.collector.needs_layout_check(current_time)]
+        if stale:
+            await asyncio.get_running_loop().run_in_executor(None, refresh_queue_layouts, stale)
+    return snapshots
+
+def refresh_queue_layouts(targets):
+    """Detects the wait key again and points the job samplers of each target at it."""
+    for target in targets:
+        wait_key = target.collector.detect_layout()
+        if target.latency_sampler:
+            target.latency_sampler.wait_key = wait_key
+        if target.workflow_analyzer:
+            target.workflow_analyzer.wait_key = wait_key
+
+def attach_redis(r_conn, targets, event_watcher):
+    """Creates the queue collectors (layout detection) for every target on a Redis connection."""
+    for target in targets:
+        target.collector = QueueStateCollector(r_conn, target.config.queue_prefix, target.config.queue_name)
+        if JOB_LATENCY_METRICS or target.config.wait_slo_seconds > 0:
+            target.latency_sampler = JobLatencySampler(
+                r_conn, target.base_key, target.collector.wait_key, JOB_LATENCY_SAMPLE_SIZE
+            )
+        if WORKFLOW_BREAKDOWN_ENABLED:
+            target.workflow_analyzer = WorkflowBacklogAnalyzer(
+                r_conn, target.base_key, target.collector.wait_key, WORKFLOW_SAMPLE_SIZE, WORKFLOW_CACHE_SIZE,
+                WORKFLOW_TOP_N, n8n_resolver, N8N_API_LOOKUPS_PER_TICK
+            )
+    if event_watcher:
+        event_watcher.r_conn = r_conn
+
+def check_stop_grace_periods(orchestrator, targets):
+    """Warns when a worker service would kill in-flight jobs before n8n's graceful shutdown ends."""
+    for target in targets:
+        cfg = target.config
+        grace_period = orchestrator.stop_grace_period(cfg.service_name)
+        if grace_period is not None and grace_period < N8N_GRACEFUL_SHUTDOWN_TIMEOUT:
+            logging.warning(f"[{cfg.name}] stop_grace_period do serviço '{cfg.service_name}' ({grace_period:.0f}s) é menor que "
+                            f"N8N_GRACEFUL_SHUTDOWN_TIMEOUT ({N8N_GRACEFUL_SHUTDOWN_TIMEOUT}s). Jobs em andamento podem ser "
+                            f"interrompidos na redução; defina 'stop_grace_period' no stack.")
+
+def create_orchestrator(targets):
+    """Builds the orchestrator backend selected by ORCHESTRATOR_BACKEND."""
+    if ORCHESTRATOR_BACKEND == 'fake':
+        logging.info("Usando orquestrador simulado em memória (ORCHESTRATOR_BACKEND=fake). Nenhum serviço real será alterado.")
+        return FakeOrchestrator({target.config.service_name: target.config.min_replicas for target in targets})
+    if ORCHESTRATOR_BACKEND != 'swarm':
+        raise ValueError(f"ORCHESTRATOR_BACKEND inválido: '{ORCHESTRATOR_BACKEND}' (use 'swarm' ou 'fake')")
+
+    # Pool de conexões do tamanho das threads que usam o cliente: conexões além do pool são
+    # descartadas pelo urllib3 em vez de reaproveitadas (keep-alive com o socket proxy)
+    docker_cl = docker.from_env(max_pool_size=DOCKER_THREAD_POOL_SIZE + WORKER_STATS_CONCURRENCY + 2)
+    # Testar conexão Docker
+    docker_cl.ping()
+    logging.info("Conectado com sucesso ao daemon Docker.")
+    orchestrator = get_orchestrator(docker_cl)
+    if any(target.config.target_cpu_percent > 0 or target.config.target_memory_percent > 0 for target in targets):
+        orchestrator.enable_worker_stats(WorkerStatsSampler(
+            docker_cl, WORKER_STATS_CONCURRENCY, WORKER_STATS_TIMEOUT_SECONDS,
+            parse_node_api_urls(NODE_DOCKER_API_URLS), WORKER_STATS_SMOOTHING, orchestrator.api_meter,
+            WORKER_STATS_MAX_AGE_SECONDS
+        ))
+        logging.info("Coleta de CPU/memória dos workers habilitada (stats one-shot por tarefa).")
+    if CLUSTER_EVENTS_ENABLED:
+        orchestrator.start_event_listener()
+        logging.info("Cache do cluster atualizado pela API de eventos do Docker.")
+    return orchestrator
+
 def main():
-    global last_scale_time
-    
-    if not N8N_WORKER_SERVICE_NAME:
-        logging.error("CRÍTICO: Variável de ambiente N8N_WORKER_SERVICE_NAME não está definida. O autoscaler não pode funcionar corretamente.")
-        logging.error("Por favor, defina N8N_WORKER_SERVICE_NAME com o nome do serviço Docker Swarm.")
+    try:
+        target_configs = load_target_configs()
+        targets = [ScalingTarget(cfg) for cfg in target_configs]
+    except (OSError, ValueError, TypeError, yaml.YAMLError) as e:
+        logging.error(f"CRÍTICO: Falha ao carregar configuração de escalonamento: {e}")
         return
+    if not targets:
+        return
+
+    global wake_listener
+    scale_to_zero = any(target.config.scale_to_zero_idle_seconds > 0 for target in targets)
+    event_watcher = None
 
     try:
         r_conn = get_redis_connection()
-        docker_cl = docker.from_env()
-        # Testar conexão Docker
-        docker_cl.ping()
-        logging.info("Conectado com sucesso ao daemon Docker.")
+        if EVENT_DRIVEN_SCALING or (scale_to_zero and SCALE_TO_ZERO_WAKE_MODE == 'events'):
+            # Sem o modo orientado a eventos, o stream só é usado para acordar serviços em zero réplicas
+            event_watcher = QueueEventWatcher(r_conn, EVENT_MIN_INTERVAL_SECONDS, wake_only=not EVENT_DRIVEN_SCALING)
+            for target in targets:
+                event_watcher.add_queue(target.base_key)
+            if scale_to_zero:
+                wake_listener = event_watcher
+        attach_redis(r_conn, targets, event_watcher)
+        if STATE_PERSISTENCE_ENABLED:
+            load_scaler_state(targets)
+        orchestrator = create_orchestrator(targets)
+        check_stop_grace_periods(orchestrator, targets)
+        start_webhook_dispatcher(orchestrator)
+        if METRICS_PORT:
+            metrics.start_metrics_server(METRICS_PORT)
+        if LEADER_ELECTION_ENABLED:
+            start_leader_election()
+        if scale_to_zero and wake_listener is None:
+            start_keyspace_wake_listener(targets)
     except Exception as e:
         logging.error(f"CRÍTICO: Falha ao conectar ao Redis ou Docker: {e}")
         return
 
-    logging.info(f"Autoscaler iniciado. Monitorando serviço n8n worker '{N8N_WORKER_SERVICE_NAME}' no Docker Swarm.")
-    logging.info(f"  Réplicas Mínimas: {MIN_REPLICAS}, Réplicas Máximas: {MAX_REPLICAS}")
-    logging.info(f"  Limite para Escalar Para Cima: >{SCALE_UP_QUEUE_THRESHOLD}")
-    logging.info(f"  Limite para Escalar Para Baixo: <{SCALE_DOWN_QUEUE_THRESHOLD}")
-    logging.info(f"  Intervalo de Polling: {POLLING_INTERVAL_SECONDS}s, Cooldown: {COOLDOWN_PERIOD_SECONDS}s")
-
-    while True:
-        try:
-            current_time = time.time()
-            if (current_time - last_scale_time) < COOLDOWN_PERIOD_SECONDS:
-                remaining_cooldown = COOLDOWN_PERIOD_SECONDS - (current_time - last_scale_time)
-                logging.info(f"Em período de cooldown. Próxima verificação em {remaining_cooldown:.0f}s.")
-                time.sleep(POLLING_INTERVAL_SECONDS)
-                continue
-
-            queue_len = get_queue_length(r_conn)
-            current_reps = get_current_replicas_swarm(docker_cl, N8N_WORKER_SERVICE_NAME)
-            running_tasks = get_running_tasks_count(docker_cl, N8N_WORKER_SERVICE_NAME)
-
-            logging.info(f"Comprimento da Fila: {queue_len}, Réplicas Configuradas: {current_reps}, Tarefas Executando: {running_tasks}")
-
-            scaled = False
-            if queue_len > SCALE_UP_QUEUE_THRESHOLD and current_reps < MAX_REPLICAS:
-                new_replicas = min(current_reps + 1, MAX_REPLICAS)
-                additional_replicas = new_replicas - current_reps
-                
-                logging.info(f"Condição atendida para ESCALAR PARA CIMA. Fila: {queue_len} > {SCALE_UP_QUEUE_THRESHOLD}. Réplicas: {current_reps} < {MAX_REPLICAS}.")
-                
-                # Verificar se há recursos suficientes antes de escalar
-                if check_resources_for_scaling(docker_cl, N8N_WORKER_SERVICE_NAME, additional_replicas):
-                    if scale_service_swarm(docker_cl, N8N_WORKER_SERVICE_NAME, new_replicas):
-                        send_webhook_notification("scale_up", N8N_WORKER_SERVICE_NAME, current_reps, new_replicas, queue_len)
-                        last_scale_time = current_time
-                        scaled = True
-                else:
-                    logging.warning(f"Escalonamento para cima cancelado devido a recursos insuficientes. Réplicas mantidas em {current_reps}.")
-            elif queue_len < SCALE_DOWN_QUEUE_THRESHOLD and current_reps > MIN_REPLICAS:
-                new_replicas = max(current_reps - 1, MIN_REPLICAS)
-                logging.info(f"Condição atendida para ESCALAR PARA BAIXO. Fila: {queue_len} < {SCALE_DOWN_QUEUE_THRESHOLD}. Réplicas: {current_reps} > {MIN_REPLICAS}.")
-                if scale_service_swarm(docker_cl, N8N_WORKER_SERVICE_NAME, new_replicas):
-                    send_webhook_notification("scale_down", N8N_WORKER_SERVICE_NAME, current_reps, new_replicas, queue_len)
-                    last_scale_time = current_time
-                    scaled = True
-            
-            if not scaled:
-                logging.info("Nenhuma ação de escalonamento necessária.")
+    logging.info(f"Autoscaler iniciado. Monitorando {len(targets)} serviço(s) n8n worker no Docker Swarm.")
+    for target in targets:
+        cfg = target.config
+        logging.info(f"  [{cfg.name}] Fila '{target.base_key}' -> Serviço '{cfg.service_name}'")
+        logging.info(f"    Réplicas Mínimas: {cfg.min_replicas}, Réplicas Máximas: {cfg.max_replicas}")
+        logging.info(f"    Limite para Escalar Para Cima: >{cfg.scale_up_queue_threshold}, Para Baixo: <{cfg.scale_down_queue_threshold}")
+        logging.info(f"    Jobs por Réplica: {cfg.target_jobs_per_replica}, Passo Máximo: +{cfg.max_scale_up_step}/-{cfg.max_scale_down_step}")
+        logging.info(f"    Cooldown: +{cfg.scale_up_cooldown_seconds}s/-{cfg.scale_down_cooldown_seconds}s, Janela de Estabilização (redução): {cfg.scale_down_stabilization_seconds}s")
+        for window in target.schedule_windows:
+            logging.info(f"    Pré-aquecimento: '{window.cron.expression}' por {window.duration_seconds // 60} min com mínimo de {window.min_replicas} réplicas")
+        if target.seasonality is not None:
+            logging.info(f"    Sazonalidade aprendida: antecipação de {cfg.seasonality_lead_seconds}s após {cfg.seasonality_min_days} dia(s) de histórico")
+        if cfg.wait_slo_seconds > 0:
+            logging.info(f"    Modo SLO: espera máxima de {cfg.wait_slo_seconds}s (concorrência por worker: {cfg.worker_concurrency})")
+        if cfg.scale_to_zero_idle_seconds > 0:
+            logging.info(f"    Scale-to-zero: 0 réplicas após {cfg.scale_to_zero_idle_seconds}s ociosa, acorda com {max(cfg.wake_replicas, cfg.min_replicas, 1)}")
+    logging.info(f"  Intervalo de Polling: {POLLING_INTERVAL_SECONDS}s")
+    if event_watcher:
+        logging.info(f"  Modo orientado a eventos: streams {', '.join(event_watcher.stream_keys())}, reconciliação a cada {QUEUE_RECONCILE_INTERVAL_SECONDS}s")
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(SCALING_CONCURRENCY, len(targets))))
+    docker_executor = ThreadPoolExecutor(max_workers=DOCKER_THREAD_POOL_SIZE, thread_name_prefix='docker-api')
+    try:
+        asyncio.run(control_loop(r_conn, orchestrator, targets, event_watcher, executor, docker_executor))
+    finally:
+        if leader_elector:
+            leader_elector.stop()
+        # Threads presas em chamadas ao Docker não devem segurar o encerramento
+        executor.shutdown(wait=False, cancel_futures=True)
+        docker_executor.shutdown(wait=False, cancel_futures=True)
+
+async def prefetch_cluster_state(orchestrator, targets, docker_executor):
+    """Warms the orchestrator view (nodes, tasks, service specs) with concurrent Docker calls."""
+    loop = asyncio.get_running_loop()
+    calls = orchestrator.prefetch_calls([target.config.service_name for target in targets])
+    results = await asyncio.gather(*(
+        asyncio.wait_for(loop.run_in_executor(docker_executor, call), DOCKER_API_TIMEOUT_SECONDS)
+        for _, call in calls
+    ), return_exceptions=True)
+    for (description, _), result in zip(calls, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logging.warning(f"API do Docker não respondeu em {DOCKER_API_TIMEOUT_SECONDS:.0f}s ao ler {description}.")
+        elif isinstance(result, Exception):
+            logging.warning(f"Erro ao ler {description} da API do Docker: {result}")
+
+async def timed(phase, awaitable):
+    """Awaits a coroutine while recording its duration under a PHASE_DURATION label."""
+    with metrics.PHASE_DURATION.labels(phase).time():
+        return await awaitable
+
+async def run_tick(r_async, orchestrator, targets, event_watcher, triggered_queues, executor, docker_executor, evaluations):
+    """One control-loop tick: queue and swarm state fetched concurrently, then every target evaluated."""
+    loop = asyncio.get_running_loop()
+    current_time = time.time()
+    orchestrator.begin_tick()
+
+    # As métricas são coletadas mesmo durante o cooldown para que a decisão use dados recentes
+    snapshots, _ = await asyncio.gather(
+        timed('redis_read', asyncio.wait_for(
+            read_queue_snapshots(r_async, targets, event_watcher, triggered_queues, current_time), REDIS_TIMEOUT_SECONDS
+        )),
+        timed('cluster_prefetch', prefetch_cluster_state(orchestrator, targets, docker_executor))
+    )
+
+    pending = {}
+    for target in targets:
+        name = target.config.name
+        previous = evaluations.get(name)
+        if previous is not None and not previous.done():
+            logging.warning(f"[{name}] Avaliação anterior ainda em andamento. Pulando este ciclo.")
+            continue
+        evaluations[name] = loop.run_in_executor(executor, evaluate_target, orchestrator, target, snapshots[name], current_time)
+        # shield: ao expirar o tempo limite a avaliação continua na thread e bloqueia o próximo ciclo deste alvo
+        pending[name] = asyncio.wait_for(asyncio.shield(evaluations[name]), TARGET_EVALUATION_TIMEOUT_SECONDS)
 
-        except redis.exceptions.ConnectionError as e:
-            logging.error(f"Erro de conexão Redis: {e}. Tentando reconectar...")
-            time.sleep(5)
+    results = await asyncio.gather(*pending.values(), return_exceptions=True)
+    for name, result in zip(pending, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logging.error(f"[{name}] Avaliação de escalonamento excedeu {TARGET_EVALUATION_TIMEOUT_SECONDS:.0f}s.")
+        elif isinstance(result, Exception):
+            logging.error(f"[{name}] Erro ao avaliar escalonamento: {result}", exc_info=result)
+        elif not result:
+            logging.info(f"[{name}] Nenhuma ação de escalonamento necessária.")
+
+    await timed('state_save', loop.run_in_executor(None, save_scaler_state, targets))
+
+    if METRICS_PORT:
+        swarm_resources = await timed('cluster_resources', loop.run_in_executor(docker_executor, orchestrator.cluster_resources))
+        if swarm_resources:
+            metrics.record_swarm_resources(swarm_resources)
+
+    api_usage = orchestrator.api_usage()
+    if api_usage is not None:
+        logging.debug(f"API Docker neste ciclo: {format_usage(api_usage)}")
+        if METRICS_PORT:
+            metrics.record_docker_api_usage(api_usage)
+    metrics.PHASE_DURATION.labels('tick').observe(time.time() - current_time)
+
+async def wait_for_stop(stop_event, timeout_seconds):
+    """Sleeps up to timeout_seconds, returning early when a stop is requested."""
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout_seconds)
+    except asyncio.TimeoutError:
+        pass
+
+async def control_loop(r_conn, orchestrator, targets, event_watcher, executor, docker_executor):
+    """Runs the ticks until SIGTERM, waiting on the event stream or the polling interval between them.
+
+    On SIGTERM the current tick finishes, blocked XREADs return within STOP_CHECK_SECONDS
+    and the leader lease is released before returning.
+    """
+    loop = asyncio.get_running_loop()
+    r_async = get_async_redis_connection()
+    triggered_queues = set()
+    evaluations = {}
+    stop_event = asyncio.Event()
+
+    def request_stop():
+        # docker stack rm / atualização envia SIGTERM; encerrar dentro do stop_grace_period
+        logging.info("SIGTERM recebido. Encerrando o autoscaler...")
+        stop_event.set()
+        for listener in {event_watcher, wake_listener} - {None}:
+            listener.stop()
+
+    loop.add_signal_handler(signal.SIGTERM, request_stop)
+    try:
+        while not stop_event.is_set():
             try:
-                r_conn = get_redis_connection()
-            except Exception as recon_e:
-                logging.error(f"Falha ao reconectar ao Redis: {recon_e}")
-        except Exception as e:
-            logging.error(f"Erro no loop principal do autoscaler: {e}", exc_info=True)
+                await run_tick(r_async, orchestrator, targets, event_watcher, triggered_queues, executor, docker_executor, evaluations)
+            except (redis.exceptions.TimeoutError, asyncio.TimeoutError):
+                # Leitura lenta não é perda de conexão: manter coletores, amostradores e seus caches
+                logging.warning(f"Leitura das filas no Redis excedeu {REDIS_TIMEOUT_SECONDS:.0f}s. Ciclo ignorado.")
+            except redis.exceptions.ConnectionError as e:
+                logging.error(f"Erro de conexão Redis: {e}. Tentando reconectar...")
+                await wait_for_stop(stop_event, 5)
+                try:
+                    await r_async.aclose()
+                    r_conn = get_redis_connection()
+                    attach_redis(r_conn, targets, event_watcher)
+                    r_async = get_async_redis_connection()
+                except Exception as recon_e:
+                    logging.error(f"Falha ao reconectar ao Redis: {recon_e}")
+            except Exception as e:
+                logging.error(f"Erro no loop principal do autoscaler: {e}", exc_info=True)
 
-        time.sleep(POLLING_INTERVAL_SECONDS)
+            if event_watcher:
+                try:
+                    # XREAD BLOCK bloqueia a thread; executado fora do loop de eventos
+                    triggered_queues = await loop.run_in_executor(None, event_watcher.wait_for_trigger, POLLING_INTERVAL_SECONDS)
+                    if triggered_queues:
+                        logging.info(f"Novos jobs detectados no stream de eventos ({', '.join(sorted(triggered_queues))}). Reavaliando escalonamento.")
+                except redis.exceptions.ConnectionError as e:
+                    logging.error(f"Erro de conexão Redis ao ler stream de eventos: {e}")
+                    triggered_queues = set()
+                    await wait_for_stop(stop_event, 5)
+            elif wake_listener:
+                woken = await loop.run_in_executor(None, wake_listener.wait_for_trigger, POLLING_INTERVAL_SECONDS)
+                if woken:
+                    logging.info(f"Jobs enfileirados para serviço(s) em zero réplicas ({', '.join(sorted(woken))}). Reavaliando escalonamento.")
+            else:
+                await wait_for_stop(stop_event, POLLING_INTERVAL_SECONDS)
+    finally:
+        loop.remove_signal_handler(signal.SIGTERM)
+        # Liberar a liderança antes de aguardar as threads: a seguidora assume sem esperar o TTL
+        if leader_elector:
+            leader_elector.stop()
+        await r_async.aclose()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,243 @@
+import time
+import logging
+import threading
+from collections import defaultdict, namedtuple
+from concurrent.futures import Future
+
+from placement import service_placement
+
+# Visão já interpretada da spec de um serviço, reaproveitada enquanto Version.Index não muda
+ServiceSpec = namedtuple('ServiceSpec', [
+    'id', 'name', 'version', 'replicas', 'placement', 'cpu_limit_cores', 'stop_grace_period_seconds', 'attrs'
+])
+
+
+def parse_service_spec(attrs):
+    """Build a ServiceSpec from raw service attributes."""
+    spec = attrs['Spec']
+    task_template = spec.get('TaskTemplate', {})
+    limits = (task_template.get('Resources') or {}).get('Limits') or {}
+    grace_period_ns = task_template.get('ContainerSpec', {}).get('StopGracePeriod')
+    return ServiceSpec(
+        id=attrs['ID'],
+        name=spec.get('Name'),
+        version=attrs['Version']['Index'],
+        replicas=spec['Mode']['Replicated']['Replicas'],
+        placement=service_placement(attrs),
+        cpu_limit_cores=limits.get('NanoCPUs', 0) / 1_000_000_000 or None,
+        stop_grace_period_seconds=grace_period_ns / 1_000_000_000 if grace_period_ns is not None else None,
+        attrs=attrs,
+    )
+
+
+class CachedValue:
+    """A value fetched on demand and reused until its TTL expires or it is invalidated.
+
+    When read with a ``tick``, an expired or invalidated value is fetched at most
+    once per tick: later invalidations within the same tick (events, a scale call)
+    take effect on the next one. ``reset`` forces the next read to fetch.
+
+    Fetches are single-flight and run outside the lock: while one thread fetches,
+    other readers get the previous value right away, or, when there is none yet,
+    wait for the fetch at most ``wait_timeout`` seconds (``TimeoutError``). A slow
+    Docker API therefore never blocks readers for longer than that.
+    """
+
+    def __init__(self, fetch, ttl_seconds, wait_timeout=None):
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.wait_timeout = wait_timeout
+        self.value = None
+        self.fetched_at = None
+        self.fetched_tick = None
+        self.stale = False
+        # Busca em andamento e geração dos dados (reset descarta o resultado de buscas anteriores)
+        self.inflight = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, tick=None):
+        with self.lock:
+            now = time.monotonic()
+            expired = self.fetched_at is not None and (self.stale or now - self.fetched_at >= self.ttl_seconds)
+            if not (self.fetched_at is None or (expired and (tick is None or tick != self.fetched_tick))):
+                return self.value
+            waiting = self.inflight
+            if waiting is not None and self.fetched_at is not None:
+                # Outra thread já está buscando; usar o valor anterior
+                return self.value
+            if waiting is None:
+                future = self.inflight = Future()
+                generation = self.generation
+                self.fetched_tick = tick
+
+        if waiting is not None:
+            return waiting.result(timeout=self.wait_timeout)
+        return self._fetch(future, generation)
+
+    def _fetch(self, future, generation):
+        try:
+            value = self.fetch()
+        except BaseException as e:
+            with self.lock:
+                if self.inflight is future:
+                    self.inflight = None
+                    # Falha: a próxima leitura tenta de novo, mesmo neste ciclo
+                    self.fetched_tick = None
+            future.set_exception(e)
+            raise
+        with self.lock:
+            if self.generation == generation:
+                self.value = value
+                self.fetched_at = time.monotonic()
+                self.stale = False
+            if self.inflight is future:
+                self.inflight = None
+        future.set_result(value)
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.stale = True
+
+    def reset(self):
+        with self.lock:
+            self.fetched_at = None
+            # Uma busca já em andamento pode ter começado antes da mudança; não aguardá-la
+            self.generation += 1
+            self.inflight = None
+
+
+class ClusterStateCache:
+    """Cached view of Swarm nodes, running tasks and service specs shared by every scaling decision.
+
+    Each resource type is read with a single list call (nodes, tasks, services
+    filtered by the watched names) at most once per tick, see ``begin_tick``.
+    Parsed service specs are kept per service ID and only rebuilt when the
+    service ``Version`` changes.
+    """
+
+    def __init__(self, docker_client, ttl_seconds=15, wait_timeout=None):
+        self.docker_client = docker_client
+        self.ttl_seconds = ttl_seconds
+        self.tick = 0
+        self._nodes = CachedValue(self._fetch_nodes, ttl_seconds, wait_timeout)
+        self._tasks = CachedValue(self._fetch_tasks, ttl_seconds, wait_timeout)
+        self._services = CachedValue(self._fetch_services, ttl_seconds, wait_timeout)
+        self._service_names = set()
+        self._specs = {}
+        self._services_lock = threading.Lock()
+        self._events_thread = None
+
+    def begin_tick(self):
+        """Start a new tick: each resource is fetched again at most once until the next call."""
+        self.tick += 1
+
+    def _fetch_nodes(self):
+        return self.docker_client.api.nodes()
+
+    def _fetch_tasks(self):
+        # Uma única chamada para todas as tarefas do cluster (inclusive histórico), agrupadas depois em memória
+        tasks = self.docker_client.api.tasks()
+        by_node = defaultdict(list)
+        by_service = defaultdict(list)
+        history_by_service = defaultdict(list)
+        for task in tasks:
+            history_by_service[task.get('ServiceID')].append(task)
+            if task.get('DesiredState') == 'running':
+                by_node[task.get('NodeID')].append(task)
+                by_service[task.get('ServiceID')].append(task)
+        return {'all': tasks, 'by_node': by_node, 'by_service': by_service, 'history_by_service': history_by_service}
+
+    def _fetch_services(self):
+        with self._services_lock:
+            names = sorted(self._service_names)
+        # O filtro 'name' da API casa por prefixo; a correspondência exata é feita aqui
+        services = self.docker_client.api.services(filters={'name': names}) if names else []
+        by_key = {}
+        for attrs in services:
+            by_key[attrs['Spec']['Name']] = attrs
+            by_key[attrs['ID']] = attrs
+        return by_key
+
+    def nodes(self):
+        """Raw node descriptions (as returned by the nodes API)."""
+        return self._nodes.get(self.tick)
+
+    def tasks_by_node(self):
+        """Tasks with desired state 'running' grouped by node ID."""
+        return self._tasks.get(self.tick)['by_node']
+
+    def tasks_for_service(self, service_id):
+        """Tasks with desired state 'running' that belong to a service."""
+        return self._tasks.get(self.tick)['by_service'].get(service_id, [])
+
+    def task_history_for_service(self, service_id):
+        """Every task of a service still kept by Swarm, including failed and shut down ones."""
+        return self._tasks.get(self.tick)['history_by_service'].get(service_id, [])
+
+    def watch_services(self, service_names):
+        """Include services in the per-tick list call; unknown names force a new fetch."""
+        with self._services_lock:
+            new_names = set(service_names) - self._service_names
+            self._service_names.update(new_names)
+        if new_names:
+            self._services.reset()
+
+    def services(self, service_names):
+        """Raw attributes of the watched services, keyed by name and by ID (one list call)."""
+        self.watch_services(service_names)
+        return self._services.get(self.tick)
+
+    def service(self, service_name):
+        """Raw service attributes (Spec, Version, ...) for a service name or ID."""
+        attrs = self.services([service_name]).get(service_name)
+        if attrs is None:
+            # IDs (ou nomes ausentes da listagem) caem na consulta direta, que lança NotFound
+            attrs = self.docker_client.api.inspect_service(service_name)
+        return attrs
+
+    def service_spec(self, service_name):
+        """Parsed ServiceSpec of a service, rebuilt only when its Version changes."""
+        attrs = self.service(service_name)
+        cached = self._specs.get(attrs['ID'])
+        if cached is None or cached.version != attrs['Version']['Index']:
+            cached = parse_service_spec(attrs)
+            self._specs[attrs['ID']] = cached
+        return cached
+
+    def invalidate_service(self, service_name=None):
+        """Mark the service list and the task list for a new fetch on the next tick."""
+        self._services.invalidate()
+        self._tasks.invalidate()
+
+    def invalidate_all(self):
+        self._nodes.invalidate()
+        self.invalidate_service()
+
+    def start_event_listener(self):
+        """Invalidate the cache from Docker events (node/service/container) in a background thread."""
+        if self._events_thread is not None:
+            return
+        self._events_thread = threading.Thread(target=self._listen_events, name='cluster-events', daemon=True)
+        self._events_thread.start()
+
+    def _listen_events(self):
+        while True:
+            try:
+                events = self.docker_client.events(decode=True, filters={'type': ['node', 'service', 'container']})
+                for event in events:
+                    event_type = event.get('Type')
+                    if event_type == 'node':
+                        self._nodes.invalidate()
+                        self._tasks.invalidate()
+                    elif event_type == 'service':
+                        actor = event.get('Actor', {})
+                        self.invalidate_service(actor.get('Attributes', {}).get('name'))
+                        self.invalidate_service(actor.get('ID'))
+                    else:
+                        self._tasks.invalidate()
+            except Exception as e:
+                logging.warning(f"Stream de eventos do Docker interrompido: {e}. Reconectando em 5s.")
+                self.invalidate_all()
+                time.sleep(5)
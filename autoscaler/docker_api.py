@@ -0,0 +1,57 @@
+import threading
+from collections import Counter, namedtuple
+from urllib.parse import urlparse
+
+# Chamadas e bytes de resposta da API Docker em um ciclo, no total e por recurso
+DockerApiUsage = namedtuple('DockerApiUsage', ['calls', 'bytes', 'calls_by_resource', 'bytes_by_resource'])
+
+
+def api_resource(url):
+    """Resource label of a Docker API URL: 'services', 'services.update', 'containers.stats', ..."""
+    parts = [part for part in urlparse(url).path.split('/') if part]
+    if parts and parts[0].startswith('v1.'):
+        parts = parts[1:]
+    if not parts:
+        return 'root'
+    # /<recurso>/<id>/<ação>: a ação identifica a chamada (ex.: services/<id>/update)
+    return f"{parts[0]}.{parts[2]}" if len(parts) >= 3 else parts[0]
+
+
+class DockerApiMeter:
+    """Counts Docker API calls and response bytes through a requests response hook.
+
+    docker-py's APIClient is a ``requests.Session``, so the hook sees every request
+    made through the persistent (keep-alive) connection pool. Streaming responses
+    (events) are counted once, with their Content-Length when known.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.bytes = Counter()
+
+    def attach(self, api_client):
+        api_client.hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        resource = api_resource(response.url)
+        if kwargs.get('stream'):
+            size = int(response.headers.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        with self.lock:
+            self.calls[resource] += 1
+            self.bytes[resource] += size
+        return response
+
+    def end_tick(self):
+        """Return the DockerApiUsage since the previous call and start counting a new tick."""
+        with self.lock:
+            calls, self.calls = self.calls, Counter()
+            sizes, self.bytes = self.bytes, Counter()
+        return DockerApiUsage(sum(calls.values()), sum(sizes.values()), dict(calls), dict(sizes))
+
+
+def format_usage(usage):
+    resources = ", ".join(f"{resource} {count}" for resource, count in sorted(usage.calls_by_resource.items()))
+    return f"{usage.calls} chamada(s), {usage.bytes / 1024:.1f} KiB ({resources or 'nenhuma'})"
@@ -0,0 +1,87 @@
+import socket
+import logging
+import platform
+import threading
+import time
+from collections import deque
+
+import psutil
+
+_static_info = None
+
+
+def get_local_ip():
+    """Local IP used for outbound traffic (no packet is actually sent)."""
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+        finally:
+            s.close()
+    except Exception:
+        return "127.0.0.1"
+
+
+def get_static_host_info():
+    """Host fields that never change while the process runs, computed once."""
+    global _static_info
+    if _static_info is None:
+        system = platform.system()
+        release = platform.release()
+        architecture = platform.architecture()[0]
+        _static_info = {
+            "hostname": socket.gethostname(),
+            "local_ip": get_local_ip(),
+            "platform": f"{system} {release} ({architecture})",
+            "processor": platform.processor() or f"{platform.machine()} processor",
+            "python_version": platform.python_version(),
+            "cpu_count": psutil.cpu_count(),
+        }
+    return _static_info
+
+
+class HostMetricsSampler:
+    """Samples CPU, memory and disk usage in the background over a rolling window."""
+
+    def __init__(self, interval_seconds=5, window_size=12, disk_path='/'):
+        self.interval_seconds = interval_seconds
+        self.disk_path = disk_path
+        self.cpu_samples = deque(maxlen=window_size)
+        self.latest = None
+        self.thread = None
+
+    def start(self):
+        # A primeira chamada de cpu_percent(interval=None) só inicializa o contador
+        psutil.cpu_percent(interval=None)
+        self.sample()
+        self.thread = threading.Thread(target=self._run, name='host-metrics', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                self.sample()
+            except Exception as e:
+                logging.debug(f"Erro ao coletar métricas do host: {e}")
+
+    def sample(self):
+        """Take one non-blocking reading and publish it."""
+        self.cpu_samples.append(psutil.cpu_percent(interval=None))
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        # Publicado como um único dict para que leitores nunca vejam valores pela metade
+        self.latest = {
+            "cpu_percent": round(sum(self.cpu_samples) / len(self.cpu_samples), 2),
+            "memory_total_gb": round(memory.total / (1024**3), 2),
+            "memory_used_gb": round(memory.used / (1024**3), 2),
+            "memory_percent": round(memory.percent, 2),
+            "disk_total_gb": round(disk.total / (1024**3), 2),
+            "disk_used_gb": round(disk.used / (1024**3), 2),
+            "disk_percent": round((disk.used / disk.total) * 100, 2),
+        }
+
+    def snapshot(self):
+        """Most recent readings (empty until the first sample)."""
+        return self.latest or {}
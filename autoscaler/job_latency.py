@@ -0,0 +1,122 @@
+import time
+import logging
+from collections import deque
+
+import redis
+
+from metrics_window import latency_from_durations
+
+# Campos lidos de cada hash de job (<prefixo>:<fila>:<id>), em milissegundos
+JOB_TIMESTAMP_FIELDS = ('timestamp', 'delay', 'processedOn', 'finishedOn')
+
+
+def to_ms(value):
+    """Parse a millisecond timestamp field of a job hash (None if missing or malformed)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_departed_duration(processed_ms, previous_sample_time, now):
+    """Processing time (s) of a job that left the active list between two samples.
+
+    The job finished somewhere in the interval; the midpoint is used, never less
+    than the time it was already seen running.
+    """
+    finished_at = max((previous_sample_time + now) / 2, previous_sample_time)
+    return finished_at - processed_ms / 1000
+
+
+class JobLatencySampler:
+    """Estimates job latency from the timestamps stored in BullMQ job hashes.
+
+    Workers take jobs from the tail of the wait list, so the last ``sample_size``
+    entries are the oldest waiting jobs. Processing times come from the most
+    recent entries of the completed set. That set is empty when the queue uses
+    ``removeOnComplete`` (n8n's default); processing times are then estimated
+    from the ``processedOn`` of active jobs that left the active list since the
+    previous sample (midpoint of the interval), when that list was fully read.
+    """
+
+    def __init__(self, r_conn, base_key, wait_key, sample_size=20):
+        self.r_conn = r_conn
+        self.base_key = base_key
+        self.wait_key = wait_key
+        self.sample_size = sample_size
+        # Jobs ativos na amostra anterior: id -> processedOn (ms)
+        self.active_started = {}
+        self.last_sample_time = None
+        self.estimated_durations = deque(maxlen=sample_size)
+
+    def _read_jobs(self):
+        pipe = self.r_conn.pipeline(transaction=False)
+        pipe.lrange(self.wait_key, -self.sample_size, -1)
+        pipe.zrevrange(f"{self.base_key}:completed", 0, self.sample_size - 1)
+        pipe.lrange(f"{self.base_key}:active", 0, self.sample_size)
+        waiting_ids, completed_ids, active_ids = [
+            [] if isinstance(ids, Exception) else ids for ids in pipe.execute(raise_on_error=False)
+        ]
+        # processedOn de um job ativo não muda; ler apenas os que ainda não foram vistos
+        new_active_ids = [job_id for job_id in active_ids if job_id not in self.active_started]
+
+        pipe = self.r_conn.pipeline(transaction=False)
+        for job_id in waiting_ids + completed_ids:
+            pipe.hmget(f"{self.base_key}:{job_id}", *JOB_TIMESTAMP_FIELDS)
+        for job_id in new_active_ids:
+            pipe.hget(f"{self.base_key}:{job_id}", 'processedOn')
+        fields = pipe.execute(raise_on_error=False) if waiting_ids or completed_ids or new_active_ids else []
+        fields = [None if isinstance(values, Exception) else values for values in fields]
+        completed_end = len(waiting_ids) + len(completed_ids)
+        started = dict(zip(new_active_ids, fields[completed_end:]))
+        return fields[:len(waiting_ids)], fields[len(waiting_ids):completed_end], active_ids, started
+
+    def _estimate_from_active(self, active_ids, started, now):
+        """Record the processing time of jobs that left the active list since the previous sample."""
+        if len(active_ids) > self.sample_size:
+            # Lista ativa maior que a amostra: saídas não podem ser distinguidas
+            self.active_started = {}
+            self.last_sample_time = None
+            return
+        current = {}
+        for job_id in active_ids:
+            processed_ms = self.active_started[job_id] if job_id in self.active_started else to_ms(started.get(job_id))
+            if processed_ms is not None:
+                current[job_id] = processed_ms
+        if self.last_sample_time is not None:
+            for job_id, processed_ms in self.active_started.items():
+                if job_id not in current:
+                    self.estimated_durations.append(estimate_departed_duration(processed_ms, self.last_sample_time, now))
+        self.active_started = current
+        self.last_sample_time = now
+
+    def sample(self, now=None):
+        """Return a JobLatency, or None if the job hashes cannot be read."""
+        now = now or time.time()
+        try:
+            waiting, completed, active_ids, started = self._read_jobs()
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Erro ao ler timestamps dos jobs da fila '{self.base_key}': {e}")
+            return None
+
+        oldest_wait = 0.0
+        for values in waiting:
+            if not values:
+                continue
+            created_ms, delay_ms = to_ms(values[0]), to_ms(values[1]) or 0
+            if created_ms is not None:
+                # Jobs atrasados só passam a aguardar depois do delay
+                oldest_wait = max(oldest_wait, now - (created_ms + delay_ms) / 1000)
+
+        durations = []
+        for values in completed:
+            if not values:
+                continue
+            processed_ms, finished_ms = to_ms(values[2]), to_ms(values[3])
+            if processed_ms is not None and finished_ms is not None and finished_ms >= processed_ms:
+                durations.append((finished_ms - processed_ms) / 1000)
+
+        self._estimate_from_active(active_ids, started, now)
+        if not durations:
+            durations = [seconds for seconds in self.estimated_durations if seconds >= 0]
+        return latency_from_durations(now, oldest_wait, durations)
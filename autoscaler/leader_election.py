@@ -0,0 +1,96 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+
+import redis
+
+# Renova o lease apenas se ele ainda pertence a esta réplica
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderElector:
+    """Redis lease (SET NX PX) that lets several autoscaler replicas run with a single active leader.
+
+    A background thread acquires the lease and renews it every ``lease_seconds / 3``.
+    Leadership is only trusted until the lease would expire since the last
+    successful renewal, so a leader cut off from Redis steps down before
+    another replica can take over.
+    """
+
+    def __init__(self, r_conn, key, lease_seconds=15, identity=None, on_change=None):
+        self.r_conn = r_conn
+        self.key = key
+        self.lease_ms = int(lease_seconds * 1000)
+        self.renew_interval = lease_seconds / 3
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Chamado com True/False quando esta réplica assume ou perde a liderança
+        self.on_change = on_change
+        self._leader = False
+        self._valid_until = 0
+        self._stop = threading.Event()
+        self.thread = None
+
+    @property
+    def is_leader(self):
+        return self._leader and time.monotonic() < self._valid_until
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop renewing and release the lease so a follower can take over right away."""
+        self._stop.set()
+        if self._leader:
+            try:
+                self.r_conn.eval(RELEASE_SCRIPT, 1, self.key, self.identity)
+            except redis.exceptions.RedisError as e:
+                logging.warning(f"Erro ao liberar liderança: {e}")
+            self._set_leader(False)
+
+    def _set_leader(self, leader):
+        if leader == self._leader:
+            return
+        self._leader = leader
+        if leader:
+            logging.info(f"Liderança adquirida por '{self.identity}'. Esta réplica passa a escalar os serviços.")
+        else:
+            logging.warning(f"Liderança perdida por '{self.identity}'. Esta réplica passa a apenas observar.")
+        if self.on_change:
+            self.on_change(leader)
+
+    def _try_acquire_or_renew(self):
+        started = time.monotonic()
+        if self._leader:
+            held = self.r_conn.eval(RENEW_SCRIPT, 1, self.key, self.identity, self.lease_ms) == 1
+        else:
+            held = bool(self.r_conn.set(self.key, self.identity, nx=True, px=self.lease_ms))
+        if held:
+            # Conta o lease a partir do envio do comando, nunca depois da resposta
+            self._valid_until = started + self.lease_ms / 1000
+        return held
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._set_leader(self._try_acquire_or_renew())
+            except redis.exceptions.RedisError as e:
+                logging.error(f"Erro na eleição de líder: {e}")
+                if self._leader and time.monotonic() >= self._valid_until:
+                    self._set_leader(False)
+            self._stop.wait(self.renew_interval)
@@ -0,0 +1,158 @@
+import logging
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+QUEUE_JOBS = Gauge(
+    'n8n_autoscaler_queue_jobs', 'Jobs in the BullMQ queue by state', ['target', 'state']
+)
+QUEUE_PAUSED = Gauge(
+    'n8n_autoscaler_queue_paused', '1 if the BullMQ queue is paused', ['target']
+)
+REPLICAS_CONFIGURED = Gauge(
+    'n8n_autoscaler_replicas_configured', 'Replicas configured on the Swarm service', ['target']
+)
+REPLICAS_RUNNING = Gauge(
+    'n8n_autoscaler_replicas_running', 'Tasks of the Swarm service in running state', ['target']
+)
+REPLICAS_DESIRED = Gauge(
+    'n8n_autoscaler_replicas_desired', 'Replicas recommended by the scaling policy', ['target']
+)
+CLUSTER_CPU_CORES = Gauge(
+    'n8n_autoscaler_cluster_cpu_cores', 'Swarm CPU cores on active nodes', ['kind']
+)
+CLUSTER_MEMORY_BYTES = Gauge(
+    'n8n_autoscaler_cluster_memory_bytes', 'Swarm memory on active nodes', ['kind']
+)
+PHASE_DURATION = Histogram(
+    'n8n_autoscaler_phase_duration_seconds', 'Duration of each scaling loop phase', ['phase'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+OLDEST_WAIT_SECONDS = Gauge(
+    'n8n_autoscaler_oldest_wait_seconds', 'Age of the oldest job waiting in the queue', ['target']
+)
+JOB_PROCESSING_SECONDS = Gauge(
+    'n8n_autoscaler_job_processing_seconds', 'Processing time of recently completed jobs', ['target', 'quantile']
+)
+TASKS = Gauge(
+    'n8n_autoscaler_tasks', 'Tasks of the Swarm service by phase (failed: within the recent window)', ['target', 'state']
+)
+CONVERGENCE_LAG_SECONDS = Gauge(
+    'n8n_autoscaler_convergence_lag_seconds', 'Age of the oldest task that should be running but is not (0 when converged)', ['target']
+)
+WORKER_UTILIZATION_PERCENT = Gauge(
+    'n8n_autoscaler_worker_utilization_percent', 'Smoothed average utilization of the worker containers', ['target', 'resource']
+)
+WORKFLOW_WAITING_JOBS = Gauge(
+    'n8n_autoscaler_workflow_waiting_jobs', 'Estimated waiting jobs of the top workflows in the queue', ['target', 'workflow']
+)
+WORKFLOW_ACTIVE_JOBS = Gauge(
+    'n8n_autoscaler_workflow_active_jobs', 'Active jobs of the top workflows in the queue', ['target', 'workflow']
+)
+WORKFLOW_RUNTIME_SECONDS = Gauge(
+    'n8n_autoscaler_workflow_runtime_seconds', 'Average runtime of recent jobs of the slowest workflows', ['target', 'workflow']
+)
+COLD_START_SECONDS = Histogram(
+    'n8n_autoscaler_cold_start_seconds', 'Time from waking a service at zero replicas to its first running worker', ['target'],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300)
+)
+BUSY_WORKERS = Gauge(
+    'n8n_autoscaler_busy_workers', 'Workers holding active job locks, read before a scale-down', ['target']
+)
+IS_LEADER = Gauge(
+    'n8n_autoscaler_is_leader', '1 if this autoscaler replica holds the leader lease'
+)
+SCALE_DECISIONS = Counter(
+    'n8n_autoscaler_scale_decisions_total', 'Scaling actions applied', ['target', 'direction']
+)
+SCALE_UP_BLOCKED = Counter(
+    'n8n_autoscaler_scale_up_blocked_total', 'Scale-ups that were needed but not applied', ['target', 'reason']
+)
+SCALE_DOWN_DEFERRED = Counter(
+    'n8n_autoscaler_scale_down_deferred_total', 'Scale-downs postponed because every worker was busy', ['target']
+)
+DOCKER_API_CALLS = Counter(
+    'n8n_autoscaler_docker_api_calls_total', 'Docker API requests by resource', ['resource']
+)
+DOCKER_API_BYTES = Counter(
+    'n8n_autoscaler_docker_api_bytes_total', 'Docker API response bytes by resource', ['resource']
+)
+DOCKER_API_TICK_CALLS = Gauge(
+    'n8n_autoscaler_docker_api_tick_calls', 'Docker API requests made during the last tick'
+)
+DOCKER_API_TICK_BYTES = Gauge(
+    'n8n_autoscaler_docker_api_tick_bytes', 'Docker API response bytes received during the last tick'
+)
+
+
+def start_metrics_server(port, addr='0.0.0.0'):
+    """Expose /metrics on the given port from a background thread."""
+    start_http_server(port, addr=addr)
+    logging.info(f"Métricas Prometheus disponíveis em http://{addr}:{port}/metrics")
+
+
+def record_queue_snapshot(target_name, snapshot):
+    """Publish the per-state job counts of a queue snapshot."""
+    for state in ('wait', 'active', 'paused', 'delayed', 'prioritized', 'completed', 'failed'):
+        QUEUE_JOBS.labels(target_name, state).set(getattr(snapshot, state))
+    QUEUE_PAUSED.labels(target_name).set(1 if snapshot.is_paused else 0)
+
+
+def record_task_states(target_name, task_states):
+    """Publish the per-phase task counts and the convergence lag of a service."""
+    for state in ('pending', 'assigned', 'preparing', 'starting', 'running', 'failed'):
+        TASKS.labels(target_name, state).set(getattr(task_states, state))
+    CONVERGENCE_LAG_SECONDS.labels(target_name).set(task_states.oldest_unready_seconds or 0)
+
+
+def record_worker_utilization(target_name, utilization):
+    """Publish the smoothed CPU and memory utilization of the worker containers."""
+    if utilization.cpu_percent is not None:
+        WORKER_UTILIZATION_PERCENT.labels(target_name, 'cpu').set(utilization.cpu_percent)
+    if utilization.memory_percent is not None:
+        WORKER_UTILIZATION_PERCENT.labels(target_name, 'memory').set(utilization.memory_percent)
+
+
+# Workflows publicados por alvo e métrica, para remover os que saíram do top N
+_workflow_labels = {}
+
+
+def _set_top(gauge, target_name, values):
+    key = (gauge, target_name)
+    for workflow in _workflow_labels.get(key, set()) - set(values):
+        gauge.remove(target_name, workflow)
+    for workflow, value in values.items():
+        gauge.labels(target_name, workflow).set(value)
+    _workflow_labels[key] = set(values)
+
+
+def record_workflow_breakdown(target_name, breakdown):
+    """Publish the top workflows by backlog, active jobs and runtime of a WorkflowBreakdown."""
+    _set_top(WORKFLOW_WAITING_JOBS, target_name, {workflow: estimate for workflow, _, estimate in breakdown.backlog})
+    _set_top(WORKFLOW_ACTIVE_JOBS, target_name, dict(breakdown.active))
+    _set_top(WORKFLOW_RUNTIME_SECONDS, target_name, {workflow: seconds for workflow, seconds, _ in breakdown.runtime})
+
+
+def record_job_latency(target_name, latency):
+    """Publish the oldest waiting age and processing-time quantiles of a JobLatency."""
+    OLDEST_WAIT_SECONDS.labels(target_name).set(latency.oldest_wait_seconds)
+    if latency.processing_samples:
+        JOB_PROCESSING_SECONDS.labels(target_name, '0.5').set(latency.processing_p50)
+        JOB_PROCESSING_SECONDS.labels(target_name, '0.95').set(latency.processing_p95)
+
+
+def record_docker_api_usage(usage):
+    """Publish the Docker API calls and response bytes of one tick (DockerApiUsage)."""
+    DOCKER_API_TICK_CALLS.set(usage.calls)
+    DOCKER_API_TICK_BYTES.set(usage.bytes)
+    for resource, calls in usage.calls_by_resource.items():
+        DOCKER_API_CALLS.labels(resource).inc(calls)
+    for resource, size in usage.bytes_by_resource.items():
+        DOCKER_API_BYTES.labels(resource).inc(size)
+
+
+def record_swarm_resources(swarm_resources):
+    """Publish the cluster totals returned by get_swarm_resources."""
+    CLUSTER_CPU_CORES.labels('total').set(swarm_resources['total_cpu_cores'])
+    CLUSTER_CPU_CORES.labels('available').set(swarm_resources['available_cpu_cores'])
+    CLUSTER_MEMORY_BYTES.labels('total').set(swarm_resources['total_memory_gb'] * 1024**3)
+    CLUSTER_MEMORY_BYTES.labels('available').set(swarm_resources['available_memory_gb'] * 1024**3)
@@ -0,0 +1,114 @@
+import math
+from collections import deque, namedtuple
+
+# enqueued: contador ':id' da fila no instante da amostra (None se desconhecido);
+# paused: jobs na lista de pausa (a lista de espera é movida para ela ao pausar a fila)
+QueueSample = namedtuple('QueueSample', ['timestamp', 'wait', 'active', 'completed', 'delayed', 'enqueued', 'paused'],
+                         defaults=(0, None, 0))
+
+# Latência observada dos jobs: idade do job mais antigo aguardando e tempos de processamento
+# dos jobs concluídos recentemente (segundos; None sem amostras)
+JobLatency = namedtuple('JobLatency', [
+    'timestamp', 'oldest_wait_seconds', 'processing_p50', 'processing_p95', 'processing_mean', 'processing_samples'
+])
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def latency_from_durations(timestamp, oldest_wait_seconds, durations):
+    """Build a JobLatency from the oldest waiting age and a list of processing times."""
+    return JobLatency(
+        timestamp=timestamp,
+        oldest_wait_seconds=oldest_wait_seconds,
+        processing_p50=percentile(durations, 0.5) if durations else None,
+        processing_p95=percentile(durations, 0.95) if durations else None,
+        processing_mean=sum(durations) / len(durations) if durations else None,
+        processing_samples=len(durations)
+    )
+
+
+class MetricsWindow:
+    """Bounded ring buffer of queue samples with rate estimates over the window.
+
+    Arrivals come from the queue's ``:id`` counter, which is incremented for every
+    job created, and completions from arrivals minus the growth of the backlog
+    (wait + active + delayed + paused, so pausing a queue is not mistaken for
+    jobs completing). This works with ``removeOnComplete``/``removeOnFail``
+    (n8n's defaults), where the ``:completed`` set stays empty; that set is only
+    used as a lower bound for completions, or on its own for samples without the
+    counter.
+    """
+
+    def __init__(self, max_samples):
+        self.samples = deque(maxlen=max_samples)
+
+    def add_sample(self, timestamp, wait, active, completed, delayed=0, enqueued=None, paused=0):
+        """Append a sample; the oldest one is discarded once the buffer is full."""
+        self.samples.append(QueueSample(timestamp, wait, active, completed, delayed, enqueued, paused))
+
+    def _rates(self):
+        """Return (arrivals/s, completions/s) summed over consecutive sample pairs."""
+        if len(self.samples) < 2:
+            return None, None
+
+        arrivals = 0
+        completions = 0
+        elapsed = 0.0
+        previous = None
+        for sample in self.samples:
+            if previous is not None and sample.timestamp > previous.timestamp:
+                backlog_delta = ((sample.wait + sample.active + sample.delayed + sample.paused)
+                                 - (previous.wait + previous.active + previous.delayed + previous.paused))
+                completed_delta = sample.completed - previous.completed
+                if sample.enqueued is not None and previous.enqueued is not None:
+                    arrived = sample.enqueued - previous.enqueued
+                    # Contador reiniciado (fila recriada); ignorar esse intervalo
+                    if arrived >= 0:
+                        arrivals += arrived
+                        completions += max(0, arrived - backlog_delta, completed_delta)
+                        elapsed += sample.timestamp - previous.timestamp
+                # Sem o contador: o conjunto :completed pode ser aparado; ignorar esse intervalo
+                elif completed_delta >= 0:
+                    arrivals += max(0, backlog_delta + completed_delta)
+                    completions += completed_delta
+                    elapsed += sample.timestamp - previous.timestamp
+            previous = sample
+
+        if elapsed <= 0:
+            return None, None
+        return arrivals / elapsed, completions / elapsed
+
+    def arrival_rate(self):
+        """Jobs entering the queue per second, or None without enough samples."""
+        return self._rates()[0]
+
+    def throughput(self):
+        """Jobs completed per second across all workers, or None without enough samples."""
+        return self._rates()[1]
+
+    def drain_rate_per_worker(self, replicas):
+        """Jobs completed per second by a single worker, or None if unknown."""
+        throughput = self.throughput()
+        if throughput is None or replicas <= 0:
+            return None
+        return throughput / replicas
+
+    def time_to_drain(self):
+        """Estimated seconds to empty the backlog at the current net drain rate, or None if it is not draining."""
+        arrival_rate, throughput = self._rates()
+        if arrival_rate is None or not self.samples:
+            return None
+        latest = self.samples[-1]
+        backlog = latest.wait + latest.active
+        if backlog == 0:
+            return 0.0
+        net_drain = throughput - arrival_rate
+        if net_drain <= 0:
+            return None
+        return backlog / net_drain
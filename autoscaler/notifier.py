@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+import requests
+
+
+class WebhookDispatcher:
+    """Delivers webhook notifications from a background thread.
+
+    Events are queued without blocking the scaling loop, coalesced into one
+    batched POST when several arrive within ``batch_window_seconds``, retried
+    with exponential backoff and, when ``spool_path`` is set, kept on disk
+    until delivered so they survive restarts. The spool file is rewritten by its
+    own thread, never by the caller of ``notify``.
+    """
+
+    def __init__(self, url, token=None, timeout=10, max_queue=1000, batch_window_seconds=2,
+                 max_batch_size=50, max_retries=5, backoff_base_seconds=1, backoff_max_seconds=60,
+                 spool_path=None, enrich_payload=None, on_delivery=None):
+        self.url = url
+        self.timeout = timeout
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.spool_path = spool_path
+        # Chamado na thread de envio para completar o payload (ex.: server_info)
+        self.enrich_payload = enrich_payload
+        # Chamado com (segundos, entregue) ao final de cada envio, para instrumentação
+        self.on_delivery = on_delivery
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+
+        # Eventos ainda não entregues (espelhados no spool em disco)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.next_id = 0
+        self.thread = None
+        # Sinaliza ao gravador do spool que os eventos pendentes mudaram
+        self.spool_dirty = threading.Event()
+        self.spool_thread = None
+
+    def start(self):
+        """Reload spooled events and start the delivery thread."""
+        for event in self._load_spool():
+            self._enqueue(event, spool=False)
+        self.thread = threading.Thread(target=self._run, name='webhook-dispatcher', daemon=True)
+        self.thread.start()
+        if self.spool_path:
+            self.spool_thread = threading.Thread(target=self._spool_loop, name='webhook-spool', daemon=True)
+            self.spool_thread.start()
+
+    def notify(self, payload):
+        """Queue a notification; never blocks the caller."""
+        self._enqueue(payload, spool=True)
+
+    def _enqueue(self, payload, spool):
+        with self.pending_lock:
+            event_id = self.next_id
+            self.next_id += 1
+            self.pending[event_id] = payload
+        try:
+            self.queue.put_nowait(event_id)
+        except queue.Full:
+            logging.warning("Fila de notificações webhook cheia. Descartando notificação.")
+            with self.pending_lock:
+                self.pending.pop(event_id, None)
+            return
+        if spool:
+            self.spool_dirty.set()
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return []
+        try:
+            with open(self.spool_path) as spool_file:
+                events = json.load(spool_file)
+            if events:
+                logging.info(f"{len(events)} notificação(ões) webhook pendente(s) recuperada(s) do spool.")
+            return events
+        except (OSError, ValueError) as e:
+            logging.error(f"Erro ao ler spool de notificações webhook '{self.spool_path}': {e}")
+            return []
+
+    def _spool_loop(self):
+        # Eventos que chegam durante uma gravação são incluídos na gravação seguinte
+        while True:
+            self.spool_dirty.wait()
+            self.spool_dirty.clear()
+            self._write_spool()
+
+    def _write_spool(self):
+        if not self.spool_path:
+            return
+        with self.pending_lock:
+            events = [self.pending[event_id] for event_id in sorted(self.pending)]
+        try:
+            temp_path = f"{self.spool_path}.tmp"
+            with open(temp_path, 'w') as spool_file:
+                json.dump(events, spool_file)
+            os.replace(temp_path, self.spool_path)
+        except OSError as e:
+            logging.error(f"Erro ao gravar spool de notificações webhook '{self.spool_path}': {e}")
+
+    def _collect_batch(self):
+        """Wait for one event, then coalesce the ones arriving within the batch window."""
+        batch = [self.queue.get()]
+        deadline = time.time() + self.batch_window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _build_payload(self, events):
+        # Um único evento mantém o formato original; vários são agrupados em um lote
+        if len(events) == 1:
+            payload = dict(events[0])
+        else:
+            payload = {"action": "batch", "events": events, "timestamp": time.time()}
+        if self.enrich_payload:
+            self.enrich_payload(payload)
+        return payload
+
+    def _post(self, payload):
+        response = self.session.post(self.url, data=json.dumps(payload), timeout=self.timeout)
+        if 200 <= response.status_code < 300:
+            return True
+        logging.warning(f"Webhook retornou status {response.status_code}: {response.text[:200]}")
+        # Erros 4xx (exceto 429) não se resolvem com nova tentativa
+        return None if 400 <= response.status_code < 500 and response.status_code != 429 else False
+
+    def _run(self):
+        while True:
+            event_ids = self._collect_batch()
+            with self.pending_lock:
+                events = [self.pending[event_id] for event_id in event_ids if event_id in self.pending]
+            if events:
+                started = time.time()
+                delivered = self._deliver(events)
+                if self.on_delivery:
+                    self.on_delivery(time.time() - started, delivered)
+            with self.pending_lock:
+                for event_id in event_ids:
+                    self.pending.pop(event_id, None)
+            self.spool_dirty.set()
+
+    def _deliver(self, events):
+        payload = self._build_payload(events)
+        description = ", ".join(f"{event.get('action')} {event.get('old_replicas')} -> {event.get('new_replicas')}" for event in events)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._post(payload)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Erro ao enviar notificação webhook (tentativa {attempt + 1}): {e}")
+                result = False
+            if result:
+                logging.info(f"Notificação webhook enviada com sucesso: {description}")
+                return True
+            if result is None:
+                break
+            if attempt < self.max_retries:
+                time.sleep(min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt)))
+
+        logging.error(f"Notificação webhook descartada após {attempt + 1} tentativa(s): {description}")
+        return False
@@ -0,0 +1,111 @@
+import time
+import logging
+from collections import namedtuple
+
+from task_state import TaskStates
+
+# Estado de um serviço lido uma única vez por ciclo; task_states (TaskStates) e update_state
+# (UpdateStatus.State do Swarm) são None quando o backend não os conhece
+ServiceState = namedtuple('ServiceState', ['name', 'id', 'replicas', 'running_tasks', 'task_states', 'update_state'],
+                          defaults=(None, None))
+
+
+class Orchestrator:
+    """Interface used by the control loop to read and scale worker services."""
+
+    def service_state(self, service_name):
+        """Return a ServiceState, or None if the service does not exist or cannot be read."""
+        raise NotImplementedError
+
+    def schedulable_replicas(self, service_name, additional_replicas):
+        """How many of ``additional_replicas`` new replicas the cluster can actually place."""
+        raise NotImplementedError
+
+    def scale(self, service_name, replicas):
+        """Set the replica count of a service. Returns True on success."""
+        raise NotImplementedError
+
+    def cluster_resources(self):
+        """Cluster totals (total/available CPU cores and memory GB), or None if unknown."""
+        return None
+
+    def worker_utilization(self, service_name):
+        """Smoothed CPU/memory utilization of the service's workers (WorkerUtilization), or None."""
+        return None
+
+    def stop_grace_period(self, service_name):
+        """Seconds a task gets between SIGTERM and SIGKILL when removed, or None if unknown."""
+        return None
+
+    def begin_tick(self):
+        """Called once at the start of every control-loop tick."""
+
+    def prefetch_calls(self, service_names):
+        """Independent (description, callable) pairs that warm the per-tick view, run concurrently."""
+        return []
+
+    def api_usage(self):
+        """Backend API calls and bytes since the previous call (DockerApiUsage), or None if not metered."""
+        return None
+
+
+class FakeOrchestrator(Orchestrator):
+    """In-memory orchestrator so the control loop runs in tests and benchmarks without Docker.
+
+    Each service has a replica count and tasks that become 'running' after
+    ``startup_latency`` seconds; ``capacity`` caps how many replicas fit in the
+    fake cluster.
+    """
+
+    def __init__(self, services=None, capacity=100, startup_latency=0, clock=time.time):
+        self.capacity = capacity
+        self.startup_latency = startup_latency
+        self.clock = clock
+        # Nome do serviço -> lista de instantes em que cada tarefa fica pronta
+        self.services = {}
+        self.scale_calls = []
+        for name, replicas in (services or {}).items():
+            self.add_service(name, replicas)
+
+    def add_service(self, name, replicas=0):
+        self.services[name] = [self.clock() - self.startup_latency] * replicas
+
+    def _used_replicas(self):
+        return sum(len(tasks) for tasks in self.services.values())
+
+    def service_state(self, service_name):
+        tasks = self.services.get(service_name)
+        if tasks is None:
+            logging.error(f"Serviço '{service_name}' não encontrado no orquestrador simulado.")
+            return None
+        now = self.clock()
+        running = sum(1 for ready_at in tasks if ready_at <= now)
+        starting_since = [now - (ready_at - self.startup_latency) for ready_at in tasks if ready_at > now]
+        ready_times = [ready_at for ready_at in tasks if ready_at <= now]
+        task_states = TaskStates(
+            pending=0, assigned=0, preparing=0, starting=len(starting_since), running=running, failed=0,
+            oldest_unready_seconds=max(starting_since) if starting_since else None,
+            running_since=min(ready_times) if ready_times else None
+        )
+        return ServiceState(service_name, service_name, len(tasks), running, task_states)
+
+    def schedulable_replicas(self, service_name, additional_replicas):
+        return max(0, min(additional_replicas, self.capacity - self._used_replicas()))
+
+    def scale(self, service_name, replicas):
+        tasks = self.services.get(service_name)
+        if tasks is None:
+            return False
+        now = self.clock()
+        del tasks[replicas:]
+        tasks.extend([now + self.startup_latency] * (replicas - len(tasks)))
+        self.scale_calls.append((now, service_name, replicas))
+        return True
+
+    def cluster_resources(self):
+        return {
+            'total_cpu_cores': float(self.capacity),
+            'total_memory_gb': float(self.capacity),
+            'available_cpu_cores': float(self.capacity - self._used_replicas()),
+            'available_memory_gb': float(self.capacity - self._used_replicas())
+        }
@@ -0,0 +1,113 @@
+import logging
+from collections import namedtuple
+
+# Requisitos de posicionamento de um serviço: restrições já decompostas em (campo, operador, valor),
+# limite de réplicas por nó e reservas de CPU (nano) e memória (bytes) por réplica
+ServicePlacement = namedtuple('ServicePlacement', ['constraints', 'max_per_node', 'cpu_needed', 'memory_needed'])
+
+
+def parse_constraint(expression):
+    """Split a Swarm placement constraint ('node.role==manager') into (field, operator, value)."""
+    for operator in ('==', '!='):
+        if operator in expression:
+            field, value = expression.split(operator, 1)
+            return field.strip(), operator, value.strip()
+    raise ValueError(f"Restrição de posicionamento inválida: '{expression}'")
+
+
+def node_attribute(node, field):
+    """Resolve a constraint field (node.id, node.role, node.labels.x, engine.labels.x, ...) on a raw node."""
+    description = node.get('Description', {})
+    if field == 'node.id':
+        return node.get('ID')
+    if field == 'node.hostname':
+        return description.get('Hostname')
+    if field == 'node.role':
+        return node.get('Spec', {}).get('Role')
+    if field == 'node.platform.os':
+        return description.get('Platform', {}).get('OS')
+    if field == 'node.platform.arch':
+        return description.get('Platform', {}).get('Architecture')
+    if field.startswith('node.labels.'):
+        return (node.get('Spec', {}).get('Labels') or {}).get(field[len('node.labels.'):])
+    if field.startswith('engine.labels.'):
+        return (description.get('Engine', {}).get('Labels') or {}).get(field[len('engine.labels.'):])
+    return None
+
+
+def node_matches_constraints(node, constraints):
+    """Check a raw node against every parsed placement constraint of a service."""
+    for field, operator, value in constraints:
+        actual = node_attribute(node, field)
+        # Comparação de strings como o Swarm faz (sem diferenciar maiúsculas em node.role/hostname)
+        matches = actual is not None and str(actual).lower() == value.lower()
+        if (operator == '==') != matches:
+            return False
+    return True
+
+
+def node_resources(node):
+    """Total CPU (nano) and memory (bytes) of a raw node description."""
+    # A API do Docker publica os recursos em Description.Resources
+    resources = node.get('Description', {}).get('Resources') or node.get('Status', {}).get('Resources', {})
+    return resources.get('NanoCPUs', 0), resources.get('MemoryBytes', 0)
+
+
+def resource_reservations(resources):
+    """CPU (nano) and memory (bytes) from a Resources block ({'Reservations': {...}})."""
+    reservations = (resources or {}).get('Reservations') or {}
+    return reservations.get('NanoCPUs', 0), reservations.get('MemoryBytes', 0)
+
+
+def task_reservations(task):
+    """CPU (nano) and memory (bytes) reserved by a task."""
+    return resource_reservations(task.get('Spec', {}).get('Resources'))
+
+
+def service_placement(service_attrs):
+    """Parse the placement requirements of a raw service (constraints, MaxReplicas, reservations)."""
+    task_template = service_attrs['Spec'].get('TaskTemplate', {})
+    placement = task_template.get('Placement', {})
+    constraints = tuple(parse_constraint(expression) for expression in placement.get('Constraints') or [])
+    cpu_needed, memory_needed = resource_reservations(task_template.get('Resources'))
+    return ServicePlacement(constraints, placement.get('MaxReplicas', 0), cpu_needed, memory_needed)
+
+
+def count_schedulable_replicas(nodes, tasks_by_node, service_id, placement, additional_replicas):
+    """Simulate Swarm placement node by node and return how many new replicas fit.
+
+    Considers node readiness/availability, the service's ServicePlacement
+    (constraints, per-node ``MaxReplicas``) and the free reservations on each
+    node (Swarm schedules on Reservations, not Limits).
+    """
+    constraints = placement.constraints
+    max_per_node = placement.max_per_node
+    cpu_needed, memory_needed = placement.cpu_needed, placement.memory_needed
+
+    schedulable = 0
+    for node in nodes:
+        if node['Status']['State'] != 'ready' or node['Spec']['Availability'] != 'active':
+            continue
+        if not node_matches_constraints(node, constraints):
+            continue
+
+        node_tasks = tasks_by_node.get(node['ID'], [])
+        node_cpu, node_memory = node_resources(node)
+        free_cpu = node_cpu - sum(task_reservations(task)[0] for task in node_tasks)
+        free_memory = node_memory - sum(task_reservations(task)[1] for task in node_tasks)
+
+        capacity = additional_replicas
+        if cpu_needed:
+            capacity = min(capacity, max(0, free_cpu) // cpu_needed)
+        if memory_needed:
+            capacity = min(capacity, max(0, free_memory) // memory_needed)
+        if max_per_node:
+            existing = sum(1 for task in node_tasks if task.get('ServiceID') == service_id)
+            capacity = min(capacity, max(0, max_per_node - existing))
+
+        logging.debug(f"Nó '{node_attribute(node, 'node.hostname')}': comporta {capacity} réplica(s) adicional(is).")
+        schedulable += capacity
+        if schedulable >= additional_replicas:
+            return additional_replicas
+
+    return int(schedulable)
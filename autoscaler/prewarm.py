@@ -0,0 +1,197 @@
+import math
+import time
+import struct
+from collections import namedtuple
+
+MINUTES_PER_DAY = 1440
+
+# Janela de réplicas mínimas: começa em cada minuto que casa com a expressão cron e dura duration_seconds
+ScheduleWindow = namedtuple('ScheduleWindow', ['cron', 'duration_seconds', 'min_replicas'])
+
+# Limites de cada campo cron: minuto, hora, dia do mês, mês, dia da semana (0 ou 7 = domingo)
+CRON_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# Nomes aceitos nos campos de mês e dia da semana (como no cron padrão, sem diferenciar maiúsculas)
+CRON_MONTH_NAMES = {name: index + 1 for index, name in enumerate(
+    ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'))}
+CRON_WEEKDAY_NAMES = {name: index for index, name in enumerate(('SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'))}
+CRON_FIELD_NAMES = (None, None, None, CRON_MONTH_NAMES, CRON_WEEKDAY_NAMES)
+
+# Por minuto do dia: média (float32), dias observados (uint16), último dia observado (uint32)
+SEASONALITY_BUCKET_FORMAT = struct.Struct('<fHI')
+
+
+def _cron_value(text, field, names=None):
+    if names and text.upper() in names:
+        return names[text.upper()]
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Valor '{text}' inválido no campo cron '{field}'") from None
+
+
+def parse_cron_field(field, low, high, names=None):
+    """Expand one cron field (``*``, ``*/n``, ``a-b``, ``a-b/n`` and comma lists) into a set of values.
+
+    ``names`` maps names (``JAN``, ``MON``, ...) to values for the month and day-of-week fields.
+    """
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = _cron_value(step_text, field)
+            if step <= 0:
+                raise ValueError(f"Passo inválido no campo cron '{field}'")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (_cron_value(value, field, names) for value in part.split('-', 1))
+        else:
+            start = _cron_value(part, field, names)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Valor fora do intervalo {low}-{high} no campo cron '{field}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) matched per minute."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expressão cron deve ter 5 campos: '{expression}'")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high, names)
+            for field, (low, high), names in zip(fields, CRON_FIELD_RANGES, CRON_FIELD_NAMES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def matches(self, local_time):
+        """True if a ``time.struct_time`` falls on a minute selected by the expression."""
+        if local_time.tm_min not in self.minutes or local_time.tm_hour not in self.hours or local_time.tm_mon not in self.months:
+            return False
+        day_match = local_time.tm_mday in self.days
+        # struct_time usa segunda=0; cron usa domingo=0
+        weekday_match = (local_time.tm_wday + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        # Como no cron, com os dois campos restritos basta um deles casar
+        return day_match or weekday_match
+
+    def __repr__(self):
+        return f"CronExpression('{self.expression}')"
+
+
+def parse_schedule(entries):
+    """Build ScheduleWindows from YAML entries or from the SCHEDULE_WINDOWS string.
+
+    YAML entries are mappings with ``cron``, ``duration_minutes`` and ``min_replicas``;
+    the string form is ``<cron> <duration_minutes> <min_replicas>`` separated by ``;``.
+    """
+    if not entries:
+        return []
+    if isinstance(entries, str):
+        parsed = []
+        for entry in entries.split(';'):
+            fields = entry.split()
+            if not fields:
+                continue
+            if len(fields) != 7:
+                raise ValueError(f"Janela de agendamento inválida (esperado '<cron> <minutos> <réplicas>'): '{entry.strip()}'")
+            parsed.append({'cron': ' '.join(fields[:5]), 'duration_minutes': fields[5], 'min_replicas': fields[6]})
+        entries = parsed
+
+    windows = []
+    for entry in entries:
+        try:
+            windows.append(ScheduleWindow(
+                CronExpression(entry['cron']), int(float(entry['duration_minutes']) * 60), int(entry['min_replicas'])
+            ))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Janela de agendamento inválida: {entry} ({e})")
+        except ValueError as e:
+            raise ValueError(f"Janela de agendamento inválida em SCHEDULE_WINDOWS/'schedule': {entry} ({e})") from None
+    return windows
+
+
+def scheduled_min_replicas(windows, now):
+    """Highest min_replicas among the schedule windows active at ``now`` (0 if none)."""
+    current_minute = int(now // 60) * 60
+    minimum = 0
+    for window in windows:
+        if window.min_replicas <= minimum:
+            continue
+        # Janela ativa se começou em algum minuto dentro da sua duração
+        for offset in range(0, max(window.duration_seconds, 60), 60):
+            if window.cron.matches(time.localtime(current_minute - offset)):
+                minimum = window.min_replicas
+                break
+    return minimum
+
+
+def minute_of_day(timestamp):
+    local_time = time.localtime(timestamp)
+    return local_time.tm_hour * 60 + local_time.tm_min
+
+
+class SeasonalityProfile:
+    """Per-minute-of-day exponentially weighted average of the queue demand (waiting + active jobs)."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.averages = [0.0] * MINUTES_PER_DAY
+        self.days = [0] * MINUTES_PER_DAY
+        self.last_day = [0] * MINUTES_PER_DAY
+
+    def observe(self, timestamp, demand):
+        bucket = minute_of_day(timestamp)
+        day = int(timestamp // 86400) + 1
+        if self.last_day[bucket] != day:
+            self.last_day[bucket] = day
+            self.days[bucket] += 1
+            if self.days[bucket] == 1:
+                self.averages[bucket] = float(demand)
+                return
+        self.averages[bucket] += self.alpha * (demand - self.averages[bucket])
+
+    def peak_demand(self, now, lead_seconds, min_days):
+        """Highest learned demand from now to ``lead_seconds`` ahead, using minutes seen on ``min_days`` days."""
+        start = minute_of_day(now)
+        peak = 0.0
+        for offset in range(0, int(lead_seconds // 60) + 1):
+            bucket = (start + offset) % MINUTES_PER_DAY
+            if self.days[bucket] >= min_days:
+                peak = max(peak, self.averages[bucket])
+        return peak
+
+    def encode(self):
+        return b''.join(
+            SEASONALITY_BUCKET_FORMAT.pack(average, min(days, 65535), last_day)
+            for average, days, last_day in zip(self.averages, self.days, self.last_day)
+        )
+
+    def decode(self, data):
+        if len(data) != SEASONALITY_BUCKET_FORMAT.size * MINUTES_PER_DAY:
+            return False
+        for bucket in range(MINUTES_PER_DAY):
+            self.averages[bucket], self.days[bucket], self.last_day[bucket] = SEASONALITY_BUCKET_FORMAT.unpack_from(
+                data, bucket * SEASONALITY_BUCKET_FORMAT.size
+            )
+        return True
+
+
+def prewarm_min_replicas(target, now):
+    """Replica floor from the schedule windows and the learned seasonality of a target."""
+    cfg = target.config
+    minimum = scheduled_min_replicas(target.schedule_windows, now)
+    if target.seasonality is not None and cfg.worker_concurrency > 0:
+        peak = target.seasonality.peak_demand(now, cfg.seasonality_lead_seconds, cfg.seasonality_min_days)
+        # Demanda = jobs que precisam de um slot de worker; cada réplica executa worker_concurrency jobs
+        minimum = max(minimum, math.ceil(peak / cfg.worker_concurrency))
+    return min(minimum, cfg.max_replicas)
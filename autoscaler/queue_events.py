@@ -0,0 +1,247 @@
+import time
+import logging
+import threading
+
+import redis
+
+from queue_state import WAIT_KEY_SUFFIXES
+
+# Eventos do stream BullMQ que indicam novos jobs aguardando e disparam reavaliação imediata
+TRIGGER_EVENTS = ('waiting', 'added')
+
+# Comandos que colocam jobs na lista de espera ou no conjunto de prioridade (nomes dos eventos de keyspace)
+PUSH_COMMANDS = ('lpush', 'rpush', 'linsert', 'zadd')
+
+# Flags de notify-keyspace-events necessárias: keyspace (K), listas (l) e sorted sets (z)
+KEYSPACE_FLAGS = 'Klz'
+
+# Bloqueio máximo de cada XREAD, para que um pedido de parada seja atendido rapidamente
+STOP_CHECK_SECONDS = 1
+
+
+def apply_event(snapshot, event):
+    """Return the snapshot adjusted by one BullMQ lifecycle event."""
+    wait = snapshot.wait
+    prioritized = snapshot.prioritized
+    active = snapshot.active
+    completed = snapshot.completed
+    failed = snapshot.failed
+    enqueued = snapshot.enqueued
+
+    # 'added' sempre é seguido de 'waiting' (ou 'delayed'); só 'waiting' altera o contador de espera
+    if event == 'added':
+        if enqueued is None:
+            return snapshot
+        enqueued += 1
+    elif event == 'waiting':
+        wait += 1
+    elif event == 'active':
+        if wait > 0:
+            wait -= 1
+        elif prioritized > 0:
+            prioritized -= 1
+        active += 1
+    elif event == 'completed':
+        active = max(0, active - 1)
+        completed += 1
+    elif event == 'failed':
+        active = max(0, active - 1)
+        failed += 1
+    elif event == 'drained':
+        wait = 0
+        prioritized = 0
+    else:
+        return snapshot
+
+    return snapshot._replace(
+        timestamp=time.time(), wait=wait, prioritized=prioritized,
+        active=active, completed=completed, failed=failed, enqueued=enqueued
+    )
+
+
+class QueueEventWatcher:
+    """Follows the BullMQ '<prefix>:<queue>:events' streams and keeps incremental job counters."""
+
+    def __init__(self, r_conn, min_interval_seconds=2, wake_only=False):
+        self.r_conn = r_conn
+        self.min_interval_seconds = min_interval_seconds
+        # Chave base da fila -> último ID lido e snapshot ajustado pelos eventos
+        self.last_ids = {}
+        self.snapshots = {}
+        self.last_trigger_time = 0
+        # Com wake_only, apenas filas de serviços em zero réplicas (armadas) disparam reavaliação
+        self.wake_only = wake_only
+        self.armed = set()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Make wait_for_trigger return within STOP_CHECK_SECONDS, now and on later calls."""
+        self._stop.set()
+
+    def arm(self, base_key):
+        self.armed.add(base_key)
+
+    def disarm(self, base_key):
+        self.armed.discard(base_key)
+
+    def add_queue(self, base_key):
+        """Start following the events stream of a queue from its current last entry."""
+        self.last_ids[base_key] = self._stream_end(f"{base_key}:events")
+        self.snapshots[base_key] = None
+
+    def _stream_end(self, stream_key):
+        # '$' só vale dentro de uma chamada XREAD: eventos publicados entre duas chamadas seriam perdidos.
+        # Sem o stream, '0-0' lê desde o primeiro evento quando ele for criado.
+        try:
+            return self.r_conn.xinfo_stream(stream_key)['last-generated-id']
+        except redis.exceptions.ResponseError:
+            return '0-0'
+
+    def stream_keys(self):
+        """Names of the followed event streams."""
+        return [f"{base_key}:events" for base_key in self.last_ids]
+
+    def reconcile(self, base_key, snapshot):
+        """Replace the incremental counters of a queue with a full snapshot read from Redis."""
+        previous = self.snapshots.get(base_key)
+        if previous is not None:
+            drift = (snapshot.wait + snapshot.prioritized) - (previous.wait + previous.prioritized)
+            if drift:
+                logging.debug(f"Reconciliação do stream de eventos de '{base_key}': diferença de {drift} jobs aguardando.")
+        self.snapshots[base_key] = snapshot
+
+    def current_snapshot(self, base_key):
+        """Return the last reconciled snapshot adjusted by the events seen since then."""
+        return self.snapshots.get(base_key)
+
+    def _apply_entry(self, base_key, fields):
+        """Update the counters from one stream entry; returns True if it should trigger a decision."""
+        event = fields.get('event')
+        snapshot = self.snapshots.get(base_key)
+        if snapshot is not None and event is not None:
+            self.snapshots[base_key] = apply_event(snapshot, event)
+        return event in TRIGGER_EVENTS and (not self.wake_only or base_key in self.armed)
+
+    def wait_for_trigger(self, timeout_seconds):
+        """Block on XREAD until new jobs are enqueued or the timeout expires; returns the triggered queues."""
+        deadline = time.time() + timeout_seconds
+        triggered = set()
+        release_at = deadline
+
+        while not self._stop.is_set():
+            now = time.time()
+            if now >= release_at:
+                break
+
+            streams = {f"{base_key}:events": last_id for base_key, last_id in self.last_ids.items()}
+            try:
+                block_ms = max(1, int(min(release_at - now, STOP_CHECK_SECONDS) * 1000))
+                response = self.r_conn.xread(streams, block=block_ms, count=500)
+            except redis.exceptions.ResponseError as e:
+                logging.error(f"Erro do Redis ao ler streams de eventos: {e}")
+                time.sleep(max(0, release_at - time.time()))
+                break
+
+            for stream_key, entries in response or []:
+                base_key = stream_key[:-len(':events')]
+                for entry_id, fields in entries:
+                    self.last_ids[base_key] = entry_id
+                    if self._apply_entry(base_key, fields) and base_key not in triggered:
+                        if not triggered:
+                            # Debounce: continua consumindo eventos até respeitar o intervalo mínimo entre reavaliações
+                            release_at = min(deadline, max(time.time(), self.last_trigger_time + self.min_interval_seconds))
+                        triggered.add(base_key)
+
+        if triggered:
+            self.last_trigger_time = time.time()
+        return triggered
+
+
+class KeyspaceWakeListener:
+    """Wakes the control loop when jobs reach a queue whose service is parked at zero replicas.
+
+    Subscribes to the Redis keyspace notifications of the wait list and prioritized
+    set of every queue, so it works with any Bull/BullMQ version (no events stream
+    needed). Pushes only trigger for armed queues; the subscription runs in a
+    background thread that reconnects on errors.
+    """
+
+    def __init__(self, r_conn, db=0):
+        self.r_conn = r_conn
+        self.db = db
+        # Canal de keyspace -> chave base da fila
+        self.channels = {}
+        self.armed = set()
+        self.triggered = set()
+        self.condition = threading.Condition()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def add_queue(self, base_key):
+        # Todas as chaves candidatas da lista de espera: uma mudança de layout não exige nova inscrição
+        for key in [f"{base_key}{suffix}" for suffix in WAIT_KEY_SUFFIXES] + [f"{base_key}:prioritized"]:
+            self.channels[f"__keyspace@{self.db}__:{key}"] = base_key
+
+    def enable_notifications(self):
+        """Add the required flags to notify-keyspace-events; returns False if the server refuses CONFIG."""
+        try:
+            current = self.r_conn.config_get('notify-keyspace-events').get('notify-keyspace-events', '')
+            # 'A' já inclui listas e sorted sets
+            missing = ''.join(flag for flag in KEYSPACE_FLAGS if flag not in current and not (flag in 'lz' and 'A' in current))
+            if missing:
+                self.r_conn.config_set('notify-keyspace-events', current + missing)
+                logging.info(f"notify-keyspace-events ajustado para '{current + missing}'.")
+            return True
+        except redis.exceptions.ResponseError as e:
+            logging.warning(f"Não foi possível habilitar notificações de keyspace ({e}). Configure "
+                            f"'notify-keyspace-events {KEYSPACE_FLAGS}' no Redis; até lá o serviço acorda no próximo polling.")
+            return False
+
+    def arm(self, base_key):
+        with self.condition:
+            self.armed.add(base_key)
+
+    def disarm(self, base_key):
+        with self.condition:
+            self.armed.discard(base_key)
+            self.triggered.discard(base_key)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='keyspace-wake', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = self.r_conn.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(*self.channels)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._handle(message['channel'], message['data'])
+            except redis.exceptions.RedisError as e:
+                logging.error(f"Erro na assinatura de notificações de keyspace: {e}. Reconectando em 5s...")
+                self._stop.wait(5)
+            finally:
+                pubsub.close()
+
+    def _handle(self, channel, command):
+        base_key = self.channels.get(channel)
+        if command not in PUSH_COMMANDS or base_key is None:
+            return
+        with self.condition:
+            if base_key in self.armed:
+                self.triggered.add(base_key)
+                self.condition.notify_all()
+
+    def wait_for_trigger(self, timeout_seconds):
+        """Block until a job reaches an armed queue or the timeout expires; returns the triggered queues."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.triggered or self._stop.is_set(), timeout_seconds)
+            triggered, self.triggered = self.triggered, set()
+        return triggered
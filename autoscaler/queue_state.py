@@ -0,0 +1,186 @@
+import math
+import time
+import logging
+from collections import namedtuple
+
+import redis
+
+# enqueued: contador ':id' da fila (incrementado a cada job criado), None se ainda não existe
+QueueSnapshot = namedtuple('QueueSnapshot', [
+    'timestamp', 'wait', 'active', 'paused', 'delayed', 'prioritized', 'completed', 'failed', 'is_paused', 'enqueued'
+], defaults=(None,))
+
+# Sufixos candidatos para a lista de jobs aguardando, em ordem de preferência
+WAIT_KEY_SUFFIXES = (':wait', ':waiting', '')
+
+# Número de comandos enfileirados por fila em add_to_pipeline
+COMMANDS_PER_QUEUE = 9
+
+# Intervalo mínimo entre novas detecções do layout quando a lista de espera não foi encontrada
+LAYOUT_RECHECK_SECONDS = 60
+
+# Máximo de jobs ativos inspecionados ao contar os workers ocupados
+MAX_ACTIVE_JOBS_INSPECTED = 1000
+
+
+def snapshot_waiting(snapshot):
+    """Jobs ready to be picked up by a worker (plain wait list plus prioritized set)."""
+    return snapshot.wait + snapshot.prioritized
+
+
+def snapshot_to_dict(snapshot):
+    """Serialize a snapshot for logs, webhooks and JSON APIs."""
+    return dict(snapshot._asdict())
+
+
+class QueueStateCollector:
+    """Reads the full state of one BullMQ queue in a single pipelined round-trip.
+
+    The key holding the waiting list is detected on creation and detected again
+    (see ``needs_layout_check``) when reading it fails with WRONGTYPE or while it
+    is missing, e.g. before the first job or after a Bull -> BullMQ upgrade.
+    """
+
+    def __init__(self, r_conn, queue_name_prefix, queue_name):
+        self.r_conn = r_conn
+        self.base_key = f"{queue_name_prefix}:{queue_name}"
+        self.wait_key = None
+        self.layout_detected = False
+        self.wait_key_missing = False
+        self.last_detection = 0
+        self.detect_layout()
+
+    def needs_layout_check(self, now=None):
+        """True when the wait key should be probed again (WRONGTYPE, or not found since the last probe)."""
+        if self.layout_detected and not self.wait_key_missing:
+            return False
+        return (now or time.time()) - self.last_detection >= LAYOUT_RECHECK_SECONDS
+
+    def detect_layout(self):
+        """Probe which key holds the waiting list (TYPE/EXISTS) and cache it."""
+        candidates = [f"{self.base_key}{suffix}" for suffix in WAIT_KEY_SUFFIXES]
+        self.last_detection = time.time()
+        try:
+            pipe = self.r_conn.pipeline(transaction=False)
+            for key in candidates:
+                pipe.type(key)
+            key_types = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Erro ao detectar layout das chaves da fila '{self.base_key}': {e}")
+            key_types = []
+
+        for key, key_type in zip(candidates, key_types):
+            if key_type == 'list':
+                if key != self.wait_key:
+                    logging.info(f"Layout da fila detectado: jobs aguardando em '{key}'.")
+                self.wait_key = key
+                self.layout_detected = True
+                self.wait_key_missing = False
+                return self.wait_key
+
+        # Listas vazias não existem no Redis; manter a chave atual (ou o padrão BullMQ) e tentar de novo depois
+        if self.wait_key is None:
+            self.wait_key = candidates[0]
+            logging.info(f"Nenhuma lista de espera encontrada para '{self.base_key}'. Usando padrão '{self.wait_key}'.")
+        self.layout_detected = False
+        return self.wait_key
+
+    def add_to_pipeline(self, pipe):
+        """Queue the commands that read every BullMQ state of this queue on a pipeline."""
+        pipe.llen(self.wait_key)
+        pipe.llen(f"{self.base_key}:active")
+        pipe.llen(f"{self.base_key}:paused")
+        pipe.zcard(f"{self.base_key}:delayed")
+        pipe.zcard(f"{self.base_key}:prioritized")
+        pipe.zcard(f"{self.base_key}:completed")
+        pipe.zcard(f"{self.base_key}:failed")
+        pipe.hget(f"{self.base_key}:meta", 'paused')
+        pipe.get(f"{self.base_key}:id")
+
+    def parse_results(self, results, timestamp=None):
+        """Build a QueueSnapshot from the pipeline results produced by add_to_pipeline."""
+        if isinstance(results[0], redis.exceptions.ResponseError):
+            # WRONGTYPE: a chave de espera mudou de tipo (ex.: atualização Bull -> BullMQ)
+            self.layout_detected = False
+            self.last_detection = 0
+        else:
+            # LLEN de chave inexistente retorna 0; a lista pode ter surgido em outra chave candidata
+            self.wait_key_missing = not results[0]
+        counts = []
+        for value in results[:7]:
+            if isinstance(value, redis.exceptions.ResponseError):
+                # Chave com tipo inesperado (ex.: layout antigo); tratar como vazia
+                logging.warning(f"Erro do Redis ao ler estado da fila '{self.base_key}': {value}. Assumindo 0.")
+                value = 0
+            counts.append(value or 0)
+        paused_flag = results[7]
+        is_paused = not isinstance(paused_flag, Exception) and paused_flag is not None and str(paused_flag) in ('1', 'true')
+        try:
+            enqueued = int(results[8]) if results[8] is not None else None
+        except (TypeError, ValueError):
+            enqueued = None
+
+        return QueueSnapshot(timestamp or time.time(), *counts, is_paused, enqueued)
+
+    def snapshot(self):
+        """Return a QueueSnapshot with the counts of every BullMQ state."""
+        return collect_snapshots(self.r_conn, [self])[0]
+
+    def busy_workers(self, worker_concurrency=1, max_jobs=MAX_ACTIVE_JOBS_INSPECTED):
+        """Number of distinct workers holding active jobs of this queue (None if unknown)."""
+        return count_busy_workers(self.r_conn, self.base_key, worker_concurrency, max_jobs)
+
+
+def _parse_collected(collectors, results):
+    timestamp = time.time()
+    snapshots = []
+    for index, collector in enumerate(collectors):
+        start = index * COMMANDS_PER_QUEUE
+        snapshots.append(collector.parse_results(results[start:start + COMMANDS_PER_QUEUE], timestamp))
+    return snapshots
+
+
+def collect_snapshots(r_conn, collectors):
+    """Read the state of several queues in a single pipelined round-trip."""
+    pipe = r_conn.pipeline(transaction=False)
+    for collector in collectors:
+        collector.add_to_pipeline(pipe)
+    return _parse_collected(collectors, pipe.execute(raise_on_error=False))
+
+
+async def collect_snapshots_async(r_async, collectors):
+    """Same as collect_snapshots on a ``redis.asyncio`` client."""
+    pipe = r_async.pipeline(transaction=False)
+    for collector in collectors:
+        collector.add_to_pipeline(pipe)
+    return _parse_collected(collectors, await pipe.execute(raise_on_error=False))
+
+
+def count_busy_workers(r_conn, base_key, worker_concurrency=1, max_jobs=MAX_ACTIVE_JOBS_INSPECTED):
+    """Count the distinct workers processing jobs, from the lock keys of the active jobs.
+
+    Every active job has a ``<base_key>:<id>:lock`` key holding the token of the
+    worker that owns it (``<worker id>:<n>`` in BullMQ, the worker uuid in Bull),
+    so jobs sharing a token prefix run on the same worker. Without any readable
+    lock, the jobs are assumed packed ``worker_concurrency`` per worker. Returns
+    None when the active list cannot be read.
+    """
+    try:
+        job_ids = r_conn.lrange(f"{base_key}:active", 0, max_jobs - 1)
+        if not job_ids:
+            return 0
+        pipe = r_conn.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.get(f"{base_key}:{job_id}:lock")
+        tokens = pipe.execute(raise_on_error=False)
+    except redis.exceptions.RedisError as e:
+        logging.error(f"Erro ao ler locks dos jobs ativos da fila '{base_key}': {e}")
+        return None
+
+    owners = {str(token).split(':')[0] for token in tokens if token and not isinstance(token, Exception)}
+    if not owners:
+        # Jobs ativos sem lock legível (ex.: lock expirado): o mínimo de workers que os comporta
+        busy = math.ceil(len(job_ids) / max(1, worker_concurrency))
+        logging.debug(f"Nenhum lock legível para os {len(job_ids)} jobs ativos de '{base_key}'. Estimando {busy} worker(s) ocupado(s).")
+        return busy
+    return len(owners)
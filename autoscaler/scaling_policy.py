@@ -0,0 +1,377 @@
+import math
+import logging
+import threading
+from collections import deque, namedtuple
+
+from task_state import UPDATE_IN_PROGRESS_STATES, unready_tasks
+
+# Resultado de uma avaliação: direção ('up', 'down' ou None), réplicas recomendadas pela política,
+# réplicas a aplicar agora e o motivo da ação ('idle' e 'wake' no modo scale-to-zero) ou do adiamento
+# ('cooldown', 'stabilization', 'busy_workers', 'converging')
+ScalingDecision = namedtuple('ScalingDecision', ['direction', 'desired_replicas', 'new_replicas', 'reason'])
+
+
+def calculate_desired_replicas(queue_length, current_replicas, min_replicas, max_replicas,
+                               scale_up_threshold, scale_down_threshold,
+                               target_jobs_per_replica, max_scale_up_step, max_scale_down_step):
+    """Compute the target replica count from the backlog per worker (HPA-style formula)."""
+    # Réplicas necessárias para manter no máximo target_jobs_per_replica jobs por worker
+    proportional = math.ceil(queue_length / target_jobs_per_replica) if target_jobs_per_replica > 0 else current_replicas
+
+    desired = current_replicas
+    if queue_length > scale_up_threshold and current_replicas < max_replicas:
+        # Sempre ao menos +1 quando o limite é ultrapassado, limitado pelo passo máximo
+        desired = max(proportional, current_replicas + 1)
+        desired = min(desired, current_replicas + max_scale_up_step)
+    elif queue_length < scale_down_threshold and current_replicas > min_replicas:
+        desired = min(proportional, current_replicas - 1)
+        desired = max(desired, current_replicas - max_scale_down_step)
+
+    desired = max(min_replicas, min(desired, max_replicas))
+    if desired != current_replicas:
+        logging.debug(f"Política proporcional: fila={queue_length}, alvo/réplica={target_jobs_per_replica}, "
+                      f"proporcional={proportional}, réplicas {current_replicas} -> {desired}")
+    return desired
+
+
+def calculate_predictive_replicas(arrival_rate, drain_rate_per_worker, backlog, horizon_seconds):
+    """Replicas needed to absorb the arrival rate and drain the current backlog within the horizon."""
+    if arrival_rate is None or not drain_rate_per_worker or drain_rate_per_worker <= 0:
+        return None
+    required_rate = arrival_rate + backlog / max(horizon_seconds, 1)
+    return math.ceil(required_rate / drain_rate_per_worker)
+
+
+def calculate_slo_replicas(queue_length, oldest_wait_seconds, arrival_rate, per_worker_rate,
+                           current_replicas, wait_slo_seconds):
+    """Replicas needed so that no job waits longer than the wait-time SLO before starting."""
+    required = None
+    if queue_length == 0 and not arrival_rate:
+        required = 0
+    elif per_worker_rate and per_worker_rate > 0:
+        # Absorver as chegadas e iniciar todo o backlog atual dentro do SLO
+        required = math.ceil(((arrival_rate or 0) + queue_length / wait_slo_seconds) / per_worker_rate)
+
+    if oldest_wait_seconds > wait_slo_seconds:
+        # SLO violado: sempre ao menos +1 réplica, mesmo sem capacidade por worker conhecida
+        return max(required or 0, current_replicas + 1)
+    if required is None:
+        return current_replicas
+    if oldest_wait_seconds > wait_slo_seconds / 2:
+        # Perto do limite: não reduzir
+        return max(required, current_replicas)
+    return required
+
+
+def calculate_utilization_replicas(running_replicas, utilization_percent, target_percent, tolerance=0.1):
+    """Replicas that bring the average utilization to the target (HPA formula with a tolerance band)."""
+    if utilization_percent is None or target_percent <= 0 or running_replicas <= 0:
+        return None
+    ratio = utilization_percent / target_percent
+    if abs(ratio - 1) <= tolerance:
+        return running_replicas
+    return math.ceil(running_replicas * ratio)
+
+
+def worker_job_rate(latency, window, current_replicas, worker_concurrency):
+    """Jobs per second a single worker can complete, from processing times or observed throughput (None if unknown)."""
+    if latency is not None and latency.processing_mean:
+        return worker_concurrency / latency.processing_mean
+    return window.drain_rate_per_worker(current_replicas)
+
+
+def decide_scaling(target, queue_length, active_jobs, current_replicas, now, latency=None, running_replicas=None,
+                   utilization=None):
+    """Run the scaling policy of a target (proportional or SLO, predictive, cooldowns, stabilization).
+
+    ``target`` provides ``config`` (TargetConfig), ``state`` (ScalerState) and
+    ``metrics_window`` (MetricsWindow, already updated with the current sample).
+    ``latency`` is the JobLatency of the queue, required by the wait-time SLO mode; while
+    the per-worker job rate is still unknown the SLO mode falls back to the proportional
+    policy (plus one replica when the SLO is violated).
+    ``running_replicas`` (tasks actually running) is the effective capacity used for
+    per-worker rates; it defaults to ``current_replicas``. ``utilization`` (WorkerUtilization)
+    adds the CPU and memory signals: the highest recommendation among all signals wins.
+    No I/O is done here so the same logic drives the autoscaler and the simulator.
+    """
+    cfg = target.config
+    capacity = current_replicas if running_replicas is None else running_replicas
+    # Piso de réplicas elevado por janelas agendadas ou sazonalidade aprendida (pré-aquecimento)
+    min_replicas = max(cfg.min_replicas, getattr(target, 'prewarm_min_replicas', 0))
+    per_worker_rate = None
+    if cfg.wait_slo_seconds > 0 and latency is not None:
+        per_worker_rate = worker_job_rate(latency, target.metrics_window, capacity, cfg.worker_concurrency)
+    if per_worker_rate:
+        desired = calculate_slo_replicas(
+            queue_length, latency.oldest_wait_seconds, target.metrics_window.arrival_rate(),
+            per_worker_rate, current_replicas, cfg.wait_slo_seconds
+        )
+        desired = min(desired, current_replicas + cfg.max_scale_up_step)
+        desired = max(desired, current_replicas - cfg.max_scale_down_step)
+        desired = max(min_replicas, min(desired, cfg.max_replicas))
+        if latency.oldest_wait_seconds > cfg.wait_slo_seconds:
+            logging.info(f"[{cfg.name}] SLO de espera violado: job mais antigo aguarda há {latency.oldest_wait_seconds:.0f}s (limite {cfg.wait_slo_seconds}s). Réplicas recomendadas: {desired}.")
+    else:
+        desired = calculate_desired_replicas(
+            queue_length, current_replicas, min_replicas, cfg.max_replicas,
+            cfg.scale_up_queue_threshold, cfg.scale_down_queue_threshold,
+            cfg.target_jobs_per_replica, cfg.max_scale_up_step, cfg.max_scale_down_step
+        )
+        if cfg.wait_slo_seconds > 0 and latency is not None:
+            logging.info(f"[{cfg.name}] Capacidade por worker ainda desconhecida; modo SLO usando a política proporcional.")
+            if latency.oldest_wait_seconds > cfg.wait_slo_seconds and current_replicas < cfg.max_replicas:
+                # SLO violado: ao menos +1 réplica, como no modo SLO
+                desired = max(desired, current_replicas + 1)
+
+    if utilization is not None:
+        signals = (('CPU', utilization.cpu_percent, cfg.target_cpu_percent),
+                   ('memória', utilization.memory_percent, cfg.target_memory_percent))
+        for signal, value, target_percent in signals:
+            signal_desired = calculate_utilization_replicas(capacity, value, target_percent)
+            if signal_desired is None:
+                continue
+            signal_desired = max(min_replicas, min(signal_desired, cfg.max_replicas, current_replicas + cfg.max_scale_up_step))
+            if signal_desired > desired:
+                logging.info(f"[{cfg.name}] Sinal de {signal}: utilização {value:.0f}% (alvo {target_percent}%) recomenda {signal_desired} réplicas.")
+                desired = signal_desired
+
+    if cfg.predictive_scaling:
+        window = target.metrics_window
+        arrival_rate = window.arrival_rate()
+        throughput = window.throughput()
+        if arrival_rate is not None:
+            time_to_drain = window.time_to_drain()
+            drain_text = f"{time_to_drain:.0f}s" if time_to_drain is not None else "indefinido"
+            logging.info(f"[{cfg.name}] Taxa de chegada: {arrival_rate:.2f} jobs/s, Vazão: {throughput:.2f} jobs/s, Tempo estimado para esvaziar: {drain_text}")
+
+        # Antecipar o backlog quando chegam mais jobs do que os workers conseguem processar
+        if arrival_rate is not None and arrival_rate > throughput:
+            per_worker_rate = window.drain_rate_per_worker(capacity)
+            predicted = calculate_predictive_replicas(arrival_rate, per_worker_rate, queue_length + active_jobs, cfg.predictive_horizon_seconds)
+            if predicted is not None:
+                predicted = min(predicted, cfg.max_replicas, current_replicas + cfg.max_scale_up_step)
+                if predicted > desired:
+                    logging.info(f"[{cfg.name}] Escalonamento preditivo: chegada ({arrival_rate:.2f}/s) excede vazão ({throughput:.2f}/s). Réplicas recomendadas: {predicted}.")
+                    desired = predicted
+
+    state = target.state
+    state.record_recommendation(now, desired, cfg.scale_down_stabilization_seconds)
+
+    if desired > current_replicas:
+        if current_replicas < min_replicas:
+            # Subir até o piso de pré-aquecimento não espera o cooldown: o pico é previsto, não uma oscilação
+            return ScalingDecision('up', desired, desired, None)
+        remaining_cooldown = state.scale_up_cooldown_remaining(now, cfg.scale_up_cooldown_seconds)
+        if remaining_cooldown > 0:
+            logging.info(f"[{cfg.name}] Escalonamento para cima necessário ({current_replicas} -> {desired}), mas em cooldown por mais {remaining_cooldown:.0f}s.")
+            return ScalingDecision(None, desired, current_replicas, 'cooldown')
+        return ScalingDecision('up', desired, desired, None)
+
+    if desired < current_replicas:
+        new_replicas = state.stabilized_scale_down(now, current_replicas, cfg.scale_down_stabilization_seconds)
+        if new_replicas >= current_replicas:
+            logging.info(f"[{cfg.name}] Redução para {desired} réplicas aguardando estabilização ({cfg.scale_down_stabilization_seconds}s).")
+            return ScalingDecision(None, desired, current_replicas, 'stabilization')
+        remaining_cooldown = state.scale_down_cooldown_remaining(now, cfg.scale_down_cooldown_seconds)
+        if remaining_cooldown > 0:
+            logging.info(f"[{cfg.name}] Escalonamento para baixo necessário ({current_replicas} -> {new_replicas}), mas em cooldown por mais {remaining_cooldown:.0f}s.")
+            return ScalingDecision(None, desired, current_replicas, 'cooldown')
+        return ScalingDecision('down', desired, new_replicas, None)
+
+    return ScalingDecision(None, desired, current_replicas, None)
+
+
+def apply_drain_guard(target, decision, current_replicas, busy_workers, now):
+    """Limit a scale-down to the number of idle workers.
+
+    Swarm picks which tasks to stop, so busy workers can still be removed; the
+    guard only bounds the reduction to as many replicas as hold no active job. When
+    every worker is busy the scale-down waits up to ``scale_down_drain_timeout_seconds``
+    (0 waits indefinitely) and then proceeds, relying on the service stop grace
+    period to let the workers finish their jobs.
+    """
+    cfg = target.config
+    state = target.state
+    if decision.direction != 'down' or busy_workers is None or not cfg.drain_aware_scale_down:
+        state.drain_blocked_since = None
+        return decision
+
+    idle_workers = max(0, current_replicas - busy_workers)
+    allowed = max(decision.new_replicas, current_replicas - idle_workers)
+    if allowed < current_replicas:
+        state.drain_blocked_since = None
+        if allowed > decision.new_replicas:
+            logging.info(f"[{cfg.name}] Apenas {idle_workers} worker(s) ocioso(s). Redução limitada a {current_replicas} -> {allowed} (política: {decision.new_replicas}).")
+        return decision._replace(new_replicas=allowed)
+
+    if state.drain_blocked_since is None:
+        state.drain_blocked_since = now
+    waited = now - state.drain_blocked_since
+    timeout = cfg.scale_down_drain_timeout_seconds
+    if timeout <= 0 or waited < timeout:
+        logging.info(f"[{cfg.name}] Redução adiada: todos os {current_replicas} worker(s) estão processando jobs (aguardando há {waited:.0f}s).")
+        return ScalingDecision(None, decision.desired_replicas, current_replicas, 'busy_workers')
+
+    logging.warning(f"[{cfg.name}] Workers ocupados há {waited:.0f}s. Reduzindo mesmo assim; jobs em andamento dependem do stop_grace_period do serviço.")
+    state.drain_blocked_since = None
+    return decision
+
+
+def apply_convergence_guard(target, decision, service_state, now):
+    """Hold scale-ups while the service has not converged to its configured replicas.
+
+    Extra replicas add no capacity while earlier ones are still pending or
+    starting (no resources, image pull) or a rolling update is replacing tasks,
+    so scale-ups wait for convergence, at most ``convergence_timeout_seconds``
+    (0 disables the guard). Scale-downs are also held during a rolling update.
+    """
+    cfg = target.config
+    state = target.state
+    task_states = service_state.task_states
+    updating = service_state.update_state in UPDATE_IN_PROGRESS_STATES
+    unready = unready_tasks(task_states) if task_states is not None else 0
+    if cfg.convergence_timeout_seconds <= 0 or (not updating and unready == 0):
+        state.converging_since = None
+        return decision
+
+    if state.converging_since is None:
+        state.converging_since = now
+    if decision.direction != 'up' and not (decision.direction == 'down' and updating):
+        return decision
+
+    waited = now - state.converging_since
+    if waited >= cfg.convergence_timeout_seconds:
+        logging.warning(f"[{cfg.name}] Serviço sem convergir há {waited:.0f}s. Aplicando escalonamento {service_state.replicas} -> {decision.new_replicas} mesmo assim.")
+        return decision
+    cause = f"atualização em andamento ({service_state.update_state})" if updating else f"{unready} tarefa(s) ainda não em execução"
+    logging.info(f"[{cfg.name}] Escalonamento {service_state.replicas} -> {decision.new_replicas} adiado: serviço não convergiu, {cause}.")
+    return ScalingDecision(None, decision.desired_replicas, service_state.replicas, 'converging')
+
+
+def apply_scale_to_zero(target, decision, queue_length, active_jobs, current_replicas, now):
+    """Park an idle service at zero replicas and wake it as soon as jobs arrive.
+
+    After ``scale_to_zero_idle_seconds`` with no waiting or active jobs (and no
+    pre-warm floor) the service goes to 0, below ``min_replicas``. While parked the
+    replica floor is ignored; the first waiting job brings it back to
+    ``wake_replicas`` (at least ``min_replicas``) without waiting for cooldowns.
+    """
+    cfg = target.config
+    state = target.state
+    if cfg.scale_to_zero_idle_seconds <= 0:
+        return decision
+    idle = queue_length == 0 and active_jobs == 0
+    prewarm_min = getattr(target, 'prewarm_min_replicas', 0)
+
+    if current_replicas == 0:
+        state.idle_since = None
+        if idle and prewarm_min == 0:
+            return ScalingDecision(None, 0, 0, None)
+        wake_replicas = max(cfg.wake_replicas, cfg.min_replicas, prewarm_min, decision.desired_replicas, 1)
+        wake_replicas = min(wake_replicas, cfg.max_replicas)
+        cause = f"{queue_length} job(s) na fila" if not idle else "pré-aquecimento"
+        logging.info(f"[{cfg.name}] Acordando serviço em zero réplicas ({cause}): 0 -> {wake_replicas}, ignorando cooldown.")
+        state.wake_started_at = now
+        return ScalingDecision('up', wake_replicas, wake_replicas, 'wake')
+
+    if not idle or prewarm_min > 0:
+        state.idle_since = None
+        return decision
+    if state.idle_since is None:
+        state.idle_since = now
+    idle_for = now - state.idle_since
+    if idle_for < cfg.scale_to_zero_idle_seconds or decision.direction == 'up':
+        return decision
+    logging.info(f"[{cfg.name}] Fila vazia e sem jobs ativos há {idle_for:.0f}s. Reduzindo {current_replicas} -> 0 réplicas.")
+    return ScalingDecision('down', 0, 0, 'idle')
+
+
+def plan_scaling(target, queue_length, active_jobs, service_state, now, latency=None, utilization=None,
+                 read_busy_workers=None):
+    """Full policy pipeline shared by the autoscaler and the simulator.
+
+    Runs decide_scaling, then the scale-to-zero, convergence and drain guards, for a
+    service described by ``service_state`` (ServiceState). ``read_busy_workers`` is
+    only called when a drain-aware scale-down is still planned after the other guards,
+    so its I/O (reading job locks) stays off the common path. Returns
+    ``(decision, busy_workers)``.
+    """
+    current_replicas = service_state.replicas
+    decision = decide_scaling(target, queue_length, active_jobs, current_replicas, now, latency,
+                              service_state.running_tasks, utilization)
+    decision = apply_scale_to_zero(target, decision, queue_length, active_jobs, current_replicas, now)
+    decision = apply_convergence_guard(target, decision, service_state, now)
+    busy_workers = None
+    if decision.direction == 'down' and target.config.drain_aware_scale_down and read_busy_workers is not None:
+        busy_workers = read_busy_workers()
+    decision = apply_drain_guard(target, decision, current_replicas, busy_workers, now)
+    return decision, busy_workers
+
+
+def observe_cold_start(target, task_states, running_replicas, now):
+    """Seconds from a wake-up to the first running worker, once it is running (None otherwise)."""
+    state = target.state
+    if state.wake_started_at is None or not running_replicas:
+        return None
+    started_at = now
+    if task_states is not None and task_states.running_since is not None and task_states.running_since >= state.wake_started_at:
+        started_at = task_states.running_since
+    cold_start = started_at - state.wake_started_at
+    state.wake_started_at = None
+    return cold_start
+
+
+class ScalerState:
+    """Tracks per-direction cooldowns and the scale-down stabilization window.
+
+    ``lock`` guards the history persisted by the state store (recommendations, and
+    the target's metrics window and seasonality profile), which the evaluation
+    thread mutates while the persister copies it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_scale_up_time = 0
+        self.last_scale_down_time = 0
+        # Recomendações recentes (timestamp, réplicas desejadas) para a janela de estabilização
+        self.recommendations = deque()
+        # Início da espera por workers ociosos para reduzir (None quando não há redução adiada)
+        self.drain_blocked_since = None
+        # Início do período em que o serviço não está convergido (None quando convergido)
+        self.converging_since = None
+        # Scale-to-zero: início do período ocioso e instante em que o serviço foi acordado
+        self.idle_since = None
+        self.wake_started_at = None
+
+    def scale_up_cooldown_remaining(self, now, cooldown_seconds):
+        """Seconds left before another scale-up is allowed."""
+        return max(0, cooldown_seconds - (now - self.last_scale_up_time))
+
+    def scale_down_cooldown_remaining(self, now, cooldown_seconds):
+        """Seconds left before a scale-down is allowed (counts from any scaling event)."""
+        last_event = max(self.last_scale_up_time, self.last_scale_down_time)
+        return max(0, cooldown_seconds - (now - last_event))
+
+    def record_recommendation(self, now, desired_replicas, window_seconds):
+        """Store a recommendation, dropping those older than the stabilization window."""
+        with self.lock:
+            self.recommendations.append((now, desired_replicas))
+            # Mantém uma amostra anterior ao início da janela para saber se ela está totalmente coberta
+            while len(self.recommendations) > 1 and self.recommendations[1][0] <= now - window_seconds:
+                self.recommendations.popleft()
+
+    def stabilized_scale_down(self, now, current_replicas, window_seconds):
+        """Return the replica count allowed for scale-down: the highest recommendation in the window."""
+        if window_seconds <= 0:
+            return self.recommendations[-1][1] if self.recommendations else current_replicas
+        if not self.recommendations or self.recommendations[0][0] > now - window_seconds:
+            # Janela ainda não coberta por amostras (ex.: logo após iniciar); não reduzir
+            return current_replicas
+        return min(current_replicas, max(desired for _, desired in self.recommendations))
+
+    def mark_scaled(self, now, direction):
+        """Register a completed scaling action ('scale_up' or 'scale_down')."""
+        if direction == "scale_up":
+            self.last_scale_up_time = now
+        else:
+            self.last_scale_down_time = now
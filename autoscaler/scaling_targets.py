@@ -0,0 +1,84 @@
+import logging
+from collections import namedtuple
+
+import yaml
+
+from scaling_policy import ScalerState
+from metrics_window import MetricsWindow
+from prewarm import SeasonalityProfile, parse_schedule
+
+# Parâmetros de escalonamento configuráveis por par fila -> serviço
+TARGET_SETTINGS = (
+    'min_replicas', 'max_replicas',
+    'scale_up_queue_threshold', 'scale_down_queue_threshold',
+    'target_jobs_per_replica', 'max_scale_up_step', 'max_scale_down_step',
+    'scale_up_cooldown_seconds', 'scale_down_cooldown_seconds', 'scale_down_stabilization_seconds',
+    'predictive_scaling', 'predictive_horizon_seconds', 'metrics_window_size',
+    'drain_aware_scale_down', 'scale_down_drain_timeout_seconds',
+    'wait_slo_seconds', 'worker_concurrency',
+    'schedule', 'learned_seasonality', 'seasonality_lead_seconds', 'seasonality_min_days',
+    'convergence_timeout_seconds', 'target_cpu_percent', 'target_memory_percent',
+    'scale_to_zero_idle_seconds', 'wake_replicas',
+)
+
+TargetConfig = namedtuple('TargetConfig', ('name', 'queue_prefix', 'queue_name', 'service_name') + TARGET_SETTINGS)
+
+
+def load_scaling_targets(config_path, defaults):
+    """Load the queue -> Swarm service mapping from a YAML file.
+
+    ``defaults`` holds every setting in TARGET_SETTINGS plus ``queue_prefix``; a
+    ``defaults`` section in the file overrides them and each target may override
+    any of them again.
+    """
+    with open(config_path) as config_file:
+        config = yaml.safe_load(config_file) or {}
+
+    base = dict(defaults)
+    base.update(config.get('defaults') or {})
+
+    targets = []
+    for entry in config.get('targets') or []:
+        settings = dict(base)
+        settings.update(entry)
+        if not settings.get('queue_name') or not settings.get('service_name'):
+            raise ValueError(f"Alvo de escalonamento inválido (queue_name e service_name são obrigatórios): {entry}")
+        settings.setdefault('name', settings['service_name'])
+        unknown = set(settings) - set(TargetConfig._fields)
+        if unknown:
+            raise ValueError(f"Parâmetros desconhecidos no alvo '{settings['name']}': {', '.join(sorted(unknown))}")
+        targets.append(TargetConfig(**settings))
+
+    if not targets:
+        raise ValueError(f"Nenhum alvo de escalonamento definido em '{config_path}'.")
+    names = [target.name for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nomes de alvos duplicados em '{config_path}'.")
+
+    logging.info(f"{len(targets)} alvo(s) de escalonamento carregado(s) de '{config_path}'.")
+    return targets
+
+
+class ScalingTarget:
+    """Runtime state of one queue -> service pair: config, cooldowns and metrics window."""
+
+    def __init__(self, config):
+        self.config = config
+        self.state = ScalerState()
+        self.metrics_window = MetricsWindow(config.metrics_window_size)
+        self.collector = None
+        self.latency_sampler = None
+        # Atribuição da fila por workflow (última análise, incluída no webhook de scale up)
+        self.workflow_analyzer = None
+        self.workflow_breakdown = None
+        # Réplicas vistas no último ciclo, para detectar escalonamentos feitos por outra réplica
+        self.observed_replicas = None
+        # Pré-aquecimento: janelas cron de réplicas mínimas e perfil de demanda por minuto do dia
+        self.schedule_windows = parse_schedule(config.schedule)
+        self.seasonality = SeasonalityProfile() if config.learned_seasonality else None
+        self.prewarm_min_replicas = 0
+        self.last_reconcile_time = 0
+
+    @property
+    def base_key(self):
+        return f"{self.config.queue_prefix}:{self.config.queue_name}"
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Simulador offline das políticas de escalonamento.
+
+Executa a mesma lógica de decisão do autoscaler (scaling_policy.plan_scaling)
+contra traces de chegada de jobs, gravados ou sintéticos, e o orquestrador em
+memória (FakeOrchestrator) com latência de inicialização das tarefas. Ao final, informa tempo para esvaziar
+a fila, réplica-segundos consumidos, número de oscilações e espera p95 dos jobs.
+
+Exemplos:
+    python simulator.py --trace burst --burst-size 500 --burst-period 3600
+    python simulator.py --trace steady --rate 0.5 --config scaling-targets.yaml
+    python simulator.py --trace historico.csv --startup-latency 45
+"""
+
+import argparse
+import csv
+import logging
+import random
+from collections import deque, namedtuple
+
+from metrics_window import percentile, latency_from_durations
+from orchestrator import FakeOrchestrator
+from scaling_policy import plan_scaling
+from scaling_targets import TargetConfig, ScalingTarget, load_scaling_targets
+
+SimulationResult = namedtuple('SimulationResult', [
+    'name', 'jobs', 'completed', 'interrupted', 'p50_wait', 'p95_wait', 'max_wait',
+    'mean_time_to_drain', 'max_time_to_drain', 'replica_seconds', 'scale_actions', 'oscillations', 'peak_replicas'
+])
+
+
+def burst_trace(duration, size, period, offset=0):
+    """Cron-style load: ``size`` jobs arrive together every ``period`` seconds."""
+    return {second: size for second in range(offset, duration, period)}
+
+
+def steady_trace(duration, rate, rng):
+    """Poisson arrivals at ``rate`` jobs per second."""
+    arrivals = {}
+    second = rng.expovariate(rate) if rate > 0 else duration
+    while second < duration:
+        arrivals[int(second)] = arrivals.get(int(second), 0) + 1
+        second += rng.expovariate(rate)
+    return arrivals
+
+
+def load_trace(path):
+    """Read arrivals per second from a CSV file.
+
+    Accepts either ``seconds,arrivals`` or recorded queue samples
+    ``seconds,wait,active,completed`` (arrivals are derived from the deltas).
+    """
+    with open(path, newline='') as trace_file:
+        rows = list(csv.DictReader(trace_file))
+    if not rows:
+        return {}
+
+    start = float(rows[0]['seconds'])
+    arrivals = {}
+    if 'arrivals' in rows[0]:
+        for row in rows:
+            second = int(float(row['seconds']) - start)
+            arrivals[second] = arrivals.get(second, 0) + int(row['arrivals'])
+        return arrivals
+
+    previous = None
+    for row in rows:
+        sample = (float(row['seconds']) - start, int(row['wait']), int(row['active']), int(row['completed']))
+        if previous is not None:
+            completed_delta = max(0, sample[3] - previous[3])
+            new_jobs = max(0, (sample[1] + sample[2]) - (previous[1] + previous[2]) + completed_delta)
+            if new_jobs:
+                second = int(previous[0])
+                arrivals[second] = arrivals.get(second, 0) + new_jobs
+        previous = sample
+    return arrivals
+
+
+class SimulationClock:
+    """Simulated time in whole seconds, used as the FakeOrchestrator clock."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(target, arrivals, duration, job_seconds, rng, startup_latency=30, capacity=100,
+             poll_interval=30, initial_replicas=None, job_distribution='exp'):
+    """Drive one scaling policy against an arrival trace and collect the metrics."""
+    cfg = target.config
+    clock = SimulationClock()
+    orchestrator = FakeOrchestrator(capacity=capacity, startup_latency=startup_latency, clock=clock)
+    initial = initial_replicas if initial_replicas is not None else cfg.min_replicas
+    orchestrator.add_service(cfg.service_name, min(initial, capacity))
+    # Instante em que cada tarefa fica pronta, mantido pelo orquestrador simulado
+    tasks = orchestrator.services[cfg.service_name]
+    # Job em processamento em cada tarefa: (fim, (enfileirado_em, duração)) ou None
+    workers = [None] * len(tasks)
+    queue = deque()
+    waits = []
+    completed = 0
+    # Contador ':id' da fila: jobs criados (reenfileirados não contam)
+    enqueued = 0
+    interrupted = 0
+    replica_seconds = 0
+    peak_replicas = len(tasks)
+    actions = []
+    drain_times = []
+    backlog_since = None
+    # Durações dos últimos jobs concluídos, como a amostra do conjunto :completed
+    recent_durations = deque(maxlen=20)
+
+    def job_duration():
+        if job_distribution == 'fixed':
+            return job_seconds
+        return max(1, rng.expovariate(1 / job_seconds))
+
+    now = 0
+    while now < duration or queue or any(workers):
+        clock.now = now
+        for _ in range(arrivals.get(now, 0)):
+            queue.append((now, job_duration()))
+            enqueued += 1
+
+        for index, ready_at in enumerate(tasks):
+            if workers[index] is not None and workers[index][0] <= now:
+                recent_durations.append(workers[index][1][1])
+                workers[index] = None
+                completed += 1
+            if ready_at <= now and workers[index] is None and queue:
+                enqueued_at, seconds = queue.popleft()
+                waits.append(now - enqueued_at)
+                workers[index] = (now + seconds, (enqueued_at, seconds))
+
+        active = sum(1 for job in workers if job is not None)
+        if queue and backlog_since is None:
+            backlog_since = now
+        elif not queue and backlog_since is not None:
+            drain_times.append(now - backlog_since)
+            backlog_since = None
+
+        # Em zero réplicas, o primeiro job acorda o serviço sem esperar o próximo polling
+        woken = not tasks and queue and cfg.scale_to_zero_idle_seconds > 0
+        if now % poll_interval == 0 or woken:
+            target.metrics_window.add_sample(now, len(queue), active, completed, 0, enqueued)
+            latency = latency_from_durations(now, now - queue[0][0] if queue else 0, list(recent_durations))
+            service_state = orchestrator.service_state(cfg.service_name)
+            # Cada tarefa simulada processa um job por vez, então ativos == workers ocupados
+            decision, _ = plan_scaling(target, len(queue), active, service_state, now, latency,
+                                       read_busy_workers=lambda: active)
+            current_replicas = service_state.replicas
+            new_replicas = decision.new_replicas
+            if decision.direction == 'up':
+                new_replicas = current_replicas + orchestrator.schedulable_replicas(cfg.service_name, new_replicas - current_replicas)
+            if decision.direction and new_replicas != current_replicas:
+                orchestrator.scale(cfg.service_name, new_replicas)
+                # O Swarm remove tarefas sem considerar se estão processando jobs
+                for job in reversed(workers[new_replicas:]):
+                    if job is not None:
+                        queue.appendleft(job[1])
+                        interrupted += 1
+                del workers[new_replicas:]
+                workers.extend([None] * (new_replicas - len(workers)))
+                target.state.mark_scaled(now, 'scale_up' if decision.direction == 'up' else 'scale_down')
+                actions.append(decision.direction)
+                peak_replicas = max(peak_replicas, new_replicas)
+
+        replica_seconds += len(tasks)
+        now += 1
+        if now > duration * 10 + 86400:
+            logging.warning(f"[{cfg.name}] Simulação interrompida: a fila não esvaziou.")
+            break
+
+    oscillations = sum(1 for previous, current in zip(actions, actions[1:]) if previous != current)
+    return SimulationResult(
+        name=cfg.name, jobs=sum(arrivals.values()), completed=completed, interrupted=interrupted,
+        p50_wait=percentile(waits, 0.5), p95_wait=percentile(waits, 0.95), max_wait=max(waits, default=0),
+        mean_time_to_drain=sum(drain_times) / len(drain_times) if drain_times else 0,
+        max_time_to_drain=max(drain_times, default=0), replica_seconds=replica_seconds,
+        scale_actions=len(actions), oscillations=oscillations, peak_replicas=peak_replicas
+    )
+
+
+def print_results(results):
+    header = (f"{'política':<20} {'jobs':>7} {'interromp.':>10} {'espera p50':>10} {'espera p95':>10} "
+              f"{'drenar méd.':>11} {'drenar máx.':>11} {'réplica-s':>10} {'ações':>6} {'oscil.':>6} {'pico':>5}")
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result.name:<20} {result.jobs:>7} {result.interrupted:>10} {result.p50_wait:>9.0f}s {result.p95_wait:>9.0f}s "
+              f"{result.mean_time_to_drain:>10.0f}s {result.max_time_to_drain:>10.0f}s {result.replica_seconds:>10} "
+              f"{result.scale_actions:>6} {result.oscillations:>6} {result.peak_replicas:>5}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulador offline das políticas do autoscaler n8n.")
+    parser.add_argument('--trace', default='burst', help="'burst', 'steady' ou caminho de um CSV")
+    parser.add_argument('--duration', type=int, default=4 * 3600, help="duração do trace sintético em segundos")
+    parser.add_argument('--burst-size', type=int, default=500)
+    parser.add_argument('--burst-period', type=int, default=3600)
+    parser.add_argument('--rate', type=float, default=0.5, help="jobs/s no trace 'steady'")
+    parser.add_argument('--job-seconds', type=float, default=20, help="duração média de um job")
+    parser.add_argument('--job-distribution', choices=('exp', 'fixed'), default='exp')
+    parser.add_argument('--startup-latency', type=int, default=30, help="segundos até uma nova tarefa ficar pronta")
+    parser.add_argument('--capacity', type=int, default=100, help="máximo de réplicas que o cluster comporta")
+    parser.add_argument('--poll-interval', type=int, default=30)
+    parser.add_argument('--initial-replicas', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--config', help="YAML de alvos (cada alvo é simulado como uma política)")
+
+    policy = parser.add_argument_group('política (sem --config)')
+    policy.add_argument('--min-replicas', type=int, default=1)
+    policy.add_argument('--max-replicas', type=int, default=10)
+    policy.add_argument('--scale-up-threshold', type=int, default=20)
+    policy.add_argument('--scale-down-threshold', type=int, default=5)
+    policy.add_argument('--target-jobs-per-replica', type=int)
+    policy.add_argument('--max-scale-up-step', type=int)
+    policy.add_argument('--max-scale-down-step', type=int, default=1)
+    policy.add_argument('--scale-up-cooldown', type=int, default=300)
+    policy.add_argument('--scale-down-cooldown', type=int, default=300)
+    policy.add_argument('--stabilization', type=int, default=300)
+    policy.add_argument('--predictive', action='store_true')
+    policy.add_argument('--predictive-horizon', type=int, default=300)
+    policy.add_argument('--metrics-window-size', type=int, default=20)
+    policy.add_argument('--wait-slo', type=int, default=0, help="SLO de espera em segundos (0 usa os limites da fila)")
+    policy.add_argument('--convergence-timeout', type=int, default=300, help="0 desabilita a espera por convergência")
+    policy.add_argument('--no-drain-guard', action='store_true', help="reduz sem verificar workers ocupados")
+    policy.add_argument('--drain-timeout', type=int, default=600)
+    policy.add_argument('--scale-to-zero-idle', type=int, default=0, help="segundos ociosa até 0 réplicas (0 desabilita)")
+    policy.add_argument('--wake-replicas', type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    if args.trace == 'burst':
+        arrivals = burst_trace(args.duration, args.burst_size, args.burst_period)
+        duration = args.duration
+    elif args.trace == 'steady':
+        arrivals = steady_trace(args.duration, args.rate, rng)
+        duration = args.duration
+    else:
+        arrivals = load_trace(args.trace)
+        duration = max(arrivals, default=0) + 1
+
+    defaults = {
+        'queue_prefix': 'bull',
+        'min_replicas': args.min_replicas,
+        'max_replicas': args.max_replicas,
+        'scale_up_queue_threshold': args.scale_up_threshold,
+        'scale_down_queue_threshold': args.scale_down_threshold,
+        'target_jobs_per_replica': args.target_jobs_per_replica or args.scale_up_threshold,
+        'max_scale_up_step': args.max_scale_up_step or args.max_replicas,
+        'max_scale_down_step': args.max_scale_down_step,
+        'scale_up_cooldown_seconds': args.scale_up_cooldown,
+        'scale_down_cooldown_seconds': args.scale_down_cooldown,
+        'scale_down_stabilization_seconds': args.stabilization,
+        'predictive_scaling': args.predictive,
+        'predictive_horizon_seconds': args.predictive_horizon,
+        'metrics_window_size': args.metrics_window_size,
+        'drain_aware_scale_down': not args.no_drain_guard,
+        'scale_down_drain_timeout_seconds': args.drain_timeout,
+        'wait_slo_seconds': args.wait_slo,
+        # Cada tarefa simulada processa um job por vez
+        'worker_concurrency': 1,
+        # O trace simulado não tem horário do dia; pré-aquecimento não se aplica
+        'schedule': None,
+        'learned_seasonality': False,
+        'seasonality_lead_seconds': 0,
+        'seasonality_min_days': 1,
+        'convergence_timeout_seconds': args.convergence_timeout,
+        # Sem containers reais para ler CPU/memória
+        'target_cpu_percent': 0,
+        'target_memory_percent': 0,
+        'scale_to_zero_idle_seconds': args.scale_to_zero_idle,
+        'wake_replicas': args.wake_replicas,
+    }
+    if args.config:
+        configs = load_scaling_targets(args.config, defaults)
+    else:
+        configs = [TargetConfig(name='cli', queue_name='jobs', service_name='simulado', **defaults)]
+
+    print(f"Trace: {args.trace}, {sum(arrivals.values())} jobs em {duration}s, latência de inicialização {args.startup_latency}s, capacidade {args.capacity} réplicas")
+    results = []
+    for config in configs:
+        # Mesma semente para cada política, para comparar com as mesmas durações de jobs
+        results.append(simulate(
+            ScalingTarget(config), arrivals, duration, args.job_seconds, random.Random(args.seed),
+            startup_latency=args.startup_latency, capacity=args.capacity, poll_interval=args.poll_interval,
+            initial_replicas=args.initial_replicas, job_distribution=args.job_distribution
+        ))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
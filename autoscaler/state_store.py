@@ -0,0 +1,130 @@
+import time
+import struct
+import logging
+
+import redis
+
+# Versão do formato binário gravado no hash de estado
+STATE_FORMAT_VERSION = b'1'
+
+# Layouts (little-endian): timestamps em float64, contagens em uint32
+SCALE_TIMES_FORMAT = struct.Struct('<dd')          # último scale up, último scale down
+RECOMMENDATION_FORMAT = struct.Struct('<dI')       # instante, réplicas recomendadas
+SAMPLE_FORMAT = struct.Struct('<dIIIIqI')          # instante, wait, active, completed, delayed, contador :id (-1 se ausente), paused
+TIMESTAMP_FORMAT = struct.Struct('<d')
+
+
+def _pack_many(layout, rows):
+    return b''.join(layout.pack(*row) for row in rows)
+
+
+def _unpack_many(layout, data):
+    usable = len(data) - len(data) % layout.size
+    return [layout.unpack_from(data, offset) for offset in range(0, usable, layout.size)]
+
+
+def encode_state(target):
+    """Encode the cooldowns, stabilization window, metric ring buffer and seasonality of a target as hash fields."""
+    state = target.state
+    # Cópia sob o lock do estado: a avaliação do alvo pode estar alterando as deques em outra thread
+    with state.lock:
+        recommendations = list(state.recommendations)
+        samples = list(target.metrics_window.samples)
+        season = target.seasonality.encode() if target.seasonality is not None else None
+    fields = {
+        'v': STATE_FORMAT_VERSION,
+        'scale': SCALE_TIMES_FORMAT.pack(state.last_scale_up_time, state.last_scale_down_time),
+        'recs': _pack_many(RECOMMENDATION_FORMAT, recommendations),
+        'samples': _pack_many(SAMPLE_FORMAT, [
+            (sample.timestamp, sample.wait, sample.active, sample.completed, sample.delayed,
+             sample.enqueued if sample.enqueued is not None else -1, sample.paused)
+            for sample in samples
+        ]),
+    }
+    if state.drain_blocked_since is not None:
+        fields['drain'] = TIMESTAMP_FORMAT.pack(state.drain_blocked_since)
+    if season is not None:
+        fields['season'] = season
+    return fields
+
+
+def apply_state(target, fields):
+    """Restore a target from hash fields written by encode_state. Returns False for an unknown format."""
+    if fields.get(b'v') != STATE_FORMAT_VERSION:
+        return False
+    state = target.state
+    with state.lock:
+        if b'scale' in fields:
+            state.last_scale_up_time, state.last_scale_down_time = SCALE_TIMES_FORMAT.unpack(fields[b'scale'])
+        state.recommendations.clear()
+        state.recommendations.extend(_unpack_many(RECOMMENDATION_FORMAT, fields.get(b'recs', b'')))
+        for timestamp, wait, active, completed, delayed, enqueued, paused in _unpack_many(SAMPLE_FORMAT, fields.get(b'samples', b'')):
+            target.metrics_window.add_sample(timestamp, wait, active, completed, delayed, enqueued if enqueued >= 0 else None, paused)
+        if b'drain' in fields:
+            state.drain_blocked_since = TIMESTAMP_FORMAT.unpack(fields[b'drain'])[0]
+        if target.seasonality is not None and b'season' in fields:
+            target.seasonality.decode(fields[b'season'])
+    return True
+
+
+class ScalerStateStore:
+    """Persists scaler state in Redis so restarts keep cooldowns, history and metric windows.
+
+    Each target has a hash ``<prefix>:<name>`` with a compact binary encoding of
+    its state, refreshed after every tick and expiring after ``ttl_seconds`` without
+    updates, plus a capped stream ``<prefix>:<name>:decisions`` with the scaling
+    actions, readable by external tools (XRANGE/XREVRANGE).
+
+    ``r_conn`` must be created with ``decode_responses=False``.
+    """
+
+    def __init__(self, r_conn, key_prefix='n8n-autoscaler:state', ttl_seconds=86400, decision_log_size=1000):
+        self.r_conn = r_conn
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self.decision_log_size = decision_log_size
+
+    def state_key(self, target_name):
+        return f"{self.key_prefix}:{target_name}"
+
+    def decisions_key(self, target_name):
+        return f"{self.key_prefix}:{target_name}:decisions"
+
+    def load(self, targets):
+        """Restore every target from Redis; returns the names of the targets restored."""
+        pipe = self.r_conn.pipeline(transaction=False)
+        for target in targets:
+            pipe.hgetall(self.state_key(target.config.name))
+        restored = []
+        for target, fields in zip(targets, pipe.execute()):
+            if fields and apply_state(target, fields):
+                restored.append(target.config.name)
+        return restored
+
+    def save(self, targets):
+        """Write the state of every target in one pipelined round-trip."""
+        pipe = self.r_conn.pipeline(transaction=False)
+        for target in targets:
+            key = self.state_key(target.config.name)
+            fields = encode_state(target)
+            if 'drain' not in fields:
+                pipe.hdel(key, 'drain')
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def record_decision(self, target_name, action, old_replicas, new_replicas, queue_length, reason=None, timestamp=None):
+        """Append a scaling action to the decision log of a target."""
+        entry = {
+            'ts': f"{timestamp or time.time():.3f}",
+            'action': action,
+            'old': old_replicas,
+            'new': new_replicas,
+            'queue': queue_length,
+        }
+        if reason:
+            entry['reason'] = reason
+        try:
+            self.r_conn.xadd(self.decisions_key(target_name), entry, maxlen=self.decision_log_size, approximate=True)
+        except redis.exceptions.RedisError as e:
+            logging.warning(f"[{target_name}] Erro ao gravar decisão no log de escalonamento: {e}")
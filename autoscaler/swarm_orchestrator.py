@@ -0,0 +1,174 @@
+import time
+import logging
+from functools import partial
+
+import docker
+
+# Período padrão do Docker entre SIGTERM e SIGKILL quando a spec não define StopGracePeriod
+DEFAULT_STOP_GRACE_PERIOD_SECONDS = 10
+
+from cluster_state import ClusterStateCache
+from orchestrator import Orchestrator, ServiceState
+from task_state import classify_tasks
+from placement import count_schedulable_replicas, node_resources, task_reservations
+
+
+class SwarmOrchestrator(Orchestrator):
+    """Docker Swarm backend: one service lookup per tick, shared by reads and the scale call."""
+
+    def __init__(self, docker_client, cache_ttl_seconds=15, failed_task_window_seconds=300, api_meter=None,
+                 api_wait_timeout=None):
+        self.docker_client = docker_client
+        self.failed_task_window_seconds = failed_task_window_seconds
+        # api_wait_timeout: espera máxima por uma leitura do cluster já em andamento em outra thread
+        self.cluster_cache = ClusterStateCache(docker_client, cache_ttl_seconds, api_wait_timeout)
+        self.events_enabled = False
+        self.stats_sampler = None
+        self.api_meter = api_meter
+        if api_meter is not None:
+            api_meter.attach(docker_client.api)
+
+    def start_event_listener(self):
+        self.cluster_cache.start_event_listener()
+        self.events_enabled = True
+
+    def enable_worker_stats(self, stats_sampler):
+        """Sample container stats of the worker tasks with a WorkerStatsSampler."""
+        self.stats_sampler = stats_sampler
+
+    def begin_tick(self):
+        self.cluster_cache.begin_tick()
+        # Sem a API de eventos, cada ciclo relê a lista de serviços exatamente uma vez
+        if not self.events_enabled:
+            self.cluster_cache.invalidate_service()
+
+    def prefetch_calls(self, service_names):
+        # Uma chamada por tipo de recurso: todos os serviços vêm da mesma listagem filtrada
+        return [
+            ('nós', self.cluster_cache.nodes),
+            ('tarefas', self.cluster_cache.tasks_by_node),
+            ('serviços', partial(self.cluster_cache.services, list(service_names))),
+        ]
+
+    def service_state(self, service_name):
+        try:
+            spec = self.cluster_cache.service_spec(service_name)
+            # Histórico completo da mesma consulta em lote: fases das tarefas e falhas recentes
+            task_states = classify_tasks(
+                self.cluster_cache.task_history_for_service(spec.id), time.time(), self.failed_task_window_seconds
+            )
+            update_state = (spec.attrs.get('UpdateStatus') or {}).get('State')
+            return ServiceState(service_name, spec.id, spec.replicas, task_states.running, task_states, update_state)
+        except docker.errors.NotFound:
+            logging.error(f"Serviço '{service_name}' não encontrado no Docker Swarm.")
+        except KeyError as e:
+            logging.error(f"Erro ao acessar configuração de réplicas do serviço '{service_name}': {e}")
+        except Exception as e:
+            logging.error(f"Erro inesperado ao obter estado do serviço '{service_name}': {e}")
+        return None
+
+    def schedulable_replicas(self, service_name, additional_replicas):
+        try:
+            spec = self.cluster_cache.service_spec(service_name)
+            return count_schedulable_replicas(
+                self.cluster_cache.nodes(), self.cluster_cache.tasks_by_node(), spec.id, spec.placement, additional_replicas
+            )
+        except Exception as e:
+            logging.error(f"Erro ao verificar recursos para escalonamento: {e}")
+            # Em caso de erro, permitir escalonamento para não bloquear o sistema
+            return additional_replicas
+
+    def _update_replicas(self, service_name, replicas):
+        # Spec e versão relidas imediatamente antes da atualização: a spec em cache pode estar
+        # desatualizada e o update com fetch_current_spec preserva redes e demais campos do serviço
+        service = self.docker_client.services.get(service_name)
+        service.update(mode={'Replicated': {'Replicas': replicas}})
+
+    def scale(self, service_name, replicas):
+        try:
+            try:
+                self._update_replicas(service_name, replicas)
+            except docker.errors.APIError as e:
+                if 'out of sequence' not in str(e):
+                    raise
+                # Serviço alterado por outro cliente entre a leitura e a atualização; tentar novamente
+                logging.info(f"Serviço '{service_name}' alterado durante o escalonamento. Relendo spec.")
+                self._update_replicas(service_name, replicas)
+
+            # Nova versão do serviço e novas tarefas são lidas no próximo ciclo
+            self.cluster_cache.invalidate_service(service_name)
+            logging.info(f"Serviço '{service_name}' escalado para {replicas} réplicas com sucesso.")
+            return True
+
+        except docker.errors.NotFound:
+            logging.error(f"Serviço '{service_name}' não encontrado no Docker Swarm.")
+        except docker.errors.APIError as e:
+            logging.error(f"Erro da API Docker ao escalar serviço '{service_name}' para {replicas} réplicas: {e}")
+        except Exception as e:
+            logging.error(f"Erro inesperado ao escalar serviço '{service_name}' para {replicas} réplicas: {e}")
+        return False
+
+    def worker_utilization(self, service_name):
+        if self.stats_sampler is None:
+            return None
+        try:
+            spec = self.cluster_cache.service_spec(service_name)
+            return self.stats_sampler.sample(
+                spec.id, self.cluster_cache.tasks_for_service(spec.id), self.cluster_cache.nodes(), spec.cpu_limit_cores
+            )
+        except Exception as e:
+            logging.error(f"Erro ao coletar utilização dos workers do serviço '{service_name}': {e}")
+            return None
+
+    def stop_grace_period(self, service_name):
+        try:
+            grace_period = self.cluster_cache.service_spec(service_name).stop_grace_period_seconds
+        except Exception as e:
+            logging.error(f"Erro ao ler stop_grace_period do serviço '{service_name}': {e}")
+            return None
+        if grace_period is None:
+            return DEFAULT_STOP_GRACE_PERIOD_SECONDS
+        return grace_period
+
+    def api_usage(self):
+        if self.api_meter is None:
+            return None
+        return self.api_meter.end_tick()
+
+    def cluster_resources(self):
+        try:
+            nodes = self.cluster_cache.nodes()
+            tasks_by_node = self.cluster_cache.tasks_by_node()
+            total_cpu_nano = 0
+            total_memory_bytes = 0
+            available_cpu_nano = 0
+            available_memory_bytes = 0
+
+            for node in nodes:
+                # Verificar se o nó está ativo e disponível
+                if node['Status']['State'] == 'ready' and node['Spec']['Availability'] == 'active':
+                    node_cpu_nano, node_memory_bytes = node_resources(node)
+                    total_cpu_nano += node_cpu_nano
+                    total_memory_bytes += node_memory_bytes
+
+                    # Recursos reservados pelas tarefas em execução no nó
+                    reserved_cpu_nano = 0
+                    reserved_memory_bytes = 0
+                    for task in tasks_by_node.get(node['ID'], []):
+                        task_cpu_nano, task_memory_bytes = task_reservations(task)
+                        reserved_cpu_nano += task_cpu_nano
+                        reserved_memory_bytes += task_memory_bytes
+
+                    available_cpu_nano += max(0, node_cpu_nano - reserved_cpu_nano)
+                    available_memory_bytes += max(0, node_memory_bytes - reserved_memory_bytes)
+
+            return {
+                'total_cpu_cores': total_cpu_nano / 1_000_000_000,  # Converter para cores
+                'total_memory_gb': total_memory_bytes / (1024**3),  # Converter para GB
+                'available_cpu_cores': available_cpu_nano / 1_000_000_000,
+                'available_memory_gb': available_memory_bytes / (1024**3)
+            }
+
+        except Exception as e:
+            logging.error(f"Erro ao obter recursos do Docker Swarm: {e}")
+            return None
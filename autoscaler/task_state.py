@@ -0,0 +1,81 @@
+import re
+import calendar
+import time
+from collections import namedtuple
+
+# Estados de tarefa do Swarm agrupados nas fases que importam para a capacidade do serviço
+TASK_STATE_GROUPS = {
+    'new': 'pending', 'allocated': 'pending', 'pending': 'pending',
+    'assigned': 'assigned', 'accepted': 'assigned',
+    'preparing': 'preparing',
+    'ready': 'starting', 'starting': 'starting',
+    'running': 'running',
+    'failed': 'failed', 'rejected': 'failed', 'orphaned': 'failed',
+}
+
+# Contagem de tarefas por fase, há quanto tempo a tarefa mais antiga ainda não está em execução
+# e quando a primeira tarefa em execução entrou nesse estado (epoch)
+TaskStates = namedtuple('TaskStates', [
+    'pending', 'assigned', 'preparing', 'starting', 'running', 'failed', 'oldest_unready_seconds', 'running_since'
+], defaults=(None,))
+
+# UpdateStatus.State em que o Swarm ainda está substituindo tarefas
+UPDATE_IN_PROGRESS_STATES = ('updating', 'rollback_started')
+
+_DOCKER_TIMESTAMP = re.compile(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?')
+
+
+def parse_docker_timestamp(value):
+    """Seconds since the epoch of a Docker API timestamp (RFC 3339 in UTC, nanosecond precision)."""
+    match = _DOCKER_TIMESTAMP.match(value or '')
+    if not match:
+        return None
+    seconds = calendar.timegm(time.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S'))
+    fraction = match.group(2)
+    return seconds + (int(fraction[:6].ljust(6, '0')) / 1_000_000 if fraction else 0)
+
+
+def classify_tasks(tasks, now, failed_window_seconds=300):
+    """Group the tasks of one service by phase.
+
+    Tasks whose desired state is 'running' are counted by their current state;
+    failed tasks (desired state 'shutdown') only count when they failed within
+    ``failed_window_seconds``.
+    """
+    counts = dict.fromkeys(('pending', 'assigned', 'preparing', 'starting', 'running', 'failed'), 0)
+    oldest_unready = None
+    running_since = None
+    for task in tasks:
+        group = TASK_STATE_GROUPS.get(task.get('Status', {}).get('State'))
+        if group is None:
+            continue
+        if group == 'failed':
+            failed_at = parse_docker_timestamp(task.get('Status', {}).get('Timestamp'))
+            if failed_at is not None and now - failed_at <= failed_window_seconds:
+                counts['failed'] += 1
+            continue
+        if task.get('DesiredState') != 'running':
+            continue
+        counts[group] += 1
+        if group == 'running':
+            started_at = parse_docker_timestamp(task.get('Status', {}).get('Timestamp'))
+            if started_at is not None:
+                running_since = min(running_since or started_at, started_at)
+        else:
+            created_at = parse_docker_timestamp(task.get('CreatedAt'))
+            if created_at is not None:
+                oldest_unready = max(oldest_unready or 0, now - created_at)
+    return TaskStates(oldest_unready_seconds=oldest_unready, running_since=running_since, **counts)
+
+
+def unready_tasks(task_states):
+    """Tasks that should be running but are still pending, assigned, preparing or starting."""
+    return task_states.pending + task_states.assigned + task_states.preparing + task_states.starting
+
+
+def format_task_states(task_states):
+    text = (f"em execução {task_states.running}, iniciando {task_states.starting}, preparando {task_states.preparing}, "
+            f"atribuídas {task_states.assigned}, pendentes {task_states.pending}, falhas recentes {task_states.failed}")
+    if task_states.oldest_unready_seconds is not None:
+        text += f", atraso de convergência {task_states.oldest_unready_seconds:.0f}s"
+    return text
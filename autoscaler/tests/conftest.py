@@ -0,0 +1,9 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+
+AUTOSCALER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, AUTOSCALER_DIR)
+# autoscaler_swarm lê a configuração do ambiente ao ser importado
+load_dotenv(os.path.join(AUTOSCALER_DIR, '.env.example'))
@@ -0,0 +1,43 @@
+import time
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from cluster_state import CachedValue
+
+
+def test_cached_value_fetches_once_and_never_blocks_readers_past_the_timeout():
+    release = threading.Event()
+    fetches = []
+
+    def fetch():
+        fetches.append(time.monotonic())
+        release.wait(5)
+        return len(fetches)
+
+    cached = CachedValue(fetch, ttl_seconds=15, wait_timeout=0.1)
+    owner = threading.Thread(target=cached.get, args=(1,))
+    owner.start()
+    while not fetches:
+        time.sleep(0.01)
+
+    # Sem valor anterior: espera limitada pela busca em andamento, sem uma segunda busca
+    with pytest.raises(TimeoutError):
+        cached.get(1)
+    release.set()
+    owner.join()
+    assert cached.get(1) == 1
+
+    # Com valor anterior: leitores recebem o valor em cache enquanto outra thread atualiza
+    release.clear()
+    cached.invalidate()
+    owner = threading.Thread(target=cached.get, args=(2,))
+    owner.start()
+    while len(fetches) < 2:
+        time.sleep(0.01)
+    assert cached.get(2) == 1
+    release.set()
+    owner.join()
+    assert cached.get(2) == 2
+    assert len(fetches) == 2
@@ -0,0 +1,138 @@
+import os
+import time
+import signal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+import autoscaler_swarm
+from leader_election import LeaderElector
+from orchestrator import FakeOrchestrator
+from queue_events import QueueEventWatcher
+from queue_state import QueueStateCollector
+from scaling_targets import TargetConfig, ScalingTarget
+
+SERVICE = 'n8n-worker'
+
+
+def make_target(r_conn, **overrides):
+    settings = dict(autoscaler_swarm.get_default_target_settings(), **overrides)
+    target = ScalingTarget(TargetConfig(name=SERVICE, queue_name='jobs', service_name=SERVICE, **settings))
+    target.collector = QueueStateCollector(r_conn, target.config.queue_prefix, target.config.queue_name)
+    return target
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def r_conn(server):
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def test_evaluate_target_scales_up_proportionally(r_conn):
+    r_conn.rpush('bull:jobs:wait', *range(60))
+    target = make_target(r_conn, target_jobs_per_replica=20, max_replicas=10)
+    orchestrator = FakeOrchestrator({SERVICE: 1})
+
+    assert autoscaler_swarm.evaluate_target(orchestrator, target, target.collector.snapshot(), time.time())
+    assert orchestrator.service_state(SERVICE).replicas == 3
+
+
+def test_evaluate_target_respects_cluster_capacity(r_conn):
+    r_conn.rpush('bull:jobs:wait', *range(200))
+    target = make_target(r_conn, target_jobs_per_replica=20, max_replicas=10)
+    orchestrator = FakeOrchestrator({SERVICE: 1}, capacity=4)
+
+    assert autoscaler_swarm.evaluate_target(orchestrator, target, target.collector.snapshot(), time.time())
+    assert orchestrator.service_state(SERVICE).replicas == 4
+
+
+def test_evaluate_target_holds_scale_down_while_workers_are_busy(r_conn):
+    r_conn.rpush('bull:jobs:active', 'a', 'b')
+    r_conn.set('bull:jobs:a:lock', 'worker-1:1')
+    r_conn.set('bull:jobs:b:lock', 'worker-2:1')
+    target = make_target(r_conn, min_replicas=1, scale_down_stabilization_seconds=0, scale_down_cooldown_seconds=0)
+    orchestrator = FakeOrchestrator({SERVICE: 2})
+
+    assert not autoscaler_swarm.evaluate_target(orchestrator, target, target.collector.snapshot(), time.time())
+    assert orchestrator.scale_calls == []
+
+
+def test_run_tick_reads_queues_and_scales_every_target(server, r_conn):
+    r_conn.rpush('bull:jobs:wait', *range(45))
+    target = make_target(r_conn, target_jobs_per_replica=20, max_replicas=10)
+    orchestrator = FakeOrchestrator({SERVICE: 1})
+
+    async def tick():
+        r_async = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        with ThreadPoolExecutor(2) as executor, ThreadPoolExecutor(2) as docker_executor:
+            await autoscaler_swarm.run_tick(r_async, orchestrator, [target], None, set(), executor, docker_executor, {})
+
+    asyncio.run(tick())
+    assert [replicas for _, _, replicas in orchestrator.scale_calls] == [3]
+    assert target.metrics_window.samples[-1].wait == 45
+
+
+def test_slo_mode_without_worker_rate_uses_proportional_policy(r_conn):
+    now = time.time()
+    for job_id in range(100):
+        r_conn.rpush('bull:jobs:wait', job_id)
+        r_conn.hset(f'bull:jobs:{job_id}', 'timestamp', int((now - 120) * 1000))
+    target = make_target(r_conn, wait_slo_seconds=60, target_jobs_per_replica=20, max_replicas=10)
+    target.latency_sampler = autoscaler_swarm.JobLatencySampler(r_conn, target.base_key, target.collector.wait_key)
+    orchestrator = FakeOrchestrator({SERVICE: 1})
+
+    assert autoscaler_swarm.evaluate_target(orchestrator, target, target.collector.snapshot(), now)
+    assert orchestrator.service_state(SERVICE).replicas == 5
+
+
+def test_job_enqueued_during_tick_wakes_parked_service(server, r_conn, monkeypatch):
+    watcher = QueueEventWatcher(r_conn, min_interval_seconds=0, wake_only=True)
+    watcher.add_queue('bull:jobs')
+    monkeypatch.setattr(autoscaler_swarm, 'wake_listener', watcher)
+    target = make_target(r_conn, min_replicas=0, scale_to_zero_idle_seconds=60)
+
+    class EnqueueDuringTick(FakeOrchestrator):
+        def service_state(self, service_name):
+            # O job chega depois da leitura da fila, enquanto o ciclo ainda está em andamento
+            r_conn.rpush('bull:jobs:wait', 'job-1')
+            r_conn.xadd('bull:jobs:events', {'event': 'waiting', 'jobId': 'job-1'})
+            return super().service_state(service_name)
+
+    orchestrator = EnqueueDuringTick({SERVICE: 0})
+
+    async def tick():
+        r_async = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        with ThreadPoolExecutor(2) as executor, ThreadPoolExecutor(2) as docker_executor:
+            await autoscaler_swarm.run_tick(r_async, orchestrator, [target], watcher, set(), executor, docker_executor, {})
+
+    asyncio.run(tick())
+    assert orchestrator.scale_calls == []
+    assert 'bull:jobs' in watcher.armed
+    assert watcher.wait_for_trigger(1) == {'bull:jobs'}
+
+
+def test_sigterm_stops_the_loop_and_releases_the_lease(server, r_conn, monkeypatch):
+    target = make_target(r_conn)
+    orchestrator = FakeOrchestrator({SERVICE: 1})
+    elector = LeaderElector(fakeredis.FakeRedis(server=server), 'autoscaler:leader')
+    elector._set_leader(elector._try_acquire_or_renew())
+    monkeypatch.setattr(autoscaler_swarm, 'leader_elector', elector)
+    monkeypatch.setattr(autoscaler_swarm, 'get_async_redis_connection',
+                        lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.2, os.kill, os.getpid(), signal.SIGTERM)
+        with ThreadPoolExecutor(2) as executor, ThreadPoolExecutor(2) as docker_executor:
+            await asyncio.wait_for(
+                autoscaler_swarm.control_loop(r_conn, orchestrator, [target], None, executor, docker_executor), 5
+            )
+
+    asyncio.run(run())
+    assert r_conn.get('autoscaler:leader') is None
@@ -0,0 +1,20 @@
+import fakeredis
+
+from job_latency import JobLatencySampler
+
+
+def test_processing_time_estimated_from_active_jobs_without_completed_set():
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    sampler = JobLatencySampler(r_conn, 'bull:jobs', 'bull:jobs:wait')
+    r_conn.rpush('bull:jobs:active', '1', '2')
+    r_conn.hset('bull:jobs:1', 'processedOn', 1000 * 1000)
+    r_conn.hset('bull:jobs:2', 'processedOn', 1010 * 1000)
+
+    assert sampler.sample(now=1020).processing_samples == 0
+
+    # Job 1 saiu da lista de ativos (removeOnComplete) entre as amostras de 1020s e 1040s
+    r_conn.lrem('bull:jobs:active', 0, '1')
+    r_conn.delete('bull:jobs:1')
+    latency = sampler.sample(now=1040)
+    assert latency.processing_samples == 1
+    assert latency.processing_mean == 30
@@ -0,0 +1,75 @@
+import time
+
+import fakeredis
+import pytest
+
+from leader_election import LeaderElector
+
+KEY = 'autoscaler:leader'
+
+
+@pytest.fixture
+def r_conn():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def step(elector):
+    """One iteration of the election thread, run synchronously."""
+    elector._set_leader(elector._try_acquire_or_renew())
+
+
+def test_only_one_replica_acquires_the_lease(r_conn):
+    changes = []
+    first = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a', on_change=changes.append)
+    second = LeaderElector(r_conn, KEY, lease_seconds=15, identity='b')
+    step(first)
+    step(second)
+
+    assert first.is_leader and not second.is_leader
+    assert r_conn.get(KEY) == 'a'
+    assert changes == [True]
+
+
+def test_renewal_extends_the_lease(r_conn):
+    elector = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a')
+    step(elector)
+    r_conn.pexpire(KEY, 1000)
+    step(elector)
+
+    assert elector.is_leader
+    assert r_conn.pttl(KEY) > 10_000
+
+
+def test_lease_taken_by_another_replica_is_lost(r_conn):
+    changes = []
+    elector = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a', on_change=changes.append)
+    step(elector)
+    # Lease expirou e outra réplica assumiu
+    r_conn.set(KEY, 'b')
+    step(elector)
+
+    assert not elector.is_leader
+    assert r_conn.get(KEY) == 'b'
+    assert changes == [True, False]
+
+
+def test_leadership_is_not_trusted_past_the_lease(r_conn):
+    elector = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a')
+    step(elector)
+    # Sem renovação bem-sucedida desde então (ex.: Redis inacessível)
+    elector._valid_until = time.monotonic() - 1
+
+    assert not elector.is_leader
+
+
+def test_release_only_deletes_an_owned_lease(r_conn):
+    elector = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a')
+    step(elector)
+    elector.stop()
+    assert r_conn.get(KEY) is None
+
+    stale = LeaderElector(r_conn, KEY, lease_seconds=15, identity='a')
+    step(stale)
+    r_conn.set(KEY, 'b')
+    stale.stop()
+    assert r_conn.get(KEY) == 'b'
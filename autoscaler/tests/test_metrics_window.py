@@ -0,0 +1,54 @@
+from metrics_window import MetricsWindow
+
+
+def test_pausing_a_queue_is_not_counted_as_completions():
+    window = MetricsWindow(10)
+    window.add_sample(0, wait=100, active=0, completed=0, enqueued=100)
+    # Ao pausar, a lista de espera é movida para a lista de pausa; nenhum job chegou ou terminou
+    window.add_sample(10, wait=0, active=0, completed=0, enqueued=100, paused=100)
+
+    assert window.arrival_rate() == 0
+    assert window.throughput() == 0
+
+
+def test_rates_from_the_id_counter_without_completed_set():
+    window = MetricsWindow(10)
+    # removeOnComplete: :completed fica vazio; 20 jobs chegam e o backlog cresce 5 em 10s
+    window.add_sample(0, wait=10, active=2, completed=0, enqueued=100)
+    window.add_sample(10, wait=15, active=2, completed=0, enqueued=120)
+
+    assert window.arrival_rate() == 2.0
+    assert window.throughput() == 1.5
+
+
+def test_counter_reset_interval_is_skipped():
+    window = MetricsWindow(10)
+    window.add_sample(0, wait=0, active=0, completed=0, enqueued=500)
+    window.add_sample(10, wait=0, active=0, completed=0, enqueued=510)
+    # Fila recriada: o contador :id volta a zero; o intervalo não entra nas taxas
+    window.add_sample(20, wait=5, active=0, completed=0, enqueued=5)
+    window.add_sample(30, wait=5, active=0, completed=0, enqueued=15)
+
+    assert window.arrival_rate() == 1.0
+    assert window.throughput() == 1.0
+
+
+def test_trimmed_completed_set_without_counter_is_skipped():
+    window = MetricsWindow(10)
+    window.add_sample(0, wait=10, active=0, completed=100)
+    window.add_sample(10, wait=5, active=0, completed=110)
+    # :completed aparado (removeOnComplete com limite): contagem caiu
+    window.add_sample(20, wait=5, active=0, completed=50)
+
+    assert window.throughput() == 1.0
+    assert window.arrival_rate() == 0.5
+
+
+def test_time_to_drain_uses_the_net_drain_rate():
+    window = MetricsWindow(10)
+    window.add_sample(0, wait=40, active=0, completed=0, enqueued=0)
+    window.add_sample(10, wait=20, active=0, completed=0, enqueued=10)
+
+    # 1 chegada/s e 3 conclusões/s: 20 jobs restantes esvaziam em 10s
+    assert window.time_to_drain() == 10.0
+    assert MetricsWindow(10).time_to_drain() is None
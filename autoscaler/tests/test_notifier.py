@@ -0,0 +1,82 @@
+import json
+import threading
+
+from notifier import WebhookDispatcher
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ''
+
+
+class RecordingSession:
+    """Stands in for requests.Session: records POSTed payloads and answers with queued statuses."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.payloads = []
+        self.headers = {}
+
+    def post(self, url, data, timeout):
+        self.payloads.append(json.loads(data))
+        return FakeResponse(self.statuses.pop(0) if self.statuses else 200)
+
+
+def make_dispatcher(session, **kwargs):
+    deliveries = []
+    done = threading.Event()
+
+    def on_delivery(seconds, delivered):
+        deliveries.append(delivered)
+        done.set()
+
+    dispatcher = WebhookDispatcher('http://hook', on_delivery=on_delivery, backoff_base_seconds=0, **kwargs)
+    dispatcher.session = session
+    return dispatcher, deliveries, done
+
+
+def test_events_within_the_window_are_batched():
+    session = RecordingSession()
+    dispatcher, deliveries, done = make_dispatcher(session, batch_window_seconds=0.2)
+    for replicas in (2, 3, 4):
+        dispatcher.notify({'action': 'scale_up', 'old_replicas': replicas - 1, 'new_replicas': replicas})
+    dispatcher.start()
+
+    assert done.wait(2)
+    assert deliveries == [True]
+    assert len(session.payloads) == 1
+    assert session.payloads[0]['action'] == 'batch'
+    assert [event['new_replicas'] for event in session.payloads[0]['events']] == [2, 3, 4]
+
+
+def test_server_errors_are_retried_and_client_errors_are_not():
+    session = RecordingSession([500, 503, 200])
+    dispatcher, deliveries, done = make_dispatcher(session, batch_window_seconds=0, max_retries=5)
+    dispatcher.start()
+    dispatcher.notify({'action': 'scale_up'})
+    assert done.wait(2)
+    assert deliveries == [True]
+    assert len(session.payloads) == 3
+
+    session = RecordingSession([400])
+    dispatcher, deliveries, done = make_dispatcher(session, batch_window_seconds=0, max_retries=5)
+    dispatcher.start()
+    dispatcher.notify({'action': 'scale_down'})
+    assert done.wait(2)
+    assert deliveries == [False]
+    assert len(session.payloads) == 1
+
+
+def test_undelivered_events_survive_a_restart_through_the_spool(tmp_path):
+    spool_path = str(tmp_path / 'webhooks.json')
+    dispatcher, _, _ = make_dispatcher(RecordingSession(), spool_path=spool_path)
+    dispatcher.notify({'action': 'scale_up', 'new_replicas': 3})
+    dispatcher._write_spool()
+
+    session = RecordingSession()
+    restarted, deliveries, done = make_dispatcher(session, spool_path=spool_path, batch_window_seconds=0)
+    restarted.start()
+
+    assert done.wait(2)
+    assert session.payloads == [{'action': 'scale_up', 'new_replicas': 3}]
@@ -0,0 +1,50 @@
+import pytest
+
+from placement import ServicePlacement, count_schedulable_replicas, parse_constraint
+
+GB = 1024 ** 3
+CPU = 1_000_000_000
+
+
+def make_node(node_id, role='worker', cpus=4, memory_gb=8, state='ready', availability='active', labels=None):
+    return {
+        'ID': node_id,
+        'Status': {'State': state},
+        'Spec': {'Role': role, 'Availability': availability, 'Labels': labels or {}},
+        'Description': {'Hostname': node_id, 'Resources': {'NanoCPUs': cpus * CPU, 'MemoryBytes': memory_gb * GB}},
+    }
+
+
+def make_task(service_id, cpus=0, memory_gb=0):
+    return {'ServiceID': service_id, 'Spec': {'Resources': {'Reservations': {'NanoCPUs': cpus * CPU, 'MemoryBytes': memory_gb * GB}}}}
+
+
+def test_parse_constraint():
+    assert parse_constraint('node.role == manager') == ('node.role', '==', 'manager')
+    assert parse_constraint('node.labels.tier!=db') == ('node.labels.tier', '!=', 'db')
+    with pytest.raises(ValueError):
+        parse_constraint('node.role=manager')
+
+
+def test_reservations_limit_replicas_per_node():
+    nodes = [make_node('a'), make_node('b')]
+    tasks_by_node = {'a': [make_task('other', cpus=3)]}
+    placement = ServicePlacement((), 0, CPU, GB)
+
+    # Nó a: 1 CPU livre -> 1 réplica; nó b: 4 CPUs -> 4 réplicas
+    assert count_schedulable_replicas(nodes, tasks_by_node, 'svc', placement, 10) == 5
+    assert count_schedulable_replicas(nodes, tasks_by_node, 'svc', placement, 3) == 3
+
+
+def test_constraints_availability_and_max_per_node():
+    nodes = [
+        make_node('manager', role='manager'),
+        make_node('drained', availability='drain'),
+        make_node('down', state='down'),
+        make_node('worker'),
+    ]
+    tasks_by_node = {'worker': [make_task('svc')]}
+    placement = ServicePlacement((parse_constraint('node.role==worker'),), 2, 0, 0)
+
+    # Apenas 'worker' é elegível e já executa 1 das 2 réplicas permitidas por nó
+    assert count_schedulable_replicas(nodes, tasks_by_node, 'svc', placement, 5) == 1
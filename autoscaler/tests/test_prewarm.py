@@ -0,0 +1,32 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from prewarm import CronExpression, SeasonalityProfile, parse_schedule, prewarm_min_replicas
+
+
+def test_cron_accepts_month_and_weekday_names():
+    named = CronExpression('0 8 * jan-mar MON-FRI')
+    numeric = CronExpression('0 8 * 1-3 1-5')
+
+    assert named.months == numeric.months
+    assert named.weekdays == numeric.weekdays
+
+
+def test_invalid_schedule_names_the_setting():
+    with pytest.raises(ValueError, match='SCHEDULE_WINDOWS'):
+        parse_schedule('0 8 * * MONDAY 600 6')
+
+
+def test_learned_floor_uses_worker_concurrency():
+    now = time.time()
+    seasonality = SeasonalityProfile()
+    seasonality.observe(now, 25)
+    config = SimpleNamespace(
+        worker_concurrency=10, target_jobs_per_replica=20, max_replicas=10,
+        seasonality_lead_seconds=0, seasonality_min_days=1,
+    )
+    target = SimpleNamespace(config=config, schedule_windows=[], seasonality=seasonality)
+
+    assert prewarm_min_replicas(target, now) == 3
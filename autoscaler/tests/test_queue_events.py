@@ -0,0 +1,28 @@
+import fakeredis
+
+from queue_events import QueueEventWatcher
+
+QUEUE = 'bull:jobs'
+
+
+def test_events_published_between_reads_are_not_lost():
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    r_conn.xadd(f'{QUEUE}:events', {'event': 'waiting', 'jobId': 'old'})
+    watcher = QueueEventWatcher(r_conn, min_interval_seconds=0)
+    watcher.add_queue(QUEUE)
+
+    # Publicado antes de qualquer XREAD: com '$' este evento seria descartado
+    r_conn.xadd(f'{QUEUE}:events', {'event': 'waiting', 'jobId': '1'})
+
+    assert watcher.wait_for_trigger(0.5) == {QUEUE}
+    assert watcher.wait_for_trigger(0.1) == set()
+
+
+def test_missing_stream_is_read_from_the_start():
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    watcher = QueueEventWatcher(r_conn, min_interval_seconds=0)
+    watcher.add_queue(QUEUE)
+
+    r_conn.xadd(f'{QUEUE}:events', {'event': 'added', 'jobId': '1'})
+
+    assert watcher.wait_for_trigger(0.5) == {QUEUE}
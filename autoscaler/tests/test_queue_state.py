@@ -0,0 +1,21 @@
+import fakeredis
+
+from queue_state import count_busy_workers
+
+
+def test_busy_workers_counts_distinct_lock_owners():
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    r_conn.rpush('bull:jobs:active', 'a', 'b', 'c')
+    r_conn.set('bull:jobs:a:lock', 'worker-1:1')
+    r_conn.set('bull:jobs:b:lock', 'worker-1:2')
+    r_conn.set('bull:jobs:c:lock', 'worker-2:1')
+
+    assert count_busy_workers(r_conn, 'bull:jobs', worker_concurrency=10) == 2
+
+
+def test_busy_workers_without_locks_packs_jobs_by_concurrency():
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    r_conn.rpush('bull:jobs:active', *range(12))
+
+    assert count_busy_workers(r_conn, 'bull:jobs', worker_concurrency=5) == 3
+    assert count_busy_workers(r_conn, 'bull:jobs') == 12
@@ -0,0 +1,67 @@
+from scaling_policy import ScalerState, calculate_desired_replicas
+
+
+def desired(queue_length, current_replicas, min_replicas=1, max_replicas=10, max_scale_up_step=5, max_scale_down_step=2):
+    return calculate_desired_replicas(
+        queue_length, current_replicas, min_replicas, max_replicas,
+        scale_up_threshold=20, scale_down_threshold=5, target_jobs_per_replica=20,
+        max_scale_up_step=max_scale_up_step, max_scale_down_step=max_scale_down_step,
+    )
+
+
+def test_scale_up_is_proportional_to_the_backlog():
+    assert desired(100, 1) == 5
+
+
+def test_scale_up_adds_at_least_one_replica_and_respects_the_step():
+    assert desired(21, 2) == 3
+    assert desired(1000, 1, max_scale_up_step=3) == 4
+
+
+def test_scale_up_is_capped_at_max_replicas():
+    assert desired(1000, 8) == 10
+
+
+def test_scale_down_is_limited_by_step_and_min_replicas():
+    assert desired(0, 6) == 4
+    assert desired(0, 2, min_replicas=1) == 1
+
+
+def test_backlog_between_thresholds_keeps_the_replicas():
+    assert desired(10, 3) == 3
+
+
+def test_stabilized_scale_down_holds_until_the_window_is_covered_then_steps_down():
+    state = ScalerState()
+    for now, recommendation in ((0, 6), (30, 3), (60, 2)):
+        state.record_recommendation(now, recommendation, window_seconds=60)
+    # A janela de 60s ainda contém a recomendação de 6 réplicas: manter
+    assert state.stabilized_scale_down(59, current_replicas=6, window_seconds=60) == 6
+    assert state.stabilized_scale_down(60, current_replicas=6, window_seconds=60) == 6
+
+    state.record_recommendation(90, 2, window_seconds=60)
+    # A recomendação de 6 saiu da janela; a maior restante é 3
+    assert state.stabilized_scale_down(90, current_replicas=6, window_seconds=60) == 3
+
+    state.record_recommendation(150, 2, window_seconds=60)
+    assert state.stabilized_scale_down(150, current_replicas=3, window_seconds=60) == 2
+
+
+def test_stabilized_scale_down_waits_for_a_full_window_after_start():
+    state = ScalerState()
+    state.record_recommendation(100, 1, window_seconds=300)
+
+    assert state.stabilized_scale_down(100, current_replicas=4, window_seconds=300) == 4
+    assert state.stabilized_scale_down(100, current_replicas=4, window_seconds=0) == 1
+
+
+def test_scale_down_cooldown_counts_from_any_scaling_event():
+    state = ScalerState()
+    state.mark_scaled(100, 'scale_down')
+
+    assert state.scale_up_cooldown_remaining(130, 60) == 0
+    assert state.scale_down_cooldown_remaining(130, 60) == 30
+
+    state.mark_scaled(150, 'scale_up')
+    assert state.scale_up_cooldown_remaining(170, 60) == 40
+    assert state.scale_down_cooldown_remaining(170, 120) == 100
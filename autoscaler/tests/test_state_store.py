@@ -0,0 +1,73 @@
+import fakeredis
+
+import autoscaler_swarm
+from scaling_targets import TargetConfig, ScalingTarget
+from state_store import ScalerStateStore, apply_state, encode_state
+
+
+def make_target(name='n8n-worker', **overrides):
+    settings = dict(autoscaler_swarm.get_default_target_settings(), **overrides)
+    return ScalingTarget(TargetConfig(name=name, queue_name='jobs', service_name=name, **settings))
+
+
+def populated_target():
+    target = make_target(learned_seasonality=True)
+    state = target.state
+    state.mark_scaled(1000.0, 'scale_up')
+    state.mark_scaled(1100.0, 'scale_down')
+    state.record_recommendation(1200.0, 4, 300)
+    state.record_recommendation(1230.0, 3, 300)
+    state.drain_blocked_since = 1250.0
+    target.metrics_window.add_sample(1200.0, 10, 2, 5, 1, 100)
+    target.metrics_window.add_sample(1230.0, 8, 3, 7, 0, None, paused=4)
+    target.seasonality.observe(1200.0, 12)
+    return target
+
+
+def as_stored(fields):
+    # O hash volta do Redis com chaves e valores em bytes
+    return {key.encode(): value for key, value in fields.items()}
+
+
+def test_encode_and_apply_round_trip():
+    source = populated_target()
+    restored = make_target(learned_seasonality=True)
+
+    assert apply_state(restored, as_stored(encode_state(source)))
+    assert (restored.state.last_scale_up_time, restored.state.last_scale_down_time) == (1000.0, 1100.0)
+    assert list(restored.state.recommendations) == list(source.state.recommendations)
+    assert restored.state.drain_blocked_since == 1250.0
+    assert list(restored.metrics_window.samples) == list(source.metrics_window.samples)
+    assert restored.seasonality.averages == source.seasonality.averages
+
+
+def test_unknown_format_is_ignored():
+    target = make_target()
+    fields = as_stored(encode_state(populated_target()))
+    fields[b'v'] = b'999'
+
+    assert not apply_state(target, fields)
+    assert not target.metrics_window.samples
+
+
+def test_store_saves_and_loads_every_target():
+    r_conn = fakeredis.FakeRedis()
+    store = ScalerStateStore(r_conn, ttl_seconds=60)
+    source = populated_target()
+    source.state.drain_blocked_since = None
+    store.save([source])
+
+    restored = make_target(learned_seasonality=True)
+    assert store.load([restored, make_target('other')]) == ['n8n-worker']
+    assert restored.state.drain_blocked_since is None
+    assert list(restored.metrics_window.samples) == list(source.metrics_window.samples)
+    assert 0 < r_conn.ttl(store.state_key('n8n-worker')) <= 60
+
+
+def test_decisions_are_appended_to_a_stream():
+    r_conn = fakeredis.FakeRedis()
+    store = ScalerStateStore(r_conn)
+    store.record_decision('n8n-worker', 'scale_up', 1, 3, 60, reason='proporcional', timestamp=1000.0)
+
+    (_, entry), = r_conn.xrange(store.decisions_key('n8n-worker'))
+    assert entry[b'action'] == b'scale_up' and entry[b'new'] == b'3' and entry[b'reason'] == b'proporcional'
@@ -0,0 +1,52 @@
+import calendar
+import time
+
+from task_state import classify_tasks, parse_docker_timestamp, unready_tasks
+
+NOW = calendar.timegm((2026, 10, 17, 12, 0, 0))
+
+
+def docker_time(seconds_ago):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(NOW - seconds_ago))
+
+
+def make_task(state, desired='running', seconds_ago=0, created_seconds_ago=None):
+    return {
+        'DesiredState': desired,
+        'CreatedAt': docker_time(created_seconds_ago if created_seconds_ago is not None else seconds_ago),
+        'Status': {'State': state, 'Timestamp': docker_time(seconds_ago)},
+    }
+
+
+def test_parse_docker_timestamp_keeps_microseconds():
+    assert parse_docker_timestamp('2026-10-17T12:00:00.5Z') == NOW + 0.5
+    assert parse_docker_timestamp('') is None
+
+
+def test_classify_tasks_groups_by_phase():
+    states = classify_tasks([
+        make_task('running', seconds_ago=300),
+        make_task('running', seconds_ago=60),
+        make_task('pending', created_seconds_ago=90),
+        make_task('preparing', created_seconds_ago=30),
+        make_task('starting', created_seconds_ago=10),
+        make_task('shutdown', desired='shutdown'),
+    ], NOW)
+
+    assert (states.running, states.pending, states.preparing, states.starting) == (2, 1, 1, 1)
+    assert unready_tasks(states) == 3
+    assert states.oldest_unready_seconds == 90
+    assert states.running_since == NOW - 300
+
+
+def test_only_recent_failures_are_counted():
+    states = classify_tasks([
+        make_task('failed', desired='shutdown', seconds_ago=60),
+        make_task('rejected', desired='shutdown', seconds_ago=30),
+        make_task('failed', desired='shutdown', seconds_ago=900),
+        # Tarefa antiga em execução que o Swarm já mandou parar não conta como capacidade
+        make_task('running', desired='shutdown'),
+    ], NOW, failed_window_seconds=300)
+
+    assert states.failed == 2
+    assert states.running == 0
@@ -0,0 +1,27 @@
+import docker
+
+from worker_stats import WorkerStatsSampler, WorkerUtilization
+
+
+class ProxyWithoutInfo:
+    """Docker client behind a socket proxy that denies /info."""
+
+    api = object()
+
+    def info(self):
+        raise docker.errors.APIError('403 Forbidden')
+
+
+def test_local_node_lookup_tolerates_denied_info():
+    sampler = WorkerStatsSampler(ProxyWithoutInfo())
+
+    assert sampler._client_for_node({'ID': 'node-1', 'Description': {'Hostname': 'worker-1'}}) is None
+    assert sampler.local_node_id == ''
+
+
+def test_smoothed_utilization_expires_without_readings():
+    sampler = WorkerStatsSampler(ProxyWithoutInfo(), max_age_seconds=60)
+    sampler.smoothed['svc'] = WorkerUtilization(0, 80.0, 50.0, 2, 2)
+
+    assert sampler.sample('svc', [], []) is None
+    assert 'svc' not in sampler.smoothed
@@ -0,0 +1,84 @@
+import json
+
+import fakeredis
+
+from workflow_backlog import N8nExecutionResolver, WorkflowBacklogAnalyzer, UNKNOWN_WORKFLOW
+
+
+class StubResolver(N8nExecutionResolver):
+    """N8nExecutionResolver answering from a dict instead of the n8n API."""
+
+    def __init__(self, responses, **kwargs):
+        super().__init__('http://n8n', 'key', **kwargs)
+        self.responses = responses
+        self.calls = []
+
+    def _fetch(self, execution_id):
+        self.calls.append(execution_id)
+        return self.responses.get(execution_id)
+
+
+def make_analyzer(resolver, executions):
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    for job_id, execution_id in executions.items():
+        r_conn.rpush('bull:jobs:wait', job_id)
+        r_conn.hset(f'bull:jobs:{job_id}', 'data', json.dumps({'executionId': execution_id}))
+    return WorkflowBacklogAnalyzer(r_conn, 'bull:jobs', 'bull:jobs:wait', resolver=resolver, max_lookups=1)
+
+
+def test_lookups_run_off_the_analysis_path():
+    resolver = StubResolver({'101': 'wf-a', '102': 'wf-b'})
+    analyzer = make_analyzer(resolver, {'1': '101', '2': '102'})
+
+    # A primeira análise só enfileira as consultas (uma por chamada) e não espera a API
+    first = analyzer.analyze()
+    assert [workflow for workflow, _, _ in first.backlog] == [UNKNOWN_WORKFLOW]
+    resolver.pending.join()
+    analyzer.analyze()
+    resolver.pending.join()
+
+    assert sorted(workflow for workflow, _, _ in analyzer.analyze().backlog) == ['wf-a', 'wf-b']
+
+
+def test_failed_lookups_are_not_retried_until_expired():
+    resolver = StubResolver({}, retry_seconds=300)
+    analyzer = make_analyzer(resolver, {'1': '404'})
+
+    analyzer.analyze()
+    resolver.pending.join()
+    analyzer.analyze()
+    resolver.pending.join()
+
+    assert resolver.calls == ['404']
+    assert resolver.request('404', now=resolver.failed['404'] + 1)
+
+
+class ListResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return ['not', 'an', 'execution']
+
+
+def test_non_object_response_is_a_failed_lookup():
+    resolver = N8nExecutionResolver('http://n8n', 'key')
+    resolver.session.get = lambda url, timeout: ListResponse()
+
+    assert resolver._fetch('101') is None
+
+
+def test_resolver_thread_survives_unexpected_errors():
+    class FlakyResolver(StubResolver):
+        def _fetch(self, execution_id):
+            if execution_id == 'boom':
+                raise AttributeError('resposta inesperada')
+            return super()._fetch(execution_id)
+
+    resolver = FlakyResolver({'101': 'wf-a'})
+    resolver.request('boom')
+    resolver.request('101')
+    resolver.pending.join()
+
+    assert resolver.cached('101') == 'wf-a'
+    assert 'boom' in resolver.failed
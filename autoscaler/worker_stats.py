@@ -0,0 +1,163 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import docker
+
+from task_state import parse_docker_timestamp
+
+# Utilização média (suavizada) dos containers do serviço, em % do limite de CPU e de memória
+WorkerUtilization = namedtuple('WorkerUtilization', ['timestamp', 'cpu_percent', 'memory_percent', 'sampled', 'running'])
+
+
+def parse_node_api_urls(value):
+    """Parse ``hostname=url,hostname=url`` into a dict (Docker API of each node, e.g. a socket proxy)."""
+    urls = {}
+    for entry in (value or '').split(','):
+        if '=' in entry:
+            hostname, url = entry.split('=', 1)
+            urls[hostname.strip()] = url.strip()
+    return urls
+
+
+def memory_usage_bytes(memory_stats):
+    """Working-set memory of a container: usage minus reclaimable page cache (cgroup v1 and v2)."""
+    usage = memory_stats.get('usage', 0)
+    stats = memory_stats.get('stats', {})
+    cache = stats.get('inactive_file', stats.get('total_inactive_file', stats.get('cache', 0)))
+    return max(0, usage - cache)
+
+
+class WorkerStatsSampler:
+    """Samples cgroup CPU and memory of a service's containers with one-shot stats calls.
+
+    Each tick issues one non-streaming ``stats`` call per running task, fanned out on a
+    small thread pool. One-shot reads carry no previous CPU sample, so CPU usage is the
+    delta of the cumulative counter since the previous tick. Containers are reached
+    through the local daemon or, for other nodes, through ``node_api_urls``; tasks on
+    unreachable nodes are skipped. Readings are smoothed per service with an EWMA; the
+    smoothed value is dropped once no container has been read for ``max_age_seconds``.
+    """
+
+    def __init__(self, docker_client, max_workers=8, timeout_seconds=5, node_api_urls=None, smoothing_alpha=0.3,
+                 api_meter=None, max_age_seconds=60):
+        self.docker_client = docker_client
+        self.max_workers = max_workers
+        self.api_meter = api_meter
+        self.timeout_seconds = timeout_seconds
+        self.node_api_urls = node_api_urls or {}
+        self.smoothing_alpha = smoothing_alpha
+        self.max_age_seconds = max_age_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='worker-stats')
+        self.local_node_id = None
+        self.node_clients = {}
+        self.lock = threading.Lock()
+        # Contador cumulativo de CPU por serviço e container: (uso em ns, instante da leitura)
+        self.previous_cpu = {}
+        # Utilização suavizada por serviço
+        self.smoothed = {}
+
+    def _client_for_node(self, node):
+        if self.local_node_id is None:
+            try:
+                self.local_node_id = self.docker_client.info().get('Swarm', {}).get('NodeID', '')
+            except docker.errors.APIError as e:
+                # Ex.: docker-socket-proxy sem INFO=1; só os nós de NODE_DOCKER_API_URLS serão lidos
+                logging.warning(f"Não foi possível identificar o nó local via /info ({e}). Containers do nó local não terão stats lidos.")
+                self.local_node_id = ''
+        if node['ID'] == self.local_node_id:
+            return self.docker_client.api
+        url = self.node_api_urls.get(node.get('Description', {}).get('Hostname'))
+        if not url:
+            return None
+        with self.lock:
+            if url not in self.node_clients:
+                # Uma conexão keep-alive por thread de coleta, reaproveitada entre os ciclos
+                client = docker.APIClient(base_url=url, timeout=self.timeout_seconds, max_pool_size=self.max_workers)
+                if self.api_meter is not None:
+                    self.api_meter.attach(client)
+                self.node_clients[url] = client
+            return self.node_clients[url]
+
+    def _container_usage(self, client, container_id, cpu_limit_cores, previous_cpu):
+        stats = client.stats(container_id, stream=False, one_shot=True)
+        read_at = parse_docker_timestamp(stats.get('read')) or time.time()
+        cpu_stats = stats.get('cpu_stats', {})
+        total_usage = cpu_stats.get('cpu_usage', {}).get('total_usage', 0)
+
+        cpu_percent = None
+        with self.lock:
+            previous = previous_cpu.get(container_id)
+            previous_cpu[container_id] = (total_usage, read_at)
+        if previous and read_at > previous[1] and total_usage >= previous[0]:
+            cores_used = (total_usage - previous[0]) / 1_000_000_000 / (read_at - previous[1])
+            limit = cpu_limit_cores or cpu_stats.get('online_cpus') or 1
+            cpu_percent = 100 * cores_used / limit
+
+        memory_stats = stats.get('memory_stats', {})
+        memory_percent = None
+        if memory_stats.get('limit'):
+            memory_percent = 100 * memory_usage_bytes(memory_stats) / memory_stats['limit']
+        return cpu_percent, memory_percent
+
+    def sample(self, service_id, tasks, nodes, cpu_limit_cores=None):
+        """Return the smoothed WorkerUtilization of a service, or None without any reading."""
+        nodes_by_id = {node['ID']: node for node in nodes}
+        previous_cpu = self.previous_cpu.setdefault(service_id, {})
+        calls = []
+        running = 0
+        for task in tasks:
+            container_id = task.get('Status', {}).get('ContainerStatus', {}).get('ContainerID')
+            if task.get('Status', {}).get('State') != 'running' or not container_id:
+                continue
+            running += 1
+            node = nodes_by_id.get(task.get('NodeID'))
+            client = self._client_for_node(node) if node else None
+            if client is not None:
+                calls.append((container_id, self.executor.submit(self._container_usage, client, container_id, cpu_limit_cores, previous_cpu)))
+
+        done, _ = wait([future for _, future in calls], timeout=self.timeout_seconds)
+        cpu_readings, memory_readings = [], []
+        for container_id, future in calls:
+            if future not in done:
+                logging.debug(f"Stats do container {container_id[:12]} não retornaram em {self.timeout_seconds}s.")
+                continue
+            try:
+                cpu_percent, memory_percent = future.result()
+            except Exception as e:
+                logging.debug(f"Erro ao ler stats do container {container_id[:12]}: {e}")
+                continue
+            if cpu_percent is not None:
+                cpu_readings.append(cpu_percent)
+            if memory_percent is not None:
+                memory_readings.append(memory_percent)
+
+        # Containers que deixaram de existir não precisam do contador anterior
+        live = {container_id for container_id, _ in calls}
+        with self.lock:
+            for container_id in list(previous_cpu):
+                if container_id not in live:
+                    del previous_cpu[container_id]
+
+        previous = self.smoothed.get(service_id)
+        if not cpu_readings and not memory_readings:
+            # Sem leituras recentes a média suavizada deixa de representar os workers
+            if previous and time.time() - previous.timestamp > self.max_age_seconds:
+                del self.smoothed[service_id]
+                return None
+            return previous
+        cpu = self._smooth(previous.cpu_percent if previous else None, cpu_readings)
+        memory = self._smooth(previous.memory_percent if previous else None, memory_readings)
+        utilization = WorkerUtilization(time.time(), cpu, memory, max(len(cpu_readings), len(memory_readings)), running)
+        self.smoothed[service_id] = utilization
+        return utilization
+
+    def _smooth(self, previous, readings):
+        if not readings:
+            return previous
+        current = sum(readings) / len(readings)
+        if previous is None:
+            return current
+        return previous + self.smoothing_alpha * (current - previous)
@@ -0,0 +1,324 @@
+import json
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple, OrderedDict, Counter, deque
+
+import redis
+import requests
+
+from job_latency import to_ms, estimate_departed_duration
+
+# Agrupamento dos jobs cujo workflow não pôde ser identificado
+UNKNOWN_WORKFLOW = 'unknown'
+
+# Durações recentes guardadas por workflow para a média de execução
+RUNTIME_SAMPLES_PER_WORKFLOW = 50
+
+# backlog: [(workflow, jobs na amostra, estimativa de jobs aguardando)], active: [(workflow, jobs ativos na amostra)],
+# runtime: [(workflow, duração média em segundos, amostras)]
+WorkflowBreakdown = namedtuple('WorkflowBreakdown', ['timestamp', 'sampled_waiting', 'backlog', 'active', 'runtime'])
+
+
+def parse_job_data(raw):
+    """Extract ``(execution_id, workflow_id)`` from the ``data`` field of an n8n job hash.
+
+    n8n enqueues ``{"executionId": ..., "loadStaticData": ...}``; the workflow id is
+    taken from the payload when present (``workflowId`` or ``workflowData.id``).
+    """
+    try:
+        data = json.loads(raw) if raw else {}
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(data, dict):
+        return None, None
+    workflow_id = data.get('workflowId')
+    if workflow_id is None and isinstance(data.get('workflowData'), dict):
+        workflow_id = data['workflowData'].get('id')
+    execution_id = data.get('executionId')
+    return (str(execution_id) if execution_id is not None else None,
+            str(workflow_id) if workflow_id is not None else None)
+
+
+class JobMeta:
+    """Parsed metadata of one job, cached by job id."""
+
+    __slots__ = ('execution_id', 'workflow_id', 'processed_on', 'runtime_recorded')
+
+    def __init__(self, execution_id, workflow_id):
+        self.execution_id = execution_id
+        self.workflow_id = workflow_id
+        self.processed_on = None
+        self.runtime_recorded = False
+
+
+class N8nExecutionResolver:
+    """Looks up the workflow of executions through the n8n public API (``GET /api/v1/executions/<id>``).
+
+    Lookups run on a background thread so the scaling decision never waits on n8n:
+    ``request`` only queues an execution (up to ``max_pending``) and ``cached`` returns
+    what the thread has resolved so far. Failed lookups (errors, 404 or executions
+    without a workflow) are not retried for ``retry_seconds``.
+    """
+
+    def __init__(self, base_url, api_key, timeout=5, retry_seconds=300, max_pending=100, cache_size=10000):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self.cache_size = cache_size
+        self.session = requests.Session()
+        self.session.headers['X-N8N-API-KEY'] = api_key
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        # executionId -> workflowId resolvido
+        self.resolved = OrderedDict()
+        # executionId -> instante a partir do qual a consulta pode ser repetida
+        self.failed = OrderedDict()
+        self.queued = set()
+        self.thread = None
+
+    def cached(self, execution_id):
+        """Workflow id already resolved for an execution, or None."""
+        with self.lock:
+            workflow_id = self.resolved.get(execution_id)
+            if workflow_id is not None:
+                self.resolved.move_to_end(execution_id)
+            return workflow_id
+
+    def request(self, execution_id, now=None):
+        """Queue an execution for lookup without blocking; True if it was queued now."""
+        now = now or time.time()
+        with self.lock:
+            if execution_id in self.resolved or execution_id in self.queued:
+                return False
+            retry_at = self.failed.get(execution_id)
+            if retry_at is not None:
+                if retry_at > now:
+                    return False
+                del self.failed[execution_id]
+            try:
+                self.pending.put_nowait(execution_id)
+            except queue.Full:
+                return False
+            self.queued.add(execution_id)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='n8n-resolver', daemon=True)
+                self.thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            execution_id = self.pending.get()
+            try:
+                workflow_id = self._fetch(execution_id)
+            except Exception as e:
+                # Uma resposta inesperada não pode parar a thread e as consultas seguintes
+                logging.error(f"Erro inesperado ao consultar execução {execution_id} na API do n8n: {e}", exc_info=True)
+                workflow_id = None
+            try:
+                self._record(execution_id, workflow_id)
+            finally:
+                self.pending.task_done()
+
+    def _record(self, execution_id, workflow_id):
+        with self.lock:
+            self.queued.discard(execution_id)
+            if workflow_id is None:
+                self.failed[execution_id] = time.time() + self.retry_seconds
+                if len(self.failed) > self.cache_size:
+                    self.failed.popitem(last=False)
+            else:
+                self.resolved[execution_id] = workflow_id
+                if len(self.resolved) > self.cache_size:
+                    self.resolved.popitem(last=False)
+
+    def _fetch(self, execution_id):
+        try:
+            response = self.session.get(f"{self.base_url}/api/v1/executions/{execution_id}", timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logging.debug(f"Erro ao consultar execução {execution_id} na API do n8n: {e}")
+            return None
+        workflow_id = payload.get('workflowId') if isinstance(payload, dict) else None
+        return str(workflow_id) if workflow_id is not None else None
+
+
+class WorkflowBacklogAnalyzer:
+    """Attributes the backlog and the runtime of a queue to n8n workflows from sampled jobs.
+
+    Each call reads at most ``sample_size`` ids from the wait list (half from each end,
+    so both the next jobs to run and the newest arrivals are seen), the head of the
+    active list and the most recent completed jobs, then fetches only what is missing
+    from the cache with pipelined HMGETs. Parsed jobs live in an LRU of ``cache_size``
+    entries keyed by job id, so a job's payload is decoded once however long it stays
+    queued. Waiting counts are extrapolated to the whole list from the sample.
+
+    Runtimes come from ``processedOn``/``finishedOn`` of completed jobs; with
+    ``removeOnComplete`` (n8n's default) they are estimated from active jobs that
+    left the active list since the previous call (midpoint of the interval, as in
+    JobLatencySampler), when that list was fully sampled.
+    Workflows missing from the payload are resolved in the background by ``resolver``
+    (N8nExecutionResolver): each call picks up finished lookups and queues at most
+    ``max_lookups`` new ones, so jobs show as unknown until their lookup completes.
+    """
+
+    def __init__(self, r_conn, base_key, wait_key, sample_size=200, cache_size=10000, top_n=5,
+                 resolver=None, max_lookups=20):
+        self.r_conn = r_conn
+        self.base_key = base_key
+        self.wait_key = wait_key
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self.top_n = top_n
+        self.resolver = resolver
+        self.max_lookups = max_lookups
+        self.jobs = OrderedDict()
+        self.runtimes = OrderedDict()
+        # Jobs ativos da chamada anterior, quando a lista ativa foi lida por completo, e o instante dela
+        self.previous_active = None
+        self.previous_time = None
+
+    def _cached(self, job_id):
+        meta = self.jobs.get(job_id)
+        if meta is not None:
+            self.jobs.move_to_end(job_id)
+        return meta
+
+    def _remember(self, job_id, meta):
+        self.jobs[job_id] = meta
+        if len(self.jobs) > self.cache_size:
+            self.jobs.popitem(last=False)
+
+    def _record_runtime(self, meta, seconds):
+        if meta.runtime_recorded or seconds < 0:
+            return
+        meta.runtime_recorded = True
+        workflow = meta.workflow_id or UNKNOWN_WORKFLOW
+        if workflow not in self.runtimes:
+            self.runtimes[workflow] = deque(maxlen=RUNTIME_SAMPLES_PER_WORKFLOW)
+            if len(self.runtimes) > self.cache_size:
+                self.runtimes.popitem(last=False)
+        self.runtimes.move_to_end(workflow)
+        self.runtimes[workflow].append(seconds)
+
+    def _read_ids(self):
+        half = max(1, self.sample_size // 2)
+        pipe = self.r_conn.pipeline(transaction=False)
+        pipe.llen(self.wait_key)
+        pipe.lrange(self.wait_key, 0, half - 1)
+        pipe.lrange(self.wait_key, -half, -1)
+        pipe.lrange(f"{self.base_key}:active", 0, self.sample_size)
+        pipe.zrevrange(f"{self.base_key}:completed", 0, half - 1)
+        results = [[] if isinstance(value, Exception) else value for value in pipe.execute(raise_on_error=False)]
+        wait_length = results[0] or 0
+        # Com listas curtas as duas pontas se sobrepõem
+        waiting_ids = list(dict.fromkeys(results[1] + results[2]))
+        return wait_length, waiting_ids, results[3], results[4]
+
+    def _load_missing(self, waiting_ids, active_ids, completed_ids):
+        """Fetch the payload of unseen jobs and the timestamps that became available since."""
+        new_ids = [job_id for job_id in dict.fromkeys(waiting_ids + active_ids + completed_ids) if job_id not in self.jobs]
+        started_ids = [job_id for job_id in active_ids if job_id in self.jobs and self.jobs[job_id].processed_on is None]
+        finished_ids = [job_id for job_id in completed_ids if not (job_id in self.jobs and self.jobs[job_id].runtime_recorded)]
+        if not (new_ids or started_ids or finished_ids):
+            return
+
+        pipe = self.r_conn.pipeline(transaction=False)
+        for job_id in new_ids:
+            pipe.hmget(f"{self.base_key}:{job_id}", 'data', 'processedOn')
+        for job_id in started_ids:
+            pipe.hget(f"{self.base_key}:{job_id}", 'processedOn')
+        for job_id in finished_ids:
+            pipe.hmget(f"{self.base_key}:{job_id}", 'processedOn', 'finishedOn')
+        results = [None if isinstance(value, Exception) else value for value in pipe.execute(raise_on_error=False)]
+
+        for job_id, values in zip(new_ids, results):
+            raw, processed_on = values or (None, None)
+            meta = JobMeta(*parse_job_data(raw))
+            meta.processed_on = to_ms(processed_on)
+            self._remember(job_id, meta)
+        offset = len(new_ids)
+        for job_id, processed_on in zip(started_ids, results[offset:]):
+            self.jobs[job_id].processed_on = to_ms(processed_on)
+        offset += len(started_ids)
+        for job_id, values in zip(finished_ids, results[offset:]):
+            meta = self.jobs.get(job_id)
+            processed_ms, finished_ms = (to_ms(value) for value in (values or (None, None)))
+            if meta is not None and processed_ms is not None and finished_ms is not None:
+                self._record_runtime(meta, (finished_ms - processed_ms) / 1000)
+
+    def _resolve_workflows(self, job_ids):
+        if self.resolver is None:
+            return
+        requested = 0
+        for job_id in job_ids:
+            meta = self.jobs.get(job_id)
+            if meta is None or meta.workflow_id is not None or meta.execution_id is None:
+                continue
+            meta.workflow_id = self.resolver.cached(meta.execution_id)
+            if meta.workflow_id is None and requested < self.max_lookups and self.resolver.request(meta.execution_id):
+                requested += 1
+
+    def _workflow(self, job_id):
+        meta = self.jobs.get(job_id)
+        return (meta.workflow_id if meta else None) or UNKNOWN_WORKFLOW
+
+    def analyze(self, now=None):
+        """Return a WorkflowBreakdown, or None if the queue cannot be read."""
+        now = now or time.time()
+        try:
+            wait_length, waiting_ids, active_ids, completed_ids = self._read_ids()
+            self._load_missing(waiting_ids, active_ids, completed_ids)
+        except redis.exceptions.RedisError as e:
+            logging.error(f"Erro ao amostrar jobs da fila '{self.base_key}' por workflow: {e}")
+            return None
+        # Ativos primeiro: são os que mais cedo terão duração registrada
+        self._resolve_workflows(active_ids + waiting_ids)
+        for job_id in waiting_ids + active_ids + completed_ids:
+            self._cached(job_id)
+
+        # Sem jobs concluídos guardados, a saída da lista ativa marca o fim do job
+        if len(active_ids) <= self.sample_size:
+            if self.previous_active is not None:
+                for job_id in self.previous_active - set(active_ids):
+                    meta = self.jobs.get(job_id)
+                    if meta is not None and meta.processed_on is not None:
+                        self._record_runtime(meta, estimate_departed_duration(meta.processed_on, self.previous_time, now))
+            self.previous_active = set(active_ids)
+            self.previous_time = now
+        else:
+            self.previous_active = None
+
+        sampled = Counter(self._workflow(job_id) for job_id in waiting_ids)
+        scale = wait_length / len(waiting_ids) if waiting_ids else 0
+        backlog = [(workflow, count, round(count * scale)) for workflow, count in sampled.most_common(self.top_n)]
+        active = Counter(self._workflow(job_id) for job_id in active_ids).most_common(self.top_n)
+        runtime = sorted(
+            ((workflow, sum(durations) / len(durations), len(durations)) for workflow, durations in self.runtimes.items() if durations),
+            key=lambda item: item[1], reverse=True
+        )[:self.top_n]
+        return WorkflowBreakdown(now, len(waiting_ids), backlog, active, runtime)
+
+
+def breakdown_to_dict(breakdown):
+    """Serialize a WorkflowBreakdown for the webhook payload."""
+    return {
+        "sampled_waiting_jobs": breakdown.sampled_waiting,
+        "top_backlog": [
+            {"workflow_id": workflow, "sampled_jobs": count, "estimated_waiting": estimate}
+            for workflow, count, estimate in breakdown.backlog
+        ],
+        "top_active": [{"workflow_id": workflow, "active_jobs": count} for workflow, count in breakdown.active],
+        "avg_runtime_seconds": [
+            {"workflow_id": workflow, "seconds": round(seconds, 2), "samples": samples}
+            for workflow, seconds, samples in breakdown.runtime
+        ],
+    }
+
+
+def format_breakdown(breakdown):
+    backlog = ", ".join(f"{workflow}: ~{estimate}" for workflow, _, estimate in breakdown.backlog) or "vazio"
+    runtime = ", ".join(f"{workflow}: {seconds:.1f}s" for workflow, seconds, _ in breakdown.runtime) or "sem dados"
+    return f"fila por workflow ({breakdown.sampled_waiting} jobs amostrados): {backlog}; duração média: {runtime}"
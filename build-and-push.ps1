@@ -58,13 +58,14 @@ function Build-AndPush {
     param(
         [string]$Context,
         [string]$Repo,
-        [string]$Version
+        [string]$Version,
+        [string]$Dockerfile = "$Context/Dockerfile"
     )
     
     Write-ColorOutput "Building $Repo`:$Version..." "Blue"
     
     # Build da imagem
-    $buildResult = docker build -t "$Repo`:$Version" -t "$Repo`:latest" $Context
+    $buildResult = docker build -t "$Repo`:$Version" -t "$Repo`:latest" -f $Dockerfile $Context
     
     if ($LASTEXITCODE -eq 0) {
         Write-ColorOutput "Build concluído com sucesso!" "Green"
@@ -119,7 +120,7 @@ Write-ColorOutput ""
 # Build do Redis Monitor
 Write-ColorOutput "=== REDIS MONITOR ===" "Yellow"
 $MonitorVersion = Get-NextVersion $RepoMonitor
-$monitorSuccess = Build-AndPush "./monitor" $RepoMonitor $MonitorVersion
+$monitorSuccess = Build-AndPush "." $RepoMonitor $MonitorVersion "./monitor/Dockerfile"
 Write-ColorOutput ""
 
 if (-not $monitorSuccess) {
@@ -54,11 +54,12 @@ build_and_push() {
     local context=$1
     local repo=$2
     local version=$3
+    local dockerfile=${4:-"${context}/Dockerfile"}
     
     echo -e "${BLUE}Building ${repo}:${version}...${NC}"
     
     # Build da imagem
-    docker build -t "${repo}:${version}" -t "${repo}:latest" "${context}"
+    docker build -t "${repo}:${version}" -t "${repo}:latest" -f "${dockerfile}" "${context}"
     
     if [ $? -eq 0 ]; then
         echo -e "${GREEN}Build concluído com sucesso!${NC}"
@@ -102,7 +103,7 @@ echo ""
 # Build do Redis Monitor
 echo -e "${YELLOW}=== REDIS MONITOR ===${NC}"
 MONITOR_VERSION=$(get_next_version "$REPO_MONITOR")
-build_and_push "./monitor" "$REPO_MONITOR" "$MONITOR_VERSION"
+build_and_push "." "$REPO_MONITOR" "$MONITOR_VERSION" "./monitor/Dockerfile"
 echo ""
 
 # Build do Autoscaler
@@ -28,11 +28,12 @@ build_and_push() {
     local context=$1
     local repo=$2
     local version=$3
+    local dockerfile=${4:-"${context}/Dockerfile"}
     
     echo -e "${BLUE}Building ${repo}:${version}...${NC}"
     
     # Build da imagem
-    docker build -t "${repo}:${version}" -t "${repo}:latest" "${context}"
+    docker build -t "${repo}:${version}" -t "${repo}:latest" -f "${dockerfile}" "${context}"
     
     if [ $? -eq 0 ]; then
         echo -e "${GREEN}Build concluído com sucesso!${NC}"
@@ -74,7 +75,7 @@ echo ""
 
 # Build do Redis Monitor
 echo -e "${YELLOW}=== REDIS MONITOR ===${NC}"
-build_and_push "./monitor" "$REPO_MONITOR" "$VERSION"
+build_and_push "." "$REPO_MONITOR" "$VERSION" "./monitor/Dockerfile"
 echo ""
 
 # Build do Autoscaler
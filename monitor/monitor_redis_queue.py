@@ -1,18 +1,40 @@
 import redis
 import time
 import os
+import sys
+import json
+import threading
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# O coletor de estado da fila é compartilhado com o autoscaler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'autoscaler'))
+from queue_state import QueueStateCollector, collect_snapshots, snapshot_waiting, snapshot_to_dict
+from queue_history import QueueHistory, history_resolutions
 
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
+REDIS_DB = int(os.getenv('REDIS_DB', 0))
 QUEUE_NAME_PREFIX = os.getenv('QUEUE_NAME_PREFIX', 'bull') # BullMQ default prefix
-QUEUE_NAME = os.getenv('QUEUE_NAME', 'jobs')
-POLL_INTERVAL_SECONDS = int(os.getenv('POLL_INTERVAL_SECONDS', 5))
+# Padrão (glob do SCAN) das chaves das filas a monitorar
+QUEUE_PATTERN = os.getenv('QUEUE_PATTERN', f"{QUEUE_NAME_PREFIX}:*")
+CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', os.getenv('POLL_INTERVAL_SECONDS', 5)))
+# Redescoberta das filas: intervalo entre varreduras e limite de chamadas SCAN por verificação
+DISCOVERY_INTERVAL_SECONDS = int(os.getenv('DISCOVERY_INTERVAL_SECONDS', 300))
+SCAN_COUNT = int(os.getenv('SCAN_COUNT', 500))
+SCAN_CALLS_PER_CHECK = int(os.getenv('SCAN_CALLS_PER_CHECK', 20))
+# Porta da API HTTP JSON (0 desabilita, padrão)
+MONITOR_HTTP_PORT = int(os.getenv('MONITOR_HTTP_PORT', 0))
+
+# Chaves que toda fila Bull/BullMQ possui: contador de ids de job e hash de metadados
+QUEUE_MARKER_SUFFIXES = (':id', ':meta')
+
 
 def get_redis_connection():
     """Estabelece uma conexão com o Redis."""
     try:
-        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, decode_responses=True)
+        r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=REDIS_DB, decode_responses=True)
         r.ping()
         print(f"Conectado com sucesso ao Redis em {REDIS_HOST}:{REDIS_PORT}")
         return r
@@ -20,79 +42,193 @@ def get_redis_connection():
         print(f"Erro ao conectar com o Redis: {e}")
         return None
 
-def get_queue_length(r_conn, queue_name_prefix, queue_name):
-    """Obtém o comprimento da fila BullMQ especificada."""
-    # BullMQ armazena listas para diferentes estados de uma fila.
-    # 'wait' (ou a lista principal da fila) é geralmente o que as pessoas querem dizer com "comprimento da fila"
-    # Normalmente é nomeada "bull:<queue_name>:wait" ou apenas "bull:<queue_name>" para versões mais antigas
-    # ou às vezes apenas <queue_name_prefix>:<queue_name>
-    # Também verificaremos 'active', 'delayed', 'completed', 'failed' para dar uma visão mais completa.
-
-    # A lista principal representando jobs pendentes é geralmente <prefix>:<queue_name>:wait
-    # No entanto, LLEN em <prefix>:<queue_name> em si frequentemente também dá a contagem de jobs aguardando.
-    # Vamos tentar o mais comum para jobs "aguardando".
-    # BullMQ v3+ usa <prefix>:<queue_name>:wait para jobs aguardando
-    # BullMQ v4+ usa <prefix>:<queue_name>:waiting para jobs aguardando
-    # Abordagem mais simples: BullMQ também mantém uma lista nomeada apenas <prefix>:<queue_name>
-    # que frequentemente corresponde à lista 'waiting' ou é um bom proxy.
-    
-    # Para BullMQ, a chave para a lista de jobs aguardando é tipicamente `<prefix>:<queue_name>:wait`
-    # ou para versões mais novas `<prefix>:<queue_name>:waiting`.
-    # O comando `LLEN <prefix>:<queue_name>` frequentemente dá a contagem de jobs aguardando.
-    # Vamos tentar obter o comprimento da lista principal para a fila.
-    # Chaves de fila BullMQ são tipicamente prefixadas, ex., "bull:myQueueName:id"
-    # A lista real de jobs aguardando é frequentemente "bull:myQueueName:wait" ou "bull:myQueueName:waiting"
-    # No entanto, n8n pode usar uma nomenclatura mais simples. O comando `KEYS` mostrou `bull:jobs:active` etc.
-    # Isso implica que o nome base da fila é `jobs` e o prefixo é `bull`.
-    # A lista de jobs aguardando é tipicamente `bull:<queue_name>:wait`.
-    
-    # Baseado na saída do `KEYS "bull:*:*"`, `bull:jobs:active` e chaves similares existem.
-    # A lista de jobs *aguardando* é o que nos interessa.
-    # Isso é tipicamente `bull:<queue_name>:wait` ou `bull:<queue_name>:waiting`.
-    # Vamos tentar `LLEN bull:jobs:wait`
-    key_to_check = f"{queue_name_prefix}:{queue_name}:wait"
-    try:
-        length = r_conn.llen(key_to_check)
-        if length is None: # Se a chave não existe, llen pode retornar None ou um erro dependendo da versão do cliente
-             # Tenta o padrão mais antigo se :wait não existe
-            key_to_check_legacy = f"{queue_name_prefix}:{queue_name}"
-            length = r_conn.llen(key_to_check_legacy)
-            if length is not None:
-                print(f"Nota: Usando padrão de chave legado '{key_to_check_legacy}' para comprimento da fila.")
-                key_to_check = key_to_check_legacy # update for logging
-            else:
-                 # Se nenhuma existe, pode ser 0 ou um problema.
-                 # Vamos também verificar a chave usada pelo BullMQ v4+
-                key_to_check_v4 = f"{queue_name_prefix}:{queue_name}:waiting"
-                length = r_conn.llen(key_to_check_v4)
-                if length is not None:
-                    print(f"Nota: Usando padrão de chave BullMQ v4+ '{key_to_check_v4}' para comprimento da fila.")
-                    key_to_check = key_to_check_v4
-                else:
-                    print(f"Aviso: Chave '{key_to_check}', '{key_to_check_legacy}', ou '{key_to_check_v4}' não encontrada ou não é uma lista. Assumindo comprimento 0.")
-                    return 0
-        return length
-    except redis.exceptions.ResponseError as e:
-        # Isso pode acontecer se a chave existe mas não é do tipo lista
-        print(f"Erro do Redis ao verificar comprimento de '{key_to_check}': {e}. Assumindo comprimento 0.")
-        return 0
-    except Exception as e:
-        print(f"Erro inesperado ao verificar comprimento de '{key_to_check}': {e}. Assumindo comprimento 0.")
-        return 0
+def format_snapshot(snapshot):
+    """Formata um snapshot do estado da fila em uma linha de log."""
+    paused = " (PAUSADA)" if snapshot.is_paused else ""
+    return (f"aguardando={snapshot_waiting(snapshot)} ativos={snapshot.active} atrasados={snapshot.delayed} "
+            f"pausados={snapshot.paused} concluídos={snapshot.completed} falhos={snapshot.failed}{paused}")
+
+
+def split_queue_key(base_key, pattern):
+    """Split ``<prefix>:<queue>`` using the literal prefix of the SCAN pattern."""
+    literal = pattern
+    for wildcard in ('*', '?', '['):
+        literal = literal.split(wildcard)[0]
+    prefix = literal.rsplit(':', 1)[0] if ':' in literal else base_key.split(':', 1)[0]
+    return prefix, base_key[len(prefix) + 1:]
+
+
+class QueueDiscovery:
+    """Finds the queues matching a key pattern with incremental SCAN (never KEYS).
+
+    A sweep runs at most ``calls_per_check`` SCAN calls per check and resumes from
+    its cursor on the next one, so large keyspaces never block Redis or the
+    monitor. The discovered set is cached and only replaced when a sweep
+    completes; a new sweep starts every ``refresh_seconds``.
+    """
+
+    def __init__(self, r_conn, pattern, refresh_seconds=300, scan_count=500, calls_per_check=20):
+        self.r_conn = r_conn
+        self.pattern = pattern
+        self.refresh_seconds = refresh_seconds
+        self.scan_count = scan_count
+        self.calls_per_check = calls_per_check
+        self.queues = set()
+        self.cursor = None
+        self.found = set()
+        self.last_sweep = 0
+
+    def refresh(self, now=None):
+        """Advance the current sweep; returns True when the cached set changed."""
+        now = now or time.time()
+        if self.cursor is None:
+            if self.last_sweep and now - self.last_sweep < self.refresh_seconds:
+                return False
+            self.cursor, self.found = 0, set()
+
+        # A primeira varredura é feita por completo para já começar monitorando
+        budget = None if not self.last_sweep else self.calls_per_check
+        while budget is None or budget > 0:
+            self.cursor, keys = self.r_conn.scan(self.cursor, match=self.pattern, count=self.scan_count)
+            for key in keys:
+                for suffix in QUEUE_MARKER_SUFFIXES:
+                    if key.endswith(suffix):
+                        self.found.add(key[:-len(suffix)])
+            if self.cursor == 0:
+                break
+            if budget is not None:
+                budget -= 1
+        if self.cursor != 0:
+            return False
+
+        self.cursor = None
+        self.last_sweep = now
+        changed = self.found != self.queues
+        self.queues = self.found
+        return changed
+
+
+class QueueMonitor:
+    """Collects every state of every discovered queue in one pipeline and keeps their history."""
+
+    def __init__(self, r_conn, discovery, history):
+        self.r_conn = r_conn
+        self.discovery = discovery
+        self.history = history
+        self.collectors = {}
+        self.last_check = None
+
+    def sync_collectors(self):
+        queues = self.discovery.queues
+        removed = [base_key for base_key in self.collectors if base_key not in queues]
+        for base_key in removed:
+            del self.collectors[base_key]
+        self.history.forget(removed)
+        for base_key in sorted(queues - set(self.collectors)):
+            prefix, name = split_queue_key(base_key, self.discovery.pattern)
+            self.collectors[base_key] = QueueStateCollector(self.r_conn, prefix, name)
+        if removed:
+            print(f"Filas removidas do monitoramento: {', '.join(sorted(removed))}")
+
+    def check(self):
+        if self.discovery.refresh():
+            self.sync_collectors()
+            print(f"{len(self.collectors)} fila(s) monitorada(s): {', '.join(sorted(self.collectors)) or 'nenhuma'}")
+        if not self.collectors:
+            return []
+
+        base_keys = list(self.collectors)
+        snapshots = collect_snapshots(self.r_conn, [self.collectors[base_key] for base_key in base_keys])
+        for base_key in base_keys:
+            if self.collectors[base_key].needs_layout_check():
+                self.collectors[base_key].detect_layout()
+        for base_key, snapshot in zip(base_keys, snapshots):
+            values = {
+                'waiting': snapshot_waiting(snapshot), 'active': snapshot.active, 'delayed': snapshot.delayed,
+                'paused': snapshot.paused, 'completed': snapshot.completed, 'failed': snapshot.failed,
+            }
+            self.history.add(base_key, snapshot.timestamp, values, dict(snapshot_to_dict(snapshot), waiting=values['waiting']))
+        self.last_check = time.time()
+        return list(zip(base_keys, snapshots))
+
+
+def make_api_handler(monitor):
+    """HTTP handler of the JSON API over the monitor's history.
+
+    GET /health, GET /queues (latest state of every queue) and
+    GET /queues/<prefix:queue>/history?resolution=1m&since=<epoch>.
+    """
+    resolutions = [label for label, _, _ in monitor.history.resolutions]
+    default_resolution = '1m' if '1m' in resolutions else resolutions[0]
+
+    class QueueApiHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+            query = parse_qs(url.query)
+
+            if parts == ['health']:
+                return self.respond(200, {
+                    'status': 'ok', 'queues': len(monitor.collectors), 'last_check': monitor.last_check,
+                })
+            if parts == ['queues']:
+                return self.respond(200, {'queues': monitor.history.queues()})
+            if len(parts) == 3 and parts[0] == 'queues' and parts[2] == 'history':
+                resolution = query.get('resolution', [default_resolution])[0]
+                if resolution not in resolutions:
+                    return self.respond(400, {'error': f"resolução inválida; use uma de {resolutions}"})
+                try:
+                    since = float(query['since'][0]) if 'since' in query else None
+                except ValueError:
+                    return self.respond(400, {'error': "parâmetro 'since' deve ser um timestamp"})
+                points = monitor.history.series(parts[1], resolution, since)
+                if points is None:
+                    return self.respond(404, {'error': f"fila '{parts[1]}' não monitorada"})
+                return self.respond(200, {'queue': parts[1], 'resolution': resolution, 'points': points})
+            return self.respond(404, {'error': 'rota não encontrada'})
+
+        def respond(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Sem log por requisição
+            pass
+
+    return QueueApiHandler
+
+
+def start_api_server(monitor, port):
+    server = ThreadingHTTPServer(('0.0.0.0', port), make_api_handler(monitor))
+    threading.Thread(target=server.serve_forever, name='monitor-api', daemon=True).start()
+    print(f"API HTTP do monitor em http://0.0.0.0:{port} (/health, /queues, /queues/<fila>/history)")
+    return server
 
 
 if __name__ == "__main__":
     redis_conn = get_redis_connection()
     if redis_conn:
-        print(f"Monitorando fila Redis '{QUEUE_NAME_PREFIX}:{QUEUE_NAME}' a cada {POLL_INTERVAL_SECONDS} segundos...")
+        print(f"Monitorando filas Redis que casam com '{QUEUE_PATTERN}' a cada {CHECK_INTERVAL} segundos "
+              f"(redescoberta a cada {DISCOVERY_INTERVAL_SECONDS}s)...")
         print("Pressione Ctrl+C para parar.")
+        discovery = QueueDiscovery(redis_conn, QUEUE_PATTERN, DISCOVERY_INTERVAL_SECONDS, SCAN_COUNT, SCAN_CALLS_PER_CHECK)
+        monitor = QueueMonitor(redis_conn, discovery, QueueHistory(history_resolutions(CHECK_INTERVAL)))
+        if MONITOR_HTTP_PORT:
+            start_api_server(monitor, MONITOR_HTTP_PORT)
         try:
             while True:
-                length = get_queue_length(redis_conn, QUEUE_NAME_PREFIX, QUEUE_NAME)
-                print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Comprimento da fila '{QUEUE_NAME_PREFIX}:{QUEUE_NAME}:wait': {length}")
-                time.sleep(POLL_INTERVAL_SECONDS)
+                try:
+                    for base_key, snapshot in monitor.check():
+                        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Fila '{base_key}': {format_snapshot(snapshot)}")
+                except redis.exceptions.RedisError as e:
+                    print(f"Erro do Redis ao ler estado das filas: {e}")
+                time.sleep(CHECK_INTERVAL)
         except KeyboardInterrupt:
             print("\nMonitoramento interrompido pelo usuário.")
         finally:
             redis_conn.close()
-            print("Conexão Redis fechada.")
\ No newline at end of file
+            print("Conexão Redis fechada.")
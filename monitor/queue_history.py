@@ -0,0 +1,126 @@
+import math
+import threading
+from array import array
+
+# Níveis do histórico: (segundos por ponto, janela coberta em segundos)
+HISTORY_TIERS = (
+    (1, 600),             # leituras brutas por 10 minutos
+    (60, 86400),          # 1m por 24 horas
+    (3600, 30 * 86400),   # 1h por 30 dias
+)
+
+
+def resolution_label(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+def history_resolutions(sample_interval=1):
+    """Resolutions ``(label, seconds per point, points kept)`` for one sample every ``sample_interval`` seconds.
+
+    No tier is finer than the sampling interval, and each keeps enough points to
+    cover its window; tiers that collapse to the same resolution keep the widest window.
+    """
+    resolutions = []
+    for seconds, window in HISTORY_TIERS:
+        seconds = max(seconds, int(math.ceil(sample_interval)))
+        tier = (resolution_label(seconds), seconds, math.ceil(window / seconds))
+        if resolutions and resolutions[-1][1] == seconds:
+            resolutions[-1] = tier
+        else:
+            resolutions.append(tier)
+    return tuple(resolutions)
+
+
+HISTORY_RESOLUTIONS = history_resolutions()
+
+# Campos guardados por ponto (média das leituras que caíram no intervalo)
+HISTORY_FIELDS = ('waiting', 'active', 'delayed', 'paused', 'completed', 'failed')
+
+
+class RingBuffer:
+    """Fixed-size time series at one resolution, backed by ``array`` columns.
+
+    Samples falling in the same ``resolution_seconds`` bucket are averaged into a
+    single point; once ``capacity`` points are stored the oldest is overwritten.
+    """
+
+    def __init__(self, resolution_seconds, capacity, fields=HISTORY_FIELDS):
+        self.resolution_seconds = resolution_seconds
+        self.capacity = capacity
+        self.fields = fields
+        self.timestamps = array('d', [0.0]) * capacity
+        self.counts = array('I', [0]) * capacity
+        self.sums = {field: array('d', [0.0]) * capacity for field in fields}
+        self.size = 0
+        # Posição do ponto mais recente
+        self.head = -1
+
+    def add(self, timestamp, values):
+        bucket = timestamp - timestamp % self.resolution_seconds
+        if self.size == 0 or self.timestamps[self.head] != bucket:
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.timestamps[self.head] = bucket
+            self.counts[self.head] = 0
+            for field in self.fields:
+                self.sums[field][self.head] = 0.0
+        self.counts[self.head] += 1
+        for field in self.fields:
+            self.sums[field][self.head] += values[field]
+
+    def points(self, since=None):
+        """Points in chronological order as dicts with ``timestamp`` and the averaged fields."""
+        result = []
+        for offset in range(self.size - 1, -1, -1):
+            index = (self.head - offset) % self.capacity
+            if since is not None and self.timestamps[index] < since:
+                continue
+            count = self.counts[index]
+            point = {'timestamp': self.timestamps[index]}
+            for field in self.fields:
+                point[field] = round(self.sums[field][index] / count, 2)
+            result.append(point)
+        return result
+
+
+class QueueHistory:
+    """Downsampled history of every monitored queue at all HISTORY_RESOLUTIONS (thread-safe)."""
+
+    def __init__(self, resolutions=HISTORY_RESOLUTIONS):
+        self.resolutions = resolutions
+        self.buffers = {}
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def add(self, queue, timestamp, values, latest=None):
+        with self.lock:
+            if queue not in self.buffers:
+                self.buffers[queue] = {
+                    label: RingBuffer(resolution, capacity) for label, resolution, capacity in self.resolutions
+                }
+            for buffer in self.buffers[queue].values():
+                buffer.add(timestamp, values)
+            self.latest[queue] = latest if latest is not None else dict(values, timestamp=timestamp)
+
+    def forget(self, queues):
+        """Drop queues that no longer exist in Redis."""
+        with self.lock:
+            for queue in queues:
+                self.buffers.pop(queue, None)
+                self.latest.pop(queue, None)
+
+    def queues(self):
+        with self.lock:
+            return dict(self.latest)
+
+    def series(self, queue, resolution, since=None):
+        """Points of a queue at one resolution label, or None if the queue or resolution is unknown."""
+        with self.lock:
+            buffer = self.buffers.get(queue, {}).get(resolution)
+            if buffer is None:
+                return None
+            return buffer.points(since)
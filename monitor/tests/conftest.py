@@ -0,0 +1,5 @@
+import os
+import sys
+
+MONITOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, MONITOR_DIR)
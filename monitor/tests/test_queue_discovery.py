@@ -0,0 +1,40 @@
+import fakeredis
+
+from monitor_redis_queue import QueueDiscovery
+
+
+def make_redis(queues, noise=0):
+    r_conn = fakeredis.FakeRedis(decode_responses=True)
+    for queue in queues:
+        r_conn.set(f'{queue}:id', 1)
+        r_conn.hset(f'{queue}:meta', 'opts', '{}')
+        r_conn.rpush(f'{queue}:wait', 'job')
+    for index in range(noise):
+        r_conn.set(f'bull:noise:{index}', 1)
+    return r_conn
+
+
+def test_first_sweep_finds_every_queue():
+    discovery = QueueDiscovery(make_redis(['bull:jobs', 'bull:emails']), 'bull:*')
+
+    assert discovery.refresh(now=1000)
+    assert discovery.queues == {'bull:jobs', 'bull:emails'}
+
+
+def test_later_sweeps_are_incremental_and_keep_the_cached_set():
+    r_conn = make_redis(['bull:jobs'], noise=200)
+    discovery = QueueDiscovery(r_conn, 'bull:*', refresh_seconds=60, scan_count=10, calls_per_check=1)
+    discovery.refresh(now=1000)
+    r_conn.set('bull:new:id', 1)
+
+    # Antes do intervalo de redescoberta nada muda
+    assert not discovery.refresh(now=1030)
+    # Cada verificação faz uma única chamada SCAN; o conjunto só é trocado ao fim da varredura
+    changed = False
+    for check in range(1000):
+        changed = discovery.refresh(now=1060 + check)
+        if changed:
+            break
+        assert discovery.queues == {'bull:jobs'}
+    assert changed
+    assert discovery.queues == {'bull:jobs', 'bull:new'}
@@ -0,0 +1,40 @@
+from queue_history import QueueHistory, RingBuffer, history_resolutions
+
+FIELDS = ('waiting',)
+
+
+def test_samples_in_the_same_bucket_are_averaged():
+    buffer = RingBuffer(60, 10, FIELDS)
+    buffer.add(120, {'waiting': 10})
+    buffer.add(150, {'waiting': 20})
+    buffer.add(180, {'waiting': 5})
+
+    assert buffer.points() == [{'timestamp': 120, 'waiting': 15.0}, {'timestamp': 180, 'waiting': 5.0}]
+
+
+def test_oldest_points_are_overwritten_once_full():
+    buffer = RingBuffer(1, 3, FIELDS)
+    for second in range(5):
+        buffer.add(second, {'waiting': second})
+
+    assert [point['timestamp'] for point in buffer.points()] == [2, 3, 4]
+    assert [point['timestamp'] for point in buffer.points(since=3)] == [3, 4]
+
+
+def test_history_rolls_samples_into_every_tier():
+    history = QueueHistory(history_resolutions(5))
+    values = dict.fromkeys(('waiting', 'active', 'delayed', 'paused', 'completed', 'failed'), 0)
+    for second in range(0, 3600 + 60, 5):
+        history.add('bull:jobs', second, dict(values, waiting=second))
+
+    assert len(history.series('bull:jobs', '5s')) == 120
+    assert len(history.series('bull:jobs', '1m')) == 61
+    assert len(history.series('bull:jobs', '1h')) == 2
+    assert history.series('bull:jobs', '1s') is None
+    assert history.series('bull:other', '1m') is None
+
+
+def test_tiers_follow_the_sampling_interval():
+    assert history_resolutions(1) == (('1s', 1, 600), ('1m', 60, 1440), ('1h', 3600, 720))
+    assert history_resolutions(5)[0] == ('5s', 5, 120)
+    assert history_resolutions(60) == (('1m', 60, 1440), ('1h', 3600, 720))